@@ -0,0 +1,170 @@
+"""
+Lead Analytics
+Score distributions by industry, company size, budget and service area, and the
+top goals by week, kept as counters and histograms in the submissions database
+
+Each stored submission adds its increments in the same transaction as its insert
+(see SubmissionStore.save_submission), so the /api/analytics summary is read from
+a fixed number of aggregate rows however many submissions there are. Answers
+outside the form's options are counted as "unknown", which keeps the row count
+bounded.
+
+Recompute the aggregates from the stored submissions (e.g. after changing the
+buckets, restoring a database or upgrading one that predates the aggregates):
+    python -m api.analytics rebuild
+"""
+
+import argparse
+import json
+import os
+from datetime import date, datetime, timedelta
+
+from api.scoring_analysis import ASSESSMENT_QUESTIONS, SERVICE_AREAS
+from api.storage import get_submission_store
+
+# Weeks of goal counts returned by the endpoint, and goals listed per week
+ANALYTICS_WEEKS = int(os.environ.get('ANALYTICS_WEEKS', '12'))
+ANALYTICS_TOP_GOALS = int(os.environ.get('ANALYTICS_TOP_GOALS', '5'))
+
+# Overall score distributions are broken down by these answers
+SEGMENT_QUESTIONS = {
+    'industry': 'by_industry',
+    'employees': 'by_company_size',
+    'budget': 'by_budget'
+}
+
+# Scores fall into ten buckets: 0-9, 10-19, ..., 90-100
+SCORE_BUCKETS = 10
+BUCKET_LABELS = [f'{i * 10}-{i * 10 + 9}' for i in range(SCORE_BUCKETS - 1)] + ['90-100']
+
+UNKNOWN = 'unknown'
+
+
+def score_bucket(score):
+    return str(min(max(int(score), 0) // 10, SCORE_BUCKETS - 1))
+
+
+def week_key(day):
+    """
+    ISO week of a date as 'YYYY-Www', which sorts chronologically
+    """
+    year, week, _ = day.isocalendar()
+    return f'{year}-W{week:02d}'
+
+
+def _answer(form_data, question):
+    value = form_data.get(question)
+    return value if value in ASSESSMENT_QUESTIONS[question]['options'] else UNKNOWN
+
+
+def aggregate_rows(submission):
+    """
+    The (dimension, key, bucket, count, total) increments for one stored submission
+    """
+    overall = submission['overall_score']
+    bucket = score_bucket(overall)
+    rows = [('overall', '', bucket, 1, overall)]
+    for question in SEGMENT_QUESTIONS:
+        rows.append((question, _answer(submission, question), bucket, 1, overall))
+
+    area_scores = submission.get('service_area_scores') or {}
+    for area in SERVICE_AREAS:
+        if area in area_scores:
+            rows.append(('service_area', area, score_bucket(area_scores[area]), 1, area_scores[area]))
+
+    goals = submission.get('goals')
+    if isinstance(goals, list):
+        week = week_key(datetime.fromisoformat(submission['submitted_at']))
+        options = ASSESSMENT_QUESTIONS['goals']['options']
+        for goal in dict.fromkeys(goals):
+            if goal in options:
+                rows.append(('goals_week', week, goal, 1, 0))
+    return rows
+
+
+def _distribution():
+    return {'count': 0, 'mean': None, 'histogram': [0] * SCORE_BUCKETS, '_total': 0}
+
+
+def summarize(rows, weeks, top_goals):
+    """
+    Build the analytics response from aggregate rows
+    """
+    overall = _distribution()
+    segments = {name: {} for name in SEGMENT_QUESTIONS.values()}
+    service_areas = {area: _distribution() for area in SERVICE_AREAS}
+    goals_by_week = {}
+
+    for dimension, key, bucket, count, total in rows:
+        if dimension == 'goals_week':
+            goals_by_week.setdefault(key, []).append((bucket, count))
+            continue
+        if dimension == 'overall':
+            distribution = overall
+        elif dimension == 'service_area':
+            distribution = service_areas.get(key)
+        elif dimension in SEGMENT_QUESTIONS:
+            distribution = segments[SEGMENT_QUESTIONS[dimension]].setdefault(key, _distribution())
+        else:
+            distribution = None
+        if distribution is None:
+            continue
+        distribution['count'] += count
+        distribution['_total'] += total
+        distribution['histogram'][int(bucket)] += count
+
+    for distribution in [overall, *service_areas.values()] + [d for s in segments.values() for d in s.values()]:
+        total = distribution.pop('_total')
+        if distribution['count']:
+            distribution['mean'] = round(total / distribution['count'], 1)
+
+    top_goals_by_week = [
+        {
+            'week': week,
+            'goals': [
+                {'goal': goal, 'count': count}
+                for goal, count in sorted(goals_by_week[week], key=lambda item: (-item[1], item[0]))[:top_goals]
+            ]
+        }
+        for week in sorted(goals_by_week, reverse=True)[:weeks]
+    ]
+
+    return {
+        'submissions': overall['count'],
+        'score_buckets': BUCKET_LABELS,
+        'overall': overall,
+        **segments,
+        'service_areas': service_areas,
+        'top_goals_by_week': top_goals_by_week
+    }
+
+
+def get_analytics(weeks=ANALYTICS_WEEKS, top_goals=ANALYTICS_TOP_GOALS, today=None):
+    """
+    Current analytics summary, read from the aggregates only
+    """
+    store = get_submission_store()
+    rows = []
+    for dimension in ['overall', *SEGMENT_QUESTIONS, 'service_area']:
+        rows += store.get_aggregates(dimension)
+    first_week = week_key((today or date.today()) - timedelta(weeks=weeks - 1))
+    rows += store.get_aggregates('goals_week', first_week)
+    return summarize(rows, weeks, top_goals)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Lead analytics tools')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('rebuild', help='Recompute the aggregates from the stored submissions')
+    subparsers.add_parser('show', help='Print the analytics summary')
+    args = parser.parse_args(argv)
+
+    if args.command == 'rebuild':
+        counted = get_submission_store().rebuild_aggregates(aggregate_rows)
+        print(f"Rebuilt analytics aggregates from {counted} submission(s)")
+    else:
+        print(json.dumps(get_analytics(), indent=2))
+
+
+if __name__ == '__main__':
+    main()
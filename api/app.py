@@ -1,76 +1,60 @@
-from flask import Flask, request, jsonify, render_template_string
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
+import hmac
 import os
+import secrets
 import json
+import time
 from datetime import datetime
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
 # Import our scoring and report generation functions
-from api.scoring_analysis import calculate_service_area_scores, get_recommendations_for_scores, SERVICE_AREAS
-from api.report_generator import generate_personalized_report
+from api.scoring_analysis import SERVICE_AREAS
+from api.pipeline import AssessmentResult, AssessmentValidationError, get_assessment_pipeline
+from api.storage import email_to_identifier, get_submission_store
+from api.report_cache import get_report_cache, report_cache_key
+from api.report_template import get_report_template
+from api.notifications import notify_lead
+from api.batch_scoring import score_ndjson_stream
+from api.metrics import record_email, record_request, register_endpoints, render_metrics, time_stage
+from api.profiling import install_profiler
+from api.legacy_scoring import calculate_ai_readiness_score_legacy
+from api.shadow_scoring import get_shadow_summary, shadow_score
+from api.analytics import aggregate_rows, get_analytics
+from api.export import EXPORT_FORMATS, ExportFilterError, export_submissions, parse_filters
+from api.idempotency import IDEMPOTENCY_HEADER, IdempotencyError, claim_submission
+from api.request_guard import RequestRejected, read_submission, what_if_schema
+from api.sensitivity import analyze_what_if
 
-def calculate_ai_readiness_score_legacy(data):
-    """
-    Legacy scoring function for backward compatibility
-    """
-    score = 0
-    max_score = 100
-    
-    # Business size scoring
-    if data.get('employees') == '1-10':
-        score += 15
-    elif data.get('employees') == '11-50':
-        score += 20
-    elif data.get('employees') == '51-200':
-        score += 25
-    elif data.get('employees') == '200+':
-        score += 30
-    
-    # Technology adoption scoring
-    tech_tools = data.get('current_tools', [])
-    if isinstance(tech_tools, list):
-        score += min(len(tech_tools) * 5, 20)
-    
-    # Budget scoring
-    if data.get('budget') == 'under-1k':
-        score += 10
-    elif data.get('budget') == '1k-5k':
-        score += 15
-    elif data.get('budget') == '5k-10k':
-        score += 20
-    elif data.get('budget') == '10k-25k':
-        score += 25
-    elif data.get('budget') == '25k+':
-        score += 30
-    
-    # Timeline scoring
-    if data.get('timeline') == 'immediately':
-        score += 15
-    elif data.get('timeline') == '1-3-months':
-        score += 12
-    elif data.get('timeline') == '3-6-months':
-        score += 8
-    elif data.get('timeline') == '6-12-months':
-        score += 5
-    
-    # Goals scoring
-    goals = data.get('goals', [])
-    if isinstance(goals, list):
-        score += min(len(goals) * 3, 15)
-    
-    return min(score, max_score)
+install_profiler(app)  # No-op unless PROFILE_REQUESTS=true and PROFILE_TOKEN is set
+
+# Number of NDJSON records scored together by the batch endpoint
+BATCH_CHUNK_SIZE = int(os.environ.get('BATCH_CHUNK_SIZE', '500'))
+
+# Random bytes in a report token; report URLs must not be guessable from the email
+REPORT_TOKEN_BYTES = 24
+
+# Bearer token for the lead export; the export is disabled while it is unset
+EXPORT_TOKEN = os.environ.get('EXPORT_TOKEN') or None
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def count_request(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        record_request(request.endpoint, response.status_code, time.perf_counter() - started)
+    return response
 
 def send_notification_email(assessment_data, score, service_area_scores=None):
     """Send email notification about new assessment submission"""
     try:
         # Email configuration (you'll need to set these environment variables)
-        smtp_server = os.environ.get('SMTP_SERVER', 'smtp.gmail.com')
-        smtp_port = int(os.environ.get('SMTP_PORT', '587'))
+        # SMTP_SERVER/SMTP_PORT are read by the notification outbox
         email_user = os.environ.get('EMAIL_USER')
         email_password = os.environ.get('EMAIL_PASSWORD')
         recipient_email = os.environ.get('RECIPIENT_EMAIL')
@@ -80,10 +64,7 @@ def send_notification_email(assessment_data, score, service_area_scores=None):
             return False
         
         # Create message
-        msg = MIMEMultipart()
-        msg['From'] = email_user
-        msg['To'] = recipient_email
-        msg['Subject'] = f"New AI Assessment Submission - Overall Score: {score}%"
+        subject = f"New AI Assessment Submission - Overall Score: {score}%"
         
         # Enhanced email body with service area scores
         service_area_info = ""
@@ -121,110 +102,233 @@ def send_notification_email(assessment_data, score, service_area_scores=None):
         Submitted: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
         """
         
-        msg.attach(MIMEText(body, 'plain'))
-        
-        # Send email
-        server = smtplib.SMTP(smtp_server, smtp_port)
-        server.starttls()
-        server.login(email_user, email_password)
-        text = msg.as_string()
-        server.sendmail(email_user, recipient_email, text)
-        server.quit()
-        
-        return True
+        # Send now, or hold for the next digest (EMAIL_DIGEST_SIZE/EMAIL_DIGEST_INTERVAL)
+        return notify_lead(email_user, [recipient_email], subject, body, score, assessment_data)
     except Exception as e:
         print(f"Email sending failed: {str(e)}")
         return False
 
+def score_submission(form_data):
+    """
+    Validate, score, rank and render once, then shadow-score; everything after shares the result.
+    Raises AssessmentValidationError for an invalid submission.
+    """
+    result = get_assessment_pipeline().run(
+        form_data,
+        stage_timer=lambda stage: time_stage('submit_assessment', stage)
+    )
+    with time_stage('submit_assessment', 'shadow'):
+        # Compare all scoring models on live traffic (SHADOW_SCORING=true)
+        shadow_score(result.form_data)
+    return result
+
+def notify_submission(result, data):
+    """
+    Send the notification email for a scored submission; blocks on SMTP when sending inline
+    """
+    with time_stage('submit_assessment', 'email'):
+        # Send notification email with enhanced information
+        email_sent = send_notification_email(data, result.overall_score, result.service_area_scores)
+    record_email(email_sent)
+    return email_sent
+
+def store_submission(result, data):
+    """
+    Store the scored submission, count it in the analytics and cache its report;
+    returns the report token
+    """
+    with time_stage('submit_assessment', 'store'):
+        # Store the scored submission for report retrieval, updating the analytics
+        # aggregates in the same transaction
+        report_token = secrets.token_urlsafe(REPORT_TOKEN_BYTES)
+        submission_id = get_submission_store().save_submission(
+            email_to_identifier(data['email']), data, result.rule_version, aggregate_rows(data), report_token
+        )
+        
+        # Cache the report rendered above so the returned report_url is a hit
+        cache_key = report_cache_key(submission_id, result.rule_version, get_report_template().version)
+        get_report_cache().put(cache_key, result.report_html)
+    return report_token
+
+def submission_response(result, data, report_token):
+    """
+    JSON body returned for an accepted submission, and replayed for its repeats;
+    the handler adds email_sent
+    """
+    print(f"Enhanced Assessment submitted: {data['name']} - Overall Score: {result.overall_score}%")
+    print(f"Service Area Scores: {result.service_area_scores}")
+    
+    # Return success response with report URL
+    return {
+        'success': True,
+        'overall_score': result.overall_score,
+        'service_area_scores': result.service_area_scores,
+        'recommendations': result.recommendations,
+        'percentiles': result.percentiles,
+        'report_url': f'/api/report/{report_token}',
+        'message': 'Assessment submitted successfully'
+    }
+
+def replay_response(claim):
+    """
+    The stored response for a repeated submission; a repeat sends no email
+    """
+    status, body = claim.replay
+    response = jsonify(dict(body, email_sent=False))
+    response.status_code = status
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
 @app.route('/api/submit-assessment', methods=['POST'])
 def submit_assessment():
     try:
-        # Get form data
-        data = request.get_json()
-        
-        if not data:
-            return jsonify({'error': 'No data provided'}), 400
-        
-        # Validate required fields
-        required_fields = ['name', 'email', 'company']
-        for field in required_fields:
-            if not data.get(field):
-                return jsonify({'error': f'Missing required field: {field}'}), 400
-        
-        # Calculate enhanced AI readiness scores
-        service_area_scores = calculate_service_area_scores(data)
-        recommendations = get_recommendations_for_scores(service_area_scores)
-        
-        # Calculate overall score (weighted average)
-        weights = {
-            'marketing_sales': 0.25,
-            'customer_service': 0.25,
-            'business_process': 0.30,
-            'data_analytics': 0.20
-        }
-        overall_score = int(sum(score * weights[area] for area, score in service_area_scores.items()))
-        
-        # Add timestamp and scores to data
-        data['submitted_at'] = datetime.now().isoformat()
-        data['overall_score'] = overall_score
-        data['service_area_scores'] = service_area_scores
-        data['recommendations'] = recommendations
-        
-        # Generate personalized report HTML
-        report_html, report_data = generate_personalized_report(data)
-        
-        # Send notification email with enhanced information
-        email_sent = send_notification_email(data, overall_score, service_area_scores)
-        
-        # Store data (you might want to add database storage here)
-        print(f"Enhanced Assessment submitted: {data['name']} - Overall Score: {overall_score}%")
-        print(f"Service Area Scores: {service_area_scores}")
-        
-        # Return success response with report URL
-        return jsonify({
-            'success': True,
-            'overall_score': overall_score,
-            'service_area_scores': service_area_scores,
-            'recommendations': recommendations,
-            'report_url': f'/api/report/{data["email"].replace("@", "_at_").replace(".", "_dot_")}',
-            'message': 'Assessment submitted successfully',
-            'email_sent': email_sent
-        })
+        # Size, type and answer checks before any scoring work
+        form_data = read_submission(request)
+        # Repeats (double-clicks, retries) get the first response back
+        with claim_submission(request.headers.get(IDEMPOTENCY_HEADER), form_data) as claim:
+            if claim.replay is not None:
+                return replay_response(claim)
+            try:
+                result = score_submission(form_data)
+            except AssessmentValidationError as e:
+                return jsonify({'error': str(e)}), 400
+            data = result.to_submission()
+            
+            # Store and keep the response for repeats before emailing: a failed store
+            # sends nothing, and a retry after the email is replayed, not emailed again
+            report_token = store_submission(result, data)
+            body = claim.complete(submission_response(result, data, report_token))
+            return jsonify(dict(body, email_sent=notify_submission(result, data)))
         
+    except RequestRejected as e:
+        return jsonify(e.body), e.status
+    except IdempotencyError as e:
+        return jsonify({'error': str(e)}), e.status
     except Exception as e:
         print(f"Error processing assessment: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
-@app.route('/api/report/<email_identifier>')
-def get_report(email_identifier):
+@app.route('/api/score-batch', methods=['POST'])
+def score_batch():
+    """
+    Score a JSON-lines body of assessment submissions.
+    The body is read incrementally and one NDJSON result line is streamed back per
+    input line, with per-line errors. Nothing is stored and no notification emails
+    are sent, so results carry no report URL.
+    """
+    results = score_ndjson_stream(request.stream, chunk_size=BATCH_CHUNK_SIZE)
+    return Response(stream_with_context(results), mimetype='application/x-ndjson')
+
+def render_stored_report(submission):
     """
-    Serve personalized report for a specific user
-    Note: In production, you'd want to implement proper authentication/security
+    Render a report from a scored submission's stored scores and recommendations
+    """
+    return get_assessment_pipeline().render(AssessmentResult.from_submission(submission))
+
+def find_report(report_token):
+    """
+    (submission_id, rule_version) of the submission a report token belongs to, or None
+    """
+    with time_stage('get_report', 'lookup'):
+        # Find the stored submission with one indexed read
+        return get_submission_store().get_submission_ref_by_report_token(report_token)
+
+def load_report(submission_ref):
+    """
+    (body, etag) of a stored submission's report
+    """
+    submission_id, rule_version = submission_ref
+    with time_stage('get_report', 'render'):
+        # Serve the cached rendering, rendering it once on a miss
+        cache_key = report_cache_key(submission_id, rule_version, get_report_template().version)
+        return get_report_cache().get_or_render(
+            cache_key, lambda: render_stored_report(get_submission_store().get_submission(submission_id))
+        )
+
+def report_response(body, etag):
+    response = Response(body, mimetype='text/html')
+    response.headers['ETag'] = etag
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response.make_conditional(request)
+
+@app.route('/api/report/<report_token>')
+def get_report(report_token):
+    """
+    Serve personalized report for a specific user. The token is random and only
+    ever returned to the submitter, so the URL is the credential.
     """
     try:
-        # For demo purposes, we'll generate a sample report
-        # In production, you'd retrieve the actual assessment data from a database
+        submission_ref = find_report(report_token)
+        if submission_ref is None:
+            return jsonify({'error': 'Report not found'}), 404
         
-        sample_data = {
-            'name': 'Sample User',
-            'email': email_identifier.replace('_at_', '@').replace('_dot_', '.'),
-            'company': 'Sample Company',
-            'employees': '11-50',
-            'industry': 'retail',
-            'current_tools': ['crm', 'analytics'],
-            'budget': '5k-10k',
-            'timeline': '1-3-months',
-            'goals': ['customer-experience', 'automation']
-        }
-        
-        report_html, report_data = generate_personalized_report(sample_data)
-        
-        return report_html, 200, {'Content-Type': 'text/html'}
+        body, etag = load_report(submission_ref)
+        return report_response(body, etag)
         
     except Exception as e:
         print(f"Error generating report: {str(e)}")
         return jsonify({'error': 'Report generation failed'}), 500
 
+@app.route('/api/metrics')
+def metrics():
+    """
+    Per-stage latency histograms, email outcomes and request counts in Prometheus
+    text format, aggregated across all worker processes sharing METRICS_DIR
+    """
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/shadow-scoring')
+def shadow_scoring():
+    """
+    Bounded summary of how the three scoring models disagree on live submissions
+    """
+    return jsonify(get_shadow_summary())
+
+@app.route('/api/analytics')
+def analytics():
+    """
+    Score distributions by industry, company size, budget and service area, and
+    the top goals by week, read from incrementally maintained aggregates
+    """
+    return jsonify(get_analytics())
+
+@app.route('/api/export')
+def export():
+    """
+    Stream scored submissions as CSV or JSON lines for CRM import.
+    Query parameters: format (csv, jsonl), since, until, min_score, industry,
+    cursor (resume after this submission id) and limit.
+    """
+    if EXPORT_TOKEN is None:
+        return jsonify({'error': 'Export is disabled'}), 403
+    if not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {EXPORT_TOKEN}'):
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    export_format = request.args.get('format', 'csv')
+    try:
+        chunks = export_submissions(export_format, parse_filters(request.args))
+    except ExportFilterError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    response = Response(stream_with_context(chunks), mimetype=EXPORT_FORMATS[export_format])
+    response.headers['Content-Disposition'] = f'attachment; filename=leads.{export_format}'
+    return response
+
+@app.route('/api/what-if', methods=['POST'])
+def what_if():
+    """
+    Score and level deltas for every alternative single-choice answer and every
+    checkbox toggle of a submission, ranked by impact
+    """
+    try:
+        form_data = read_submission(request, schema=what_if_schema)
+        return jsonify(analyze_what_if(form_data))
+    except RequestRejected as e:
+        return jsonify(e.body), e.status
+    except Exception as e:
+        print(f"Error running what-if analysis: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
 @app.route('/api/health')
 def health_check():
     """Health check endpoint"""
@@ -242,11 +346,20 @@ def index():
         'version': '2.0.0',
         'endpoints': {
             'submit_assessment': '/api/submit-assessment',
-            'get_report': '/api/report/<email_identifier>',
+            'score_batch': '/api/score-batch',
+            'get_report': '/api/report/<report_token>',
+            'metrics': '/api/metrics',
+            'shadow_scoring': '/api/shadow-scoring',
+            'analytics': '/api/analytics',
+            'export': '/api/export',
+            'what_if': '/api/what-if',
             'health_check': '/api/health'
         }
     })
 
+# One request counter and latency histogram per route
+register_endpoints(rule.endpoint for rule in app.url_map.iter_rules())
+
 # For Vercel serverless functions
 def handler(request):
     return app(request.environ, lambda status, headers: None)
@@ -0,0 +1,358 @@
+"""
+ASGI Serving Mode
+Serves the API on an ASGI server so requests waiting on SMTP, SQLite or the report
+cache no longer hold a worker. Submission and report requests run as coroutines
+that only read the (size-capped) body and check it on the event loop; all other
+work goes to fixed-size thread pools (ASGI_CPU_THREADS for scoring and rendering,
+ASGI_IO_THREADS for SQLite and cache files, ASGI_SMTP_THREADS for inline
+notification emails). They pass through the Flask app's before/after request
+hooks, so metrics are recorded as for the WSGI app. Every other route, and any
+request selected by the request profiler, is passed to the Flask app through a
+streaming WSGI bridge on ASGI_WSGI_THREADS threads.
+
+At most ASGI_MAX_CONCURRENCY requests are handled at once per process; the rest
+wait, and a request still waiting after ASGI_QUEUE_TIMEOUT seconds gets a 503.
+Responses are built by the Flask app's own response machinery (JSON encoding,
+CORS headers, conditional requests), so they match the WSGI endpoints.
+
+Run with:
+    uvicorn api.asgi:app --workers 4 --no-access-log
+    gunicorn -c gunicorn.conf.py -k uvicorn.workers.UvicornWorker api.asgi:app
+"""
+
+import asyncio
+import contextvars
+import io
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from flask import jsonify, request
+from werkzeug.exceptions import HTTPException
+
+from api.app import app as flask_app
+from api.app import (find_report, load_report, notify_submission, replay_response, report_response,
+                     score_submission, store_submission, submission_response)
+from api.metrics import record_request
+from api.idempotency import IDEMPOTENCY_HEADER, IdempotencyError, claim_submission
+from api.pipeline import AssessmentValidationError
+from api.profiling import ProfilingMiddleware
+from api.request_guard import MAX_SUBMISSION_BYTES, RequestRejected, read_submission
+
+ASGI_MAX_CONCURRENCY = int(os.environ.get('ASGI_MAX_CONCURRENCY', '256'))
+ASGI_QUEUE_TIMEOUT = float(os.environ.get('ASGI_QUEUE_TIMEOUT', '10'))
+ASGI_CPU_THREADS = int(os.environ.get('ASGI_CPU_THREADS', str(os.cpu_count() or 1)))
+ASGI_IO_THREADS = int(os.environ.get('ASGI_IO_THREADS', '16'))
+ASGI_SMTP_THREADS = int(os.environ.get('ASGI_SMTP_THREADS', '32'))
+ASGI_WSGI_THREADS = int(os.environ.get('ASGI_WSGI_THREADS', '8'))
+
+WARMUP = os.environ.get('WARMUP', 'true').lower() != 'false'
+
+cpu_executor = ThreadPoolExecutor(max_workers=ASGI_CPU_THREADS, thread_name_prefix='asgi-cpu')
+io_executor = ThreadPoolExecutor(max_workers=ASGI_IO_THREADS, thread_name_prefix='asgi-io')
+smtp_executor = ThreadPoolExecutor(max_workers=ASGI_SMTP_THREADS, thread_name_prefix='asgi-smtp')
+wsgi_executor = ThreadPoolExecutor(max_workers=ASGI_WSGI_THREADS, thread_name_prefix='asgi-wsgi')
+
+_DONE = object()
+
+
+def run_blocking(executor, func, *args):
+    return asyncio.get_running_loop().run_in_executor(executor, partial(func, *args))
+
+
+def build_environ(scope, stream):
+    """
+    WSGI environ for an ASGI HTTP scope, reading the body from stream
+    """
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client')
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': stream,
+        'wsgi.input_terminated': True,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False
+    }
+    if client:
+        environ['REMOTE_ADDR'], environ['REMOTE_PORT'] = client[0], str(client[1])
+    for raw_name, raw_value in scope.get('headers', []):
+        name = raw_name.decode('latin-1').upper().replace('-', '_')
+        value = raw_value.decode('latin-1')
+        if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            name = f'HTTP_{name}'
+        environ[name] = f'{environ[name]},{value}' if name in environ else value
+    return environ
+
+
+async def read_body(receive, limit=None):
+    """
+    The request body, or its first limit + 1 bytes when it is longer than limit
+    """
+    chunks = []
+    size = 0
+    while limit is None or size <= limit:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            break
+        chunk = message.get('body', b'')
+        chunks.append(chunk)
+        size += len(chunk)
+        if not message.get('more_body', False):
+            break
+    body = b''.join(chunks)
+    return body if limit is None else body[:limit + 1]
+
+
+class _ReceiveStream(io.RawIOBase):
+    """
+    Blocking file object over ASGI receive, for WSGI code running in a worker thread
+    """
+
+    def __init__(self, receive, loop):
+        self._receive = receive
+        self._loop = loop
+        self._buffer = b''
+        self._done = False
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._buffer and not self._done:
+            message = asyncio.run_coroutine_threadsafe(self._receive(), self._loop).result()
+            if message['type'] == 'http.disconnect':
+                self._done = True
+                break
+            self._buffer = message.get('body', b'')
+            self._done = not message.get('more_body', False)
+        size = min(len(buffer), len(self._buffer))
+        buffer[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+
+def encode_headers(headers):
+    return [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+
+
+async def send_response(send, response, environ):
+    """
+    Send a finished, non-streaming Flask response as the WSGI server would
+    (e.g. without entity headers on a 304)
+    """
+    app_iter, status, headers = response.get_wsgi_response(environ)
+    await send({'type': 'http.response.start', 'status': int(status.split(' ', 1)[0]),
+                'headers': encode_headers(headers)})
+    await send({'type': 'http.response.body', 'body': b''.join(app_iter)})
+
+
+async def call_wsgi(environ, receive, send):
+    """
+    Run the Flask app for one request on the WSGI threads, streaming the response
+    """
+    loop = asyncio.get_running_loop()
+    environ['wsgi.input'] = io.BufferedReader(_ReceiveStream(receive, loop))
+    started = {}
+
+    def start_response(status, headers, exc_info=None):
+        started['status'] = int(status.split(' ', 1)[0])
+        started['headers'] = encode_headers(headers)
+
+    # Each step may run on a different thread; one context keeps Flask's context
+    # variables intact for streamed responses (stream_with_context)
+    context = contextvars.copy_context()
+    iterable = await loop.run_in_executor(wsgi_executor, context.run, flask_app, environ, start_response)
+    try:
+        iterator = iter(iterable)
+        chunk = await loop.run_in_executor(wsgi_executor, context.run, next, iterator, _DONE)
+        await send({'type': 'http.response.start', 'status': started['status'], 'headers': started['headers']})
+        while chunk is not _DONE:
+            if chunk:
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            chunk = await loop.run_in_executor(wsgi_executor, context.run, next, iterator, _DONE)
+        await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        if hasattr(iterable, 'close'):
+            await loop.run_in_executor(wsgi_executor, context.run, iterable.close)
+
+
+async def submit_assessment():
+    try:
+        form_data = read_submission(request)
+        # Claiming may wait for an identical request in flight, so it runs off the loop
+        claim = await run_blocking(io_executor, claim_submission, request.headers.get(IDEMPOTENCY_HEADER), form_data)
+        try:
+            if claim.replay is not None:
+                return replay_response(claim)
+            try:
+                result = await run_blocking(cpu_executor, score_submission, form_data)
+            except AssessmentValidationError as e:
+                return jsonify({'error': str(e)}), 400
+            data = result.to_submission()
+
+            # Store and keep the response for repeats before emailing, as the WSGI app does
+            report_token = await run_blocking(io_executor, store_submission, result, data)
+            body = await run_blocking(io_executor, claim.complete, submission_response(result, data, report_token))
+            email_sent = await run_blocking(smtp_executor, notify_submission, result, data)
+            return jsonify(dict(body, email_sent=email_sent))
+        finally:
+            if not claim.done:
+                await run_blocking(io_executor, claim.release)
+
+    except RequestRejected as e:
+        return jsonify(e.body), e.status
+    except IdempotencyError as e:
+        return jsonify({'error': str(e)}), e.status
+    except Exception as e:
+        print(f"Error processing assessment: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+
+async def get_report(report_token):
+    try:
+        submission_ref = await run_blocking(io_executor, find_report, report_token)
+        if submission_ref is None:
+            return jsonify({'error': 'Report not found'}), 404
+
+        # A cache miss renders the report
+        body, etag = await run_blocking(cpu_executor, load_report, submission_ref)
+        return report_response(body, etag)
+
+    except Exception as e:
+        print(f"Error generating report: {str(e)}")
+        return jsonify({'error': 'Report generation failed'}), 500
+
+
+# Endpoints served as coroutines, with the most body each reads; the rest go
+# through the WSGI bridge
+NATIVE_HANDLERS = {
+    'submit_assessment': (submit_assessment, MAX_SUBMISSION_BYTES),
+    'get_report': (get_report, 0)
+}
+
+
+async def call_native(environ, route, receive, send):
+    handler, max_body = route
+    # An over-long body is cut off after max_body + 1 bytes; the guard rejects it
+    environ['wsgi.input'] = io.BytesIO(await read_body(receive, max_body))
+    with flask_app.request_context(environ):
+        # The same before/after request hooks as a dispatch through the WSGI app
+        rv = flask_app.preprocess_request()
+        if rv is None:
+            rv = await handler(**request.view_args)
+        response = flask_app.process_response(flask_app.make_response(rv))
+    await send_response(send, response, environ)
+
+
+def profiled(environ):
+    """
+    Whether the request profiler selected this request; profiled requests take
+    the WSGI bridge, where the profiler wraps the whole request
+    """
+    wsgi_app = flask_app.wsgi_app
+    return isinstance(wsgi_app, ProfilingMiddleware) and wsgi_app.selects(environ)
+
+
+def match_endpoint(environ):
+    try:
+        endpoint, _ = flask_app.url_map.bind_to_environ(environ).match()
+    except HTTPException:
+        return None
+    return endpoint
+
+
+async def send_busy(send, environ, started):
+    """
+    503 for a request that waited too long for a free slot
+    """
+    with flask_app.request_context(environ):
+        rv = jsonify({'error': 'Server busy'}), 503, {'Retry-After': str(max(1, int(ASGI_QUEUE_TIMEOUT)))}
+        response = flask_app.process_response(flask_app.make_response(rv))
+        record_request(request.endpoint, response.status_code, time.perf_counter() - started)
+    await send_response(send, response, environ)
+
+
+class _Limiter:
+    """
+    Caps the requests handled at once; created on first use inside the event loop
+    """
+
+    def __init__(self, limit, timeout):
+        self.limit = limit
+        self.timeout = timeout
+        self._semaphore = None
+
+    async def acquire(self):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.limit)
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def release(self):
+        self._semaphore.release()
+
+
+limiter = _Limiter(ASGI_MAX_CONCURRENCY, ASGI_QUEUE_TIMEOUT)
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            # Send lead digests held by processes that have since exited
+            from api.notifications import recover_digests
+            await run_blocking(io_executor, recover_digests)
+            if WARMUP:
+                from api.warmup import warm_up
+                from api.metrics import registry
+                registry.store()  # create this process's metrics file up front
+                elapsed = await run_blocking(io_executor, warm_up)
+                print(f"ASGI warm-up done in {elapsed * 1000:.1f} ms")
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            # Deliver (or spill to disk) queued emails before the process exits
+            from api.notifications import shutdown_outbox
+            await run_blocking(smtp_executor, shutdown_outbox)
+            # Keep this process's counts without leaving its file behind
+            from api.metrics import registry
+            registry.fold_process(os.getpid())
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        raise RuntimeError(f"Unsupported ASGI scope type: {scope['type']}")
+
+    started = time.perf_counter()
+    environ = build_environ(scope, None)
+    if not await limiter.acquire():
+        await send_busy(send, environ, started)
+        return
+    try:
+        route = NATIVE_HANDLERS.get(match_endpoint(environ))
+        if route is not None and not profiled(environ):
+            await call_native(environ, route, receive, send)
+        else:
+            await call_wsgi(environ, receive, send)
+    finally:
+        limiter.release()
+
@@ -0,0 +1,240 @@
+"""
+Batch Report Generation
+Pre-generates personalized report HTML for a JSON-lines file of submissions
+(e.g. event sign-ups), fanned out over a process pool
+
+    python -m api.batch_reports leads.jsonl --output-dir reports --workers 4
+
+Each worker loads the scoring rules, score table and compiled report template once
+and then renders its share of the submissions. Reports are written as
+<email identifier>.html. A manifest in the output directory records a content
+hash per report: the submission's answers, the rule version and the template
+version. A report whose hash is unchanged and whose file still exists is
+skipped, so re-running after adding leads or fixing a few lines only renders
+what changed.
+"""
+
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import sys
+import time
+
+from api.batch_scoring import read_ndjson_records
+from api.pipeline import RESULT_FIELDS, get_assessment_pipeline
+from api.report_template import get_report_template
+from api.scoring_analysis import get_active_rules
+from api.storage import email_to_identifier
+
+MANIFEST_NAME = '.report-manifest.json'
+
+# Report file names keep only characters that are safe in any file system
+UNSAFE_FILENAME_CHARS = re.compile(r'[^A-Za-z0-9_+-]')
+MAX_FILENAME_LENGTH = 150
+
+_worker_state = {}
+
+
+def report_filename(record, line_number, taken):
+    base = UNSAFE_FILENAME_CHARS.sub('_', email_to_identifier(str(record['email'])))[:MAX_FILENAME_LENGTH]
+    name = f'{base}.html'
+    if name in taken:
+        # The same lead twice in one file; keep both
+        name = f'{base}-{line_number}.html'
+    taken.add(name)
+    return name
+
+
+def content_hash(record, rule_version, template_version):
+    """
+    Hash of everything a report's HTML is rendered from
+    """
+    payload = json.dumps(record, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(f'{payload}\0{rule_version}\0{template_version}'.encode('utf-8')).hexdigest()
+
+
+def load_manifest(output_dir):
+    try:
+        with open(os.path.join(output_dir, MANIFEST_NAME)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return manifest if isinstance(manifest, dict) else {}
+
+
+def save_manifest(output_dir, manifest):
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def init_worker(output_dir):
+    """
+    Load the rules, score table and template once per worker process
+    """
+    from api.score_table import get_score_table
+
+    rules = get_active_rules()
+    get_score_table(rules)
+    get_report_template()
+    _worker_state.update(output_dir=output_dir, rules=rules, pipeline=get_assessment_pipeline())
+
+
+def render_job(job):
+    """
+    Render and write one report. Returns (line_number, filename, hash, error).
+    """
+    line_number, filename, record, report_hash = job
+    pipeline = _worker_state['pipeline']
+    rules = _worker_state['rules']
+    try:
+        form_data = {k: v for k, v in record.items() if k not in RESULT_FIELDS}
+        scores = pipeline.score(form_data, rules)
+        result = pipeline.build_result(form_data, scores, rules, submitted_at=record.get('submitted_at'))
+        html = pipeline.render(result)
+
+        path = os.path.join(_worker_state['output_dir'], filename)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(html)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        return line_number, filename, None, f'{type(e).__name__}: {e}'
+    return line_number, filename, report_hash, None
+
+
+def plan_jobs(stream, output_dir, manifest, force=False):
+    """
+    Read the input and split it into jobs to render, reports already current,
+    and (line_number, error) for lines that cannot be rendered
+    """
+    rule_version = get_active_rules().rule_version
+    template_version = get_report_template().version
+    jobs, current, errors = [], [], []
+    taken = set()
+    for line_number, record, error in read_ndjson_records(stream):
+        if error is not None:
+            errors.append((line_number, error))
+            continue
+        filename = report_filename(record, line_number, taken)
+        report_hash = content_hash(record, rule_version, template_version)
+        if not force and manifest.get(filename) == report_hash and os.path.exists(os.path.join(output_dir, filename)):
+            current.append(filename)
+            continue
+        jobs.append((line_number, filename, record, report_hash))
+    return jobs, current, errors
+
+
+class Progress:
+    """
+    Prints done/total and throughput to stderr at most once per interval
+    """
+
+    def __init__(self, total, interval=1.0, stream=sys.stderr):
+        self.total = total
+        self.interval = interval
+        self.stream = stream
+        self.done = 0
+        self.failed = 0
+        self.started = time.perf_counter()
+        self._printed_at = self.started
+
+    def update(self, failed=False):
+        self.done += 1
+        self.failed += failed
+        now = time.perf_counter()
+        if now - self._printed_at >= self.interval or self.done == self.total:
+            self._printed_at = now
+            self.stream.write(f'  {self.done}/{self.total} reports ({self.done * 100 // max(self.total, 1)}%)'
+                              f'  {self.rate():.1f} reports/s  {self.failed} failed\n')
+            self.stream.flush()
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def rate(self):
+        elapsed = self.elapsed()
+        return self.done / elapsed if elapsed else 0.0
+
+
+def generate_reports(stream, output_dir, workers=None, force=False, progress_interval=1.0):
+    """
+    Render every submission in a JSON-lines stream into output_dir. Returns a
+    summary dict.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = load_manifest(output_dir)
+    jobs, current, errors = plan_jobs(stream, output_dir, manifest, force)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(jobs) or 1))
+
+    progress = Progress(len(jobs), progress_interval)
+    written = 0
+    pool = None
+    try:
+        if workers == 1:
+            init_worker(output_dir)
+            outcomes = map(render_job, jobs)
+        else:
+            pool = multiprocessing.Pool(workers, initializer=init_worker, initargs=(output_dir,))
+            outcomes = pool.imap_unordered(render_job, jobs, chunksize=max(1, min(32, len(jobs) // (workers * 8))))
+        for line_number, filename, report_hash, error in outcomes:
+            if error is None:
+                manifest[filename] = report_hash
+                written += 1
+            else:
+                manifest.pop(filename, None)
+                errors.append((line_number, error))
+            progress.update(failed=error is not None)
+        if pool is not None:
+            pool.close()
+            pool.join()
+    finally:
+        if pool is not None:
+            pool.terminate()
+        # Record what was written even if the run was interrupted
+        save_manifest(output_dir, manifest)
+
+    elapsed = progress.elapsed()
+    return {
+        'written': written,
+        'skipped_current': len(current),
+        'failed': len(errors),
+        'errors': [{'line': line_number, 'error': error} for line_number, error in sorted(errors)],
+        'workers': workers,
+        'elapsed_s': round(elapsed, 3),
+        'reports_per_s': round(written / elapsed, 1) if elapsed else 0.0
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Pre-generate personalized reports from a JSON-lines file')
+    parser.add_argument('input', help="JSON-lines file of submissions ('-' for stdin)")
+    parser.add_argument('--output-dir', required=True)
+    parser.add_argument('--workers', type=int, help='Worker processes (default: one per CPU)')
+    parser.add_argument('--force', action='store_true', help='Re-render reports that are already current')
+    parser.add_argument('--progress-interval', type=float, default=1.0, help='Seconds between progress lines')
+    args = parser.parse_args(argv)
+
+    if args.input == '-':
+        summary = generate_reports(sys.stdin.buffer, args.output_dir, args.workers, args.force,
+                                   args.progress_interval)
+    else:
+        with open(args.input, 'rb') as stream:
+            summary = generate_reports(stream, args.output_dir, args.workers, args.force, args.progress_interval)
+
+    for error in summary['errors']:
+        print(f"Line {error['line']}: {error['error']}", file=sys.stderr)
+    print(f"Wrote {summary['written']} report(s), {summary['skipped_current']} already current, "
+          f"{summary['failed']} failed, in {summary['elapsed_s']}s "
+          f"({summary['reports_per_s']} reports/s, {summary['workers']} worker(s))")
+    if summary['failed']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
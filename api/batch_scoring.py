@@ -0,0 +1,96 @@
+"""
+Batch Scoring
+Reads JSON-lines assessment dumps incrementally and scores them in chunks
+"""
+
+import json
+
+from api.pipeline import find_missing_field, get_assessment_pipeline
+
+# Lines longer than this are rejected without being buffered in full
+MAX_LINE_BYTES = 64 * 1024
+
+
+def read_ndjson_records(stream, max_line_bytes=MAX_LINE_BYTES):
+    """
+    Yield (line_number, record, error) for each non-blank line of a binary stream.
+    Only one line is held in memory at a time.
+    """
+    line_number = 0
+    while True:
+        raw = stream.readline(max_line_bytes + 1)
+        if not raw:
+            break
+        line_number += 1
+
+        if len(raw) > max_line_bytes and not raw.endswith(b'\n'):
+            # Drain the rest of the oversized line before moving on
+            while raw and not raw.endswith(b'\n'):
+                raw = stream.readline(max_line_bytes + 1)
+            yield line_number, None, f'Line exceeds {max_line_bytes} bytes'
+            continue
+
+        if not raw.strip():
+            continue
+
+        try:
+            record = json.loads(raw)
+        except ValueError as e:
+            yield line_number, None, f'Invalid JSON: {e}'
+            continue
+
+        if not isinstance(record, dict):
+            yield line_number, None, 'Record must be a JSON object'
+            continue
+
+        missing = find_missing_field(record)
+        if missing:
+            yield line_number, None, f'Missing required field: {missing}'
+            continue
+
+        yield line_number, record, None
+
+
+def score_chunk(chunk):
+    """
+    Score a list of (line_number, record, error) entries and yield one result dict
+    per entry, in input order
+    """
+    valid = [record for _, record, error in chunk if error is None]
+    results = iter(get_assessment_pipeline().run_batch(valid))
+
+    for line_number, record, error in chunk:
+        if error is not None:
+            yield {'line': line_number, 'success': False, 'error': error}
+            continue
+
+        result = next(results)
+        if isinstance(result, TypeError):
+            yield {'line': line_number, 'success': False, 'error': f'Invalid answer value: {result}'}
+            continue
+
+        yield {
+            'line': line_number,
+            'success': True,
+            'email': record['email'],
+            'overall_score': result.overall_score,
+            'service_area_scores': result.service_area_scores,
+            'recommendations': result.recommendations
+        }
+
+
+def score_ndjson_stream(stream, chunk_size=500):
+    """
+    Score a JSON-lines stream chunk by chunk and yield one NDJSON result line per
+    input line. Memory use is bounded by chunk_size regardless of stream length.
+    """
+    chunk = []
+    for entry in read_ndjson_records(stream):
+        chunk.append(entry)
+        if len(chunk) >= chunk_size:
+            for result in score_chunk(chunk):
+                yield json.dumps(result) + '\n'
+            chunk = []
+
+    for result in score_chunk(chunk):
+        yield json.dumps(result) + '\n'
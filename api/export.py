@@ -0,0 +1,174 @@
+"""
+Scored Lead Export
+Streams stored submissions with their overall, per-area scores and levels as CSV
+or JSON lines for CRM import. Rows are read a page at a time and written out in
+chunks, so memory use does not grow with the number of leads.
+
+Filters: since/until (ISO date or datetime on submitted_at; since inclusive,
+until exclusive), min_score (overall) and industry. Every row carries its
+submission id; pass the last id received as cursor to resume an interrupted
+export.
+
+    GET /api/export?format=csv&since=2025-01-01&min_score=60&industry=retail
+        (requires Authorization: Bearer $EXPORT_TOKEN; disabled while EXPORT_TOKEN is unset)
+    python -m api.export --format jsonl --since 2025-01-01 --output leads.jsonl
+"""
+
+import argparse
+import csv
+import io
+import json
+import sys
+from datetime import datetime
+
+from api.scoring_analysis import ASSESSMENT_QUESTIONS, SERVICE_AREAS
+from api.storage import get_submission_store
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson'
+}
+
+# Rows written per chunk of streamed output
+EXPORT_CHUNK_ROWS = 200
+
+# Multi-choice answers are joined into one CSV cell
+LIST_SEPARATOR = ';'
+
+# Spreadsheets run a cell starting with one of these as a formula; CSV cells that
+# do are prefixed with a quote so they open as text (JSON lines stay raw)
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+CSV_COLUMNS = (
+    ['id', 'submitted_at']
+    + list(ASSESSMENT_QUESTIONS)
+    + ['additional_info', 'overall_score']
+    + [f'{area}_{field}' for area in SERVICE_AREAS for field in ('score', 'level', 'priority')]
+    + ['rule_version']
+)
+
+
+class ExportFilterError(ValueError):
+    """
+    Raised for an invalid export filter or cursor
+    """
+
+
+def parse_filters(params):
+    """
+    Validated iter_submissions arguments from query-string style parameters
+    """
+    filters = {}
+    for name in ('since', 'until'):
+        value = params.get(name)
+        if value:
+            try:
+                datetime.fromisoformat(value)
+            except ValueError:
+                raise ExportFilterError(f'{name} must be an ISO date or datetime')
+            filters[name] = value
+    for name, key in (('min_score', 'min_score'), ('cursor', 'after_id'), ('limit', 'limit')):
+        value = params.get(name)
+        if value not in (None, ''):
+            try:
+                filters[key] = int(value)
+            except ValueError:
+                raise ExportFilterError(f'{name} must be an integer')
+            if filters[key] < 0:
+                raise ExportFilterError(f'{name} must not be negative')
+    if params.get('industry'):
+        filters['industry'] = params['industry']
+    return filters
+
+
+def csv_cell(value):
+    """
+    A CSV cell value that a spreadsheet will not evaluate as a formula
+    """
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def csv_row(submission):
+    row = {'id': submission['id'], 'submitted_at': submission.get('submitted_at'),
+           'additional_info': submission.get('additional_info'), 'overall_score': submission.get('overall_score'),
+           'rule_version': submission.get('rule_version')}
+    for question in ASSESSMENT_QUESTIONS:
+        value = submission.get(question)
+        row[question] = LIST_SEPARATOR.join(map(str, value)) if isinstance(value, list) else value
+    scores = submission.get('service_area_scores') or {}
+    recommendations = submission.get('recommendations') or {}
+    for area in SERVICE_AREAS:
+        area_recommendations = recommendations.get(area) or {}
+        row[f'{area}_score'] = scores.get(area)
+        row[f'{area}_level'] = area_recommendations.get('level')
+        row[f'{area}_priority'] = area_recommendations.get('priority')
+    return {column: csv_cell(value) for column, value in row.items()}
+
+
+def export_rows(export_format, submissions, chunk_rows=EXPORT_CHUNK_ROWS):
+    """
+    Yield the export as text chunks of up to chunk_rows rows each
+    """
+    buffer = io.StringIO()
+    if export_format == 'csv':
+        writer = csv.DictWriter(buffer, fieldnames=CSV_COLUMNS, extrasaction='ignore')
+        writer.writeheader()
+        write = lambda submission: writer.writerow(csv_row(submission))
+    else:
+        write = lambda submission: buffer.write(json.dumps(submission) + '\n')
+
+    pending = 0
+    for submission in submissions:
+        write(submission)
+        pending += 1
+        if pending >= chunk_rows:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def export_submissions(export_format, filters, chunk_rows=EXPORT_CHUNK_ROWS):
+    """
+    Stream the matching submissions in export_format as text chunks
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ExportFilterError(f'format must be one of {", ".join(EXPORT_FORMATS)}')
+    return export_rows(export_format, get_submission_store().iter_submissions(**filters), chunk_rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Export scored submissions for CRM import')
+    parser.add_argument('--format', choices=sorted(EXPORT_FORMATS), default='csv')
+    parser.add_argument('--since', help='Submitted at or after (ISO date or datetime)')
+    parser.add_argument('--until', help='Submitted before (ISO date or datetime)')
+    parser.add_argument('--min-score', help='Minimum overall score')
+    parser.add_argument('--industry')
+    parser.add_argument('--cursor', help='Resume after this submission id')
+    parser.add_argument('--limit', help='Export at most this many rows')
+    parser.add_argument('--output', help='Write to this file instead of stdout')
+    args = parser.parse_args(argv)
+
+    try:
+        filters = parse_filters({
+            'since': args.since, 'until': args.until, 'min_score': args.min_score,
+            'industry': args.industry, 'cursor': args.cursor, 'limit': args.limit
+        })
+    except ExportFilterError as e:
+        parser.error(str(e))
+
+    output = open(args.output, 'w', newline='') if args.output else sys.stdout
+    try:
+        for chunk in export_submissions(args.format, filters):
+            output.write(chunk)
+    finally:
+        if args.output:
+            output.close()
+
+
+if __name__ == '__main__':
+    main()
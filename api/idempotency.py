@@ -0,0 +1,163 @@
+"""
+Idempotent Submissions
+Repeats of a submission (double-clicks, client retries) get the first request's
+response back instead of being scored, stored and emailed again
+
+A request is identified by its Idempotency-Key header or, without one, by a hash
+of its canonical JSON payload. Keys live in the submissions database, so every
+worker and process sees them. The first request claims its key before doing any
+work. A repeat that arrives while the claim is in flight waits up to
+IDEMPOTENCY_WAIT seconds for the response. Successful responses are kept for
+IDEMPOTENCY_TTL seconds, and at most IDEMPOTENCY_MAX_ENTRIES keys are kept.
+Failed or rejected requests release their claim so they can be retried.
+Disable with IDEMPOTENCY=false.
+"""
+
+import hashlib
+import json
+import os
+import time
+
+from api.storage import get_submission_store
+
+IDEMPOTENCY_ENABLED = os.environ.get('IDEMPOTENCY', 'true').lower() != 'false'
+IDEMPOTENCY_TTL = float(os.environ.get('IDEMPOTENCY_TTL', '600'))
+IDEMPOTENCY_MAX_ENTRIES = int(os.environ.get('IDEMPOTENCY_MAX_ENTRIES', '10000'))
+IDEMPOTENCY_WAIT = float(os.environ.get('IDEMPOTENCY_WAIT', '10'))
+# A claim still in flight after this long is treated as abandoned (e.g. a killed worker)
+IDEMPOTENCY_ABANDON_AFTER = float(os.environ.get('IDEMPOTENCY_ABANDON_AFTER', '60'))
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+# Expired keys are pruned once every this many claims per process
+PRUNE_EVERY = 100
+
+POLL_INTERVAL = 0.05
+
+
+class IdempotencyError(Exception):
+    """
+    Raised when a request cannot be matched to an earlier one; carries the HTTP status
+    """
+
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.status = status
+
+
+def payload_hash(payload):
+    """
+    Hash of a JSON payload that ignores key order and whitespace
+    """
+    canonical = json.dumps(payload, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class Claim:
+    """
+    One request's hold on its idempotency key. replay is the earlier response as
+    (status, body) when the request is a repeat; otherwise the caller processes
+    the request and then calls complete() or release().
+    """
+
+    def __init__(self, store=None, key=None, created_at=None, replay=None):
+        self.store = store
+        self.key = key
+        self.created_at = created_at
+        self.replay = replay
+        self.done = store is None or replay is not None
+
+    def complete(self, body, status=200):
+        """
+        Keep a response body (a JSON-serializable dict) for repeats; returns it
+        """
+        if not self.done:
+            try:
+                self.store.complete_idempotency_key(self.key, self.created_at, status, json.dumps(body))
+                self.done = True
+            except Exception as e:
+                # The submission succeeded; losing its replay only risks a duplicate
+                print(f"Idempotency record failed for {self.key}: {str(e)}")
+        return body
+
+    def release(self):
+        """
+        Forget the claim without a response, so the request can be retried
+        """
+        if not self.done:
+            self.store.release_idempotency_key(self.key, self.created_at)
+            self.done = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+class IdempotencyCache:
+    def __init__(self, store, ttl=IDEMPOTENCY_TTL, max_entries=IDEMPOTENCY_MAX_ENTRIES, wait=IDEMPOTENCY_WAIT,
+                 abandon_after=IDEMPOTENCY_ABANDON_AFTER):
+        self.store = store
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.wait = wait
+        self.abandon_after = abandon_after
+        self._claims = 0
+
+    def claim(self, header_key, payload):
+        """
+        Claim the request's key, or return the earlier response for a repeat.
+        Blocks while an identical request is in flight. Raises IdempotencyError
+        for a key reused with a different payload (422) or one still in flight
+        after the wait (409).
+        """
+        if header_key is not None:
+            header_key = header_key.strip()
+            if not header_key or len(header_key) > MAX_KEY_LENGTH:
+                raise IdempotencyError(f'{IDEMPOTENCY_HEADER} must be 1-{MAX_KEY_LENGTH} characters', 400)
+        request_hash = payload_hash(payload)
+        key = f'key:{header_key}' if header_key else f'payload:{request_hash}'
+
+        self._claims += 1
+        if self._claims % PRUNE_EVERY == 0:
+            self.store.prune_idempotency_keys(time.time() - self.ttl, self.max_entries)
+
+        deadline = time.monotonic() + self.wait
+        while True:
+            now = time.time()
+            if self.store.claim_idempotency_key(key, request_hash, now, now - self.ttl, now - self.abandon_after):
+                return Claim(self.store, key, now)
+
+            entry = self.store.get_idempotency_key(key)
+            if entry is None:
+                # Released or pruned between the two statements; claim again
+                continue
+            stored_hash, _, status, body = entry
+            if stored_hash != request_hash:
+                raise IdempotencyError(f'{IDEMPOTENCY_HEADER} was already used for a different submission', 422)
+            if status is not None:
+                return Claim(replay=(status, json.loads(body)))
+            if time.monotonic() >= deadline:
+                raise IdempotencyError('An identical submission is still being processed', 409)
+            time.sleep(POLL_INTERVAL)
+
+
+_cache = None
+
+
+def get_idempotency_cache():
+    global _cache
+    if _cache is None:
+        _cache = IdempotencyCache(get_submission_store())
+    return _cache
+
+
+def claim_submission(header_key, payload):
+    """
+    Claim a submit request (see IdempotencyCache.claim); a no-op claim when disabled
+    """
+    if not IDEMPOTENCY_ENABLED:
+        return Claim()
+    return get_idempotency_cache().claim(header_key, payload)
@@ -0,0 +1,74 @@
+"""
+Legacy Scoring Models
+The single-score models that predate the service-area model, kept as lookup
+tables so that shadow scoring can compile them together with the current rules
+"""
+
+# Site form model (root app.py /submit-assessment): points per answer, normalized
+# by the best possible points of the questions that were answered
+SITE_SCORING_MAP = {
+    'current_tech': {'high': 25, 'medium': 15, 'low': 5, 'none': 0},
+    'team_size': {'large': 20, 'medium': 15, 'small': 10, 'solo': 5},
+    'budget': {'high': 25, 'medium': 15, 'low': 8, 'minimal': 3},
+    'urgency': {'immediate': 20, 'soon': 15, 'exploring': 10, 'no_rush': 5},
+    'data_usage': {'extensive': 15, 'moderate': 10, 'minimal': 5, 'none': 0},
+    'automation_interest': {'very_interested': 15, 'interested': 10, 'somewhat': 5, 'not_interested': 0}
+}
+
+# Score given to a site form submission with no scored answers
+SITE_DEFAULT_SCORE = 50
+
+# First API model: points per single-choice answer plus capped points per list item
+LEGACY_READINESS_CHOICES = {
+    # Business size scoring
+    'employees': {'1-10': 15, '11-50': 20, '51-200': 25, '200+': 30},
+    # Budget scoring
+    'budget': {'under-1k': 10, '1k-5k': 15, '5k-10k': 20, '10k-25k': 25, '25k+': 30},
+    # Timeline scoring
+    'timeline': {'immediately': 15, '1-3-months': 12, '3-6-months': 8, '6-12-months': 5}
+}
+LEGACY_READINESS_COUNTS = {
+    # Technology adoption and goals scoring: (points per item, cap)
+    'current_tools': (5, 20),
+    'goals': (3, 15)
+}
+LEGACY_READINESS_MAX_SCORE = 100
+
+
+def calculate_ai_score(data):
+    """Calculate AI readiness score based on assessment responses"""
+    score = 0
+    total_possible = 0
+
+    # Calculate score based on responses
+    for key, value in data.items():
+        if key in SITE_SCORING_MAP and value in SITE_SCORING_MAP[key]:
+            score += SITE_SCORING_MAP[key][value]
+            total_possible += max(SITE_SCORING_MAP[key].values())
+
+    # Normalize to 0-100 scale
+    if total_possible > 0:
+        normalized_score = (score / total_possible) * 100
+    else:
+        normalized_score = SITE_DEFAULT_SCORE  # Default score if no valid responses
+
+    return round(min(100, max(0, normalized_score)))
+
+
+def calculate_ai_readiness_score_legacy(data):
+    """
+    Legacy scoring function for backward compatibility
+    """
+    score = 0
+
+    for field, points in LEGACY_READINESS_CHOICES.items():
+        value = data.get(field)
+        if isinstance(value, str):
+            score += points.get(value, 0)
+
+    for field, (points_per_item, cap) in LEGACY_READINESS_COUNTS.items():
+        items = data.get(field, [])
+        if isinstance(items, list):
+            score += min(len(items) * points_per_item, cap)
+
+    return min(score, LEGACY_READINESS_MAX_SCORE)
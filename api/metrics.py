@@ -0,0 +1,383 @@
+"""
+Request Metrics
+Low-overhead counters and latency histograms exposed in Prometheus text format
+
+Every series is declared up front, so each process keeps its values in a flat array
+of float64 slots. With METRICS_DIR set, that array is a memory-mapped file per
+process (metrics-<pid>.db) and the exposition sums the files of all gunicorn
+workers; without it, values live in process memory only. When a worker exits,
+its values are folded into metrics-archive.db and its file is removed, so
+counters survive worker recycling without leaving a file per dead process.
+"""
+
+import glob
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+METRICS_DIR = os.environ.get('METRICS_DIR')
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HEADER = struct.Struct('<8s16s')
+MAGIC = b'AIMETRC1'
+SLOT = struct.Struct('<d')
+
+# Values of exited processes; matches the metrics-*.db pattern, so it is summed like a worker
+ARCHIVE_NAME = 'metrics-archive.db'
+LOCK_NAME = '.metrics.lock'
+
+
+def _format_labels(labels, extra=None):
+    items = list(labels.items()) + (list(extra.items()) if extra else [])
+    if not items:
+        return ''
+    return '{' + ','.join(f'{key}="{value}"' for key, value in items) + '}'
+
+
+def _format_value(value):
+    return str(int(value)) if value == int(value) else repr(value)
+
+
+class _ValueStore:
+    """
+    Float64 slots for this process, in memory or in a per-process mmap file
+    """
+
+    def __init__(self, size, signature, directory=None):
+        self.size = size
+        self.signature = signature
+        self.directory = directory
+        self.path = None
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self.path = os.path.join(directory, f'metrics-{os.getpid()}.db')
+            self._buffer = self._map(self.path)
+        else:
+            self._buffer = bytearray(HEADER.size + size * SLOT.size)
+
+    def _map(self, path):
+        # Never truncate: a file left by an earlier process with the same PID that
+        # was not folded yet keeps its counts, and this process adds to them
+        length = HEADER.size + self.size * SLOT.size
+        header = HEADER.pack(MAGIC, self.signature)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size != length or os.pread(fd, HEADER.size, 0) != header:
+                os.ftruncate(fd, 0)
+                os.ftruncate(fd, length)
+                os.pwrite(fd, header, 0)
+            return mmap.mmap(fd, length)
+        finally:
+            os.close(fd)
+
+    def inc(self, slot, amount=1.0):
+        offset = HEADER.size + slot * SLOT.size
+        with self._lock:
+            SLOT.pack_into(self._buffer, offset, SLOT.unpack_from(self._buffer, offset)[0] + amount)
+
+    def values(self):
+        return list(struct.unpack_from(f'<{self.size}d', self._buffer, HEADER.size))
+
+
+class _Series:
+    def __init__(self, registry, start):
+        self._registry = registry
+        self._start = start
+
+
+class CounterSeries(_Series):
+    def inc(self, amount=1.0):
+        self._registry.store().inc(self._start, amount)
+
+
+class HistogramSeries(_Series):
+    def __init__(self, registry, start, buckets):
+        super().__init__(registry, start)
+        self._buckets = buckets
+
+    def observe(self, value):
+        # Slots: one per bucket (non-cumulative) + overflow, then sum, then count
+        store = self._registry.store()
+        store.inc(self._start + bisect_left(self._buckets, value))
+        store.inc(self._start + len(self._buckets) + 1, value)
+        store.inc(self._start + len(self._buckets) + 2)
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+
+class Metric:
+    """
+    A named metric with a fixed set of label combinations
+    """
+
+    def __init__(self, registry, kind, name, documentation, label_sets, buckets=None):
+        self.kind = kind
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        self.series = []
+        self._by_labels = {}
+        width = 1 if kind == 'counter' else len(buckets) + 3
+        for labels in label_sets:
+            start = registry._allocate(width)
+            if kind == 'counter':
+                child = CounterSeries(registry, start)
+            else:
+                child = HistogramSeries(registry, start, buckets)
+            self.series.append((dict(labels), start, child))
+            self._by_labels[tuple(sorted(labels.items()))] = child
+
+    def labels(self, **labels):
+        return self._by_labels[tuple(sorted(labels.items()))]
+
+    def expose(self, values):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        for labels, start, _ in self.series:
+            if self.kind == 'counter':
+                lines.append(f'{self.name}{_format_labels(labels)} {_format_value(values[start])}')
+                continue
+            cumulative = 0.0
+            for i, bound in enumerate(self.buckets):
+                cumulative += values[start + i]
+                lines.append(f'{self.name}_bucket{_format_labels(labels, {"le": repr(bound)})} '
+                             f'{_format_value(cumulative)}')
+            cumulative += values[start + len(self.buckets)]
+            lines.append(f'{self.name}_bucket{_format_labels(labels, {"le": "+Inf"})} {_format_value(cumulative)}')
+            lines.append(f'{self.name}_sum{_format_labels(labels)} {_format_value(values[start + len(self.buckets) + 1])}')
+            lines.append(f'{self.name}_count{_format_labels(labels)} {_format_value(values[start + len(self.buckets) + 2])}')
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Declares metrics and owns this process's value store
+    """
+
+    def __init__(self, directory=METRICS_DIR):
+        self.directory = directory
+        self.metrics = []
+        self._size = 0
+        self._store = None
+        self._store_lock = threading.Lock()
+        if hasattr(os, 'register_at_fork'):
+            # A forked worker must not share the parent's slots
+            os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def _allocate(self, width):
+        if self._store is not None:
+            raise RuntimeError('Metrics must be declared before any value is recorded')
+        start = self._size
+        self._size += width
+        return start
+
+    def _reset_after_fork(self):
+        self._store = None
+        self._store_lock = threading.Lock()
+
+    def counter(self, name, documentation, label_sets=({},)):
+        metric = Metric(self, 'counter', name, documentation, label_sets)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name, documentation, label_sets=({},), buckets=DEFAULT_BUCKETS):
+        metric = Metric(self, 'histogram', name, documentation, label_sets, tuple(buckets))
+        self.metrics.append(metric)
+        return metric
+
+    def signature(self):
+        layout = [(m.kind, m.name, m.buckets, [labels for labels, _, _ in m.series]) for m in self.metrics]
+        return hashlib.sha256(repr(layout).encode('utf-8')).digest()[:16]
+
+    def store(self):
+        if self._store is None:
+            with self._store_lock:
+                if self._store is None:
+                    self._store = _ValueStore(self._size, self.signature(), self.directory)
+        return self._store
+
+    def _read(self, path, signature):
+        """
+        The values in another process's file, or None if it is missing or has a
+        different layout
+        """
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        if len(data) != HEADER.size + self._size * SLOT.size:
+            return None
+        magic, file_signature = HEADER.unpack_from(data, 0)
+        if magic != MAGIC or file_signature != signature:
+            return None
+        return list(struct.unpack_from(f'<{self._size}d', data, HEADER.size))
+
+    def collect(self):
+        """
+        Sum this process's values with those of every other process sharing METRICS_DIR
+        """
+        own = self.store()
+        totals = own.values()
+        if not self.directory:
+            return totals
+
+        signature = self.signature()
+        for path in glob.glob(os.path.join(self.directory, 'metrics-*.db')):
+            if path == own.path:
+                continue
+            values = self._read(path, signature)
+            if values is None:
+                continue
+            for i, value in enumerate(values):
+                totals[i] += value
+        return totals
+
+    @contextmanager
+    def _directory_lock(self):
+        with open(os.path.join(self.directory, LOCK_NAME), 'a') as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
+    def fold_process(self, pid):
+        """
+        Add an exited process's values to the archive and remove its file. Runs in
+        the gunicorn master when a worker exits.
+        """
+        if not self.directory or not os.path.isdir(self.directory):
+            return
+        path = os.path.join(self.directory, f'metrics-{pid}.db')
+        signature = self.signature()
+        with self._directory_lock():
+            values = self._read(path, signature)
+            if values is not None:
+                archive_path = os.path.join(self.directory, ARCHIVE_NAME)
+                archived = self._read(archive_path, signature) or [0.0] * self._size
+                tmp_path = f'{archive_path}.{os.getpid()}.tmp'
+                with open(tmp_path, 'wb') as f:
+                    f.write(HEADER.pack(MAGIC, signature))
+                    f.write(struct.pack(f'<{self._size}d', *(a + b for a, b in zip(archived, values))))
+                # Swap the archive in and drop the process file back to back, so a
+                # concurrent scrape double counts for at most that instant
+                os.replace(tmp_path, archive_path)
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+    def clear_directory(self):
+        """
+        Remove every process and archive file, e.g. left by a previous deploy.
+        Call before any worker starts.
+        """
+        if not self.directory or not os.path.isdir(self.directory):
+            return
+        for path in glob.glob(os.path.join(self.directory, 'metrics-*.db')):
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+    def expose(self):
+        """
+        Render all metrics in Prometheus text exposition format
+        """
+        values = self.collect()
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.expose(values))
+        return '\n'.join(lines) + '\n'
+
+
+# Assessment API metrics
+registry = MetricsRegistry()
+
+SUBMIT_STAGES = ['validate', 'score', 'recommend', 'report', 'shadow', 'store', 'email']
+REPORT_STAGES = ['lookup', 'render']
+STATUS_CLASSES = ['2xx', '3xx', '4xx', '5xx']
+
+stage_seconds = registry.histogram(
+    'assessment_stage_seconds',
+    'Time spent in each stage of the assessment endpoints.',
+    [{'endpoint': 'submit_assessment', 'stage': stage} for stage in SUBMIT_STAGES]
+    + [{'endpoint': 'get_report', 'stage': stage} for stage in REPORT_STAGES]
+)
+notification_emails_total = registry.counter(
+    'assessment_notification_emails_total',
+    'Notification emails handed off for delivery, by result.',
+    [{'result': 'success'}, {'result': 'failure'}]
+)
+
+
+# Declared by register_endpoints() from the app's URL map
+ENDPOINTS = []
+request_seconds = None
+requests_total = None
+
+
+def register_endpoints(endpoints):
+    """
+    Declare the per-endpoint request series for an app's endpoints, plus 'other'
+    for requests that match no route. Called once the app's routes are defined,
+    before any value is recorded.
+    """
+    global ENDPOINTS, request_seconds, requests_total
+    if requests_total is not None:
+        return
+    ENDPOINTS = sorted(set(endpoints) - {'other'}) + ['other']
+    request_seconds = registry.histogram(
+        'assessment_request_seconds',
+        'End-to-end handler time per endpoint.',
+        [{'endpoint': endpoint} for endpoint in ENDPOINTS]
+    )
+    requests_total = registry.counter(
+        'assessment_requests_total',
+        'Requests handled per endpoint and status class.',
+        [{'endpoint': endpoint, 'status': status} for endpoint in ENDPOINTS for status in STATUS_CLASSES]
+    )
+
+
+def time_stage(endpoint, stage):
+    """
+    Context manager timing one stage of an endpoint
+    """
+    return stage_seconds.labels(endpoint=endpoint, stage=stage).time()
+
+
+def record_request(endpoint, status_code, duration):
+    """
+    Count a finished request and its handler time
+    """
+    if requests_total is None:
+        return
+    if endpoint not in ENDPOINTS:
+        endpoint = 'other'
+    status = f'{min(max(status_code // 100, 2), 5)}xx'
+    requests_total.labels(endpoint=endpoint, status=status).inc()
+    request_seconds.labels(endpoint=endpoint).observe(duration)
+
+
+def record_email(sent):
+    notification_emails_total.labels(result='success' if sent else 'failure').inc()
+
+
+def render_metrics():
+    return registry.expose()
@@ -0,0 +1,516 @@
+"""
+Notification Outbox
+Queues notification emails in-process and delivers them from background workers
+over persistent, reconnecting SMTP sessions, optionally batching leads into digests
+"""
+
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+from api.storage import DATA_DIR
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+DEFAULT_SPILL_PATH = os.path.join(DATA_DIR, 'outbox-spill.jsonl')
+
+# smtplib and email.mime are imported where mail is actually built or sent, so
+# importing this module (and the serverless handler) does not pay for them
+
+
+def build_message(sender, recipients, subject, body):
+    """
+    Render a plain-text notification email
+    """
+    from email.mime.text import MIMEText
+    from email.mime.multipart import MIMEMultipart
+
+    msg = MIMEMultipart()
+    msg['From'] = sender
+    msg['To'] = ', '.join(recipients)
+    msg['Subject'] = subject
+    msg.attach(MIMEText(body, 'plain'))
+    return msg.as_string()
+
+
+def smtp_settings_from_env():
+    """
+    Read SMTP connection settings from the environment
+    """
+    return {
+        'host': os.environ.get('SMTP_SERVER', 'smtp.gmail.com'),
+        'port': int(os.environ.get('SMTP_PORT', '587')),
+        'user': os.environ.get('EMAIL_USER', ''),
+        'password': os.environ.get('EMAIL_PASSWORD', ''),
+        'use_starttls': os.environ.get('SMTP_STARTTLS', 'true').lower() != 'false',
+        'timeout': float(os.environ.get('SMTP_TIMEOUT', '30'))
+    }
+
+
+class SMTPSession:
+    """
+    A long-lived SMTP connection that reconnects (STARTTLS + login) on demand
+    """
+
+    def __init__(self, host, port, user='', password='', use_starttls=True, timeout=30):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.use_starttls = use_starttls
+        self.timeout = timeout
+        self._server = None
+
+    def _connect(self):
+        import smtplib
+
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.use_starttls:
+                server.starttls()
+            if self.user and self.password:
+                server.login(self.user, self.password)
+        except Exception:
+            server.close()
+            raise
+        self._server = server
+
+    def send(self, sender, recipients, message_text):
+        """
+        Send one message, reconnecting once if the server dropped the connection
+        """
+        import smtplib
+
+        for attempt in range(2):
+            if self._server is None:
+                self._connect()
+            try:
+                self._server.sendmail(sender, recipients, message_text)
+                return
+            except smtplib.SMTPServerDisconnected:
+                self.close()
+                if attempt:
+                    raise
+
+    def close(self):
+        if self._server is None:
+            return
+        try:
+            self._server.quit()
+        except Exception:
+            self._server.close()
+        self._server = None
+
+
+def is_permanent_failure(error):
+    """
+    Whether a delivery error will not go away by retrying
+    """
+    import smtplib
+
+    # Sender/recipient refusals and 5xx data errors will not succeed on retry
+    if isinstance(error, (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused)):
+        return True
+    return isinstance(error, smtplib.SMTPDataError) and error.smtp_code >= 500
+
+
+class NotificationOutbox:
+    """
+    Bounded in-process queue of outgoing messages.
+
+    Messages are plain dicts ({'from', 'to', 'message'}) so they can be persisted.
+    Background workers each keep one SMTPSession open and retry failed sends
+    with exponential backoff. Messages that cannot be queued, exhaust their
+    retries, or are still pending at shutdown are appended to a spill file,
+    which is re-queued the next time an outbox starts.
+    """
+
+    def __init__(self, session_factory, maxsize=1000, workers=1, max_retries=5,
+                 backoff_base=1.0, backoff_max=60.0, idle_timeout=30.0, spill_path=DEFAULT_SPILL_PATH):
+        self.session_factory = session_factory
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.idle_timeout = idle_timeout
+        self.spill_path = spill_path
+        self.num_workers = workers
+
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._stopping = threading.Event()
+        self._spill_lock = threading.Lock()
+        self._threads = []
+        self._started = False
+        self._start_lock = threading.Lock()
+        self.sent_count = 0
+        self.failed_count = 0
+
+    def start(self):
+        """
+        Start the worker threads and re-queue anything spilled by a previous run
+        """
+        with self._start_lock:
+            if self._started:
+                return
+            self._started = True
+            for i in range(self.num_workers):
+                thread = threading.Thread(target=self._run_worker, name=f'notification-outbox-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        self.recover_spilled()
+
+    def enqueue(self, message):
+        """
+        Queue a message for delivery. Never blocks; overflow goes to the spill file.
+        """
+        if not self._started:
+            self.start()
+        if self._stopping.is_set():
+            self._spill([message])
+            return True
+        try:
+            self._queue.put_nowait(message)
+        except queue.Full:
+            print("Notification outbox full - spilling message to disk")
+            self._spill([message])
+        return True
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def _run_worker(self):
+        session = self.session_factory()
+        try:
+            while True:
+                try:
+                    message = self._queue.get(timeout=self.idle_timeout)
+                except queue.Empty:
+                    # Don't hold an idle connection open indefinitely
+                    session.close()
+                    if self._stopping.is_set():
+                        return
+                    continue
+
+                if message is None:
+                    self._queue.task_done()
+                    return
+
+                try:
+                    self._deliver(session, message)
+                finally:
+                    self._queue.task_done()
+        finally:
+            session.close()
+
+    def _deliver(self, session, message):
+        for attempt in range(self.max_retries + 1):
+            try:
+                session.send(message['from'], message['to'], message['message'])
+                self.sent_count += 1
+                return
+            except Exception as e:
+                session.close()
+                if is_permanent_failure(e):
+                    self.failed_count += 1
+                    print(f"Notification email rejected permanently: {str(e)}")
+                    return
+                if attempt == self.max_retries or self._stopping.is_set():
+                    break
+                delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+                print(f"Notification email failed ({str(e)}), retrying in {delay:.1f}s")
+                self._stopping.wait(delay)
+
+        self.failed_count += 1
+        print("Notification email not delivered - spilling message to disk")
+        self._spill([message])
+
+    def _spill(self, messages):
+        if not messages or not self.spill_path:
+            return
+        os.makedirs(os.path.dirname(self.spill_path), exist_ok=True)
+        with self._spill_lock:
+            with open(self.spill_path, 'a') as f:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                for message in messages:
+                    f.write(json.dumps(message) + '\n')
+
+    def recover_spilled(self):
+        """
+        Re-queue messages spilled to disk. The spill file is renamed first so that
+        only one process picks up each spilled message.
+        """
+        if not self.spill_path or not os.path.exists(self.spill_path):
+            return 0
+        claimed_path = f'{self.spill_path}.{os.getpid()}.recovering'
+        try:
+            os.replace(self.spill_path, claimed_path)
+        except FileNotFoundError:
+            return 0
+
+        messages = []
+        with open(claimed_path) as f:
+            for line in f:
+                if line.strip():
+                    try:
+                        messages.append(json.loads(line))
+                    except ValueError:
+                        print("Skipping corrupt line in notification spill file")
+        os.remove(claimed_path)
+
+        for message in messages:
+            self.enqueue(message)
+        if messages:
+            print(f"Re-queued {len(messages)} spilled notification email(s)")
+        return len(messages)
+
+    def flush(self, timeout=10.0):
+        """
+        Stop the outbox: give workers up to `timeout` seconds to drain the queue,
+        then persist whatever is left to the spill file
+        """
+        if not self._started or self._stopping.is_set():
+            return
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self._stopping.set()
+
+        leftovers = []
+        while True:
+            try:
+                message = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if message is not None:
+                leftovers.append(message)
+            self._queue.task_done()
+        self._spill(leftovers)
+
+        for _ in self._threads:
+            try:
+                self._queue.put_nowait(None)
+            except queue.Full:
+                break
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - time.monotonic()) + 1.0)
+
+
+def create_outbox_from_env():
+    """
+    Build an outbox configured from environment variables
+    """
+    settings = smtp_settings_from_env()
+    return NotificationOutbox(
+        session_factory=lambda: SMTPSession(**settings),
+        maxsize=int(os.environ.get('EMAIL_OUTBOX_SIZE', '1000')),
+        workers=int(os.environ.get('EMAIL_OUTBOX_WORKERS', '1')),
+        max_retries=int(os.environ.get('EMAIL_MAX_RETRIES', '5')),
+        backoff_base=float(os.environ.get('EMAIL_RETRY_BACKOFF', '1.0')),
+        spill_path=os.environ.get('EMAIL_OUTBOX_SPILL', DEFAULT_SPILL_PATH)
+    )
+
+
+_outbox = None
+_outbox_lock = threading.Lock()
+
+
+def get_outbox():
+    """
+    Get the process-wide outbox, starting it on first use
+    """
+    global _outbox
+    if _outbox is None:
+        with _outbox_lock:
+            if _outbox is None:
+                outbox = create_outbox_from_env()
+                outbox.start()
+                atexit.register(outbox.flush)
+                _outbox = outbox
+    return _outbox
+
+
+def shutdown_outbox(timeout=10.0):
+    """
+    Flush-on-shutdown hook for server integrations (e.g. gunicorn worker_exit)
+    """
+    if _digest is not None:
+        _digest.stop()
+    if _outbox is not None:
+        _outbox.flush(timeout)
+
+
+def deliver_email(sender, recipients, message_text):
+    """
+    Hand a rendered message to the outbox, or send it inline when EMAIL_OUTBOX=false.
+    Returns True if the message was queued or sent.
+    """
+    message = {'from': sender, 'to': list(recipients), 'message': message_text}
+    if os.environ.get('EMAIL_OUTBOX', 'true').lower() == 'false':
+        session = SMTPSession(**smtp_settings_from_env())
+        try:
+            session.send(message['from'], message['to'], message['message'])
+        finally:
+            session.close()
+        return True
+    return get_outbox().enqueue(message)
+
+
+def digest_settings_from_env():
+    """
+    Read digest settings. Digest mode is on when EMAIL_DIGEST_SIZE or
+    EMAIL_DIGEST_INTERVAL is set to a positive value.
+    """
+    return {
+        'size': int(os.environ.get('EMAIL_DIGEST_SIZE', '0')),
+        'interval': float(os.environ.get('EMAIL_DIGEST_INTERVAL', '0')),
+        'urgent_score': int(os.environ.get('EMAIL_DIGEST_URGENT_SCORE', '80'))
+    }
+
+
+def is_urgent_lead(data, score, urgent_score):
+    """
+    Leads that want to start now or score highly are never held for a digest
+    """
+    if data.get('timeline') == 'immediately' or data.get('urgency') == 'immediate':
+        return True
+    return score >= urgent_score
+
+
+class LeadDigest:
+    """
+    Holds lead notifications and sends them as one email per `size` leads or per
+    `interval` seconds, whichever comes first, sorted by score.
+
+    Held leads are kept in the submissions database rather than in memory, so a
+    crash, deploy or worker recycle does not lose them, and every worker sees
+    the same digest. Whichever worker fills or times out a digest takes its
+    entries and sends it; recover() sends what a previous process left behind.
+    """
+
+    def __init__(self, size=0, interval=0.0, send=deliver_email, store=None):
+        self.size = size
+        self.interval = interval
+        self.send = send
+        if store is None:
+            from api.storage import get_submission_store
+            store = get_submission_store()
+        self.store = store
+        self._stopping = threading.Event()
+        self._timer = None
+        if interval > 0:
+            self._timer = threading.Thread(target=self._run_timer, name='lead-digest', daemon=True)
+            self._timer.start()
+
+    def add(self, sender, recipients, subject, body, score):
+        entry = {'subject': subject, 'body': body, 'score': score, 'queued_at': time.time()}
+        held = self.store.add_digest_entries(sender, recipients, [entry])
+        if self.size <= 0 or held < self.size:
+            return True
+        return self._send_held(sender, recipients)
+
+    def _run_timer(self):
+        check_every = max(0.05, min(self.interval / 4, 1.0))
+        while not self._stopping.wait(check_every):
+            try:
+                self.send_due(time.time() - self.interval)
+            except Exception as e:
+                print(f"Lead digest check failed: {str(e)}")
+
+    def send_due(self, queued_before):
+        """
+        Send every digest whose oldest lead was held at or before queued_before
+        """
+        for sender, recipients in self.store.due_digest_keys(queued_before):
+            self._send_held(sender, recipients)
+
+    def recover(self):
+        """
+        Send the digests left by a previous process: those already due, or all of
+        them when there is no interval to wait for
+        """
+        self.send_due(time.time() - self.interval if self.interval > 0 else float('inf'))
+
+    def _send_held(self, sender, recipients):
+        entries = self.store.take_digest_entries(sender, recipients)
+        if not entries:
+            # Another worker sent this digest first
+            return True
+        try:
+            return self._send_digest(sender, recipients, entries)
+        except Exception as e:
+            print(f"Failed to send lead digest: {str(e)}")
+            # Hold the leads again for the next attempt
+            self.store.add_digest_entries(sender, recipients, entries)
+            return False
+
+    def _send_digest(self, sender, recipients, entries):
+        entries = sorted(entries, key=lambda entry: entry['score'], reverse=True)
+        subject = (f"AI Assessment Digest: {len(entries)} new lead(s) - "
+                   f"top score {entries[0]['score']}%")
+        divider = '\n' + '=' * 60 + '\n'
+        body = f"{len(entries)} assessment submission(s), highest score first.\n"
+        body += divider + divider.join(
+            f"Lead {i}: {entry['subject']}\n{entry['body']}" for i, entry in enumerate(entries, 1)
+        )
+        body += f"\nDigest sent: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
+        return self.send(sender, list(recipients), build_message(sender, list(recipients), subject, body))
+
+    def stop(self):
+        """
+        Stop the timer; held leads stay in the database for the next process
+        """
+        self._stopping.set()
+
+
+_digest = None
+_digest_lock = threading.Lock()
+
+
+def get_digest(settings):
+    """
+    Get the process-wide lead digest, creating it on first use
+    """
+    global _digest
+    if _digest is None:
+        with _digest_lock:
+            if _digest is None:
+                get_outbox()
+                digest = LeadDigest(settings['size'], settings['interval'])
+                atexit.register(digest.stop)
+                digest.recover()
+                _digest = digest
+    return _digest
+
+
+def recover_digests():
+    """
+    Startup hook for server integrations: send digests held by processes that
+    have since exited. With digest mode now off, everything held is sent.
+    """
+    settings = digest_settings_from_env()
+    try:
+        if settings['size'] > 0 or settings['interval'] > 0:
+            get_digest(settings)
+        else:
+            LeadDigest().recover()
+    except Exception as e:
+        print(f"Lead digest recovery failed: {str(e)}")
+
+
+def notify_lead(sender, recipients, subject, body, score, data):
+    """
+    Send a lead notification, or hold it for the next digest when digest mode is
+    configured and the lead is not urgent. Returns True if sent, queued or held.
+    """
+    settings = digest_settings_from_env()
+    digest_enabled = settings['size'] > 0 or settings['interval'] > 0
+    if not digest_enabled or is_urgent_lead(data, score, settings['urgent_score']):
+        return deliver_email(sender, recipients, build_message(sender, recipients, subject, body))
+    return get_digest(settings).add(sender, recipients, subject, body, score)
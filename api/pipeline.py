@@ -0,0 +1,194 @@
+"""
+Assessment Pipeline
+Validates, scores, ranks and renders a submission in a single pass and hands the
+result to every consumer (API response, stored submission, report, email, batch)
+"""
+
+from contextlib import nullcontext
+from dataclasses import dataclass, replace
+from datetime import datetime
+from typing import Optional
+
+from api.scoring_analysis import calculate_service_area_scores, get_recommendations_for_scores, get_active_rules
+from api.score_table import lookup_service_area_scores, get_score_percentiles
+from api.report_generator import generate_overall_score, render_report
+
+REQUIRED_FIELDS = ['name', 'email', 'company']
+
+# Keys the pipeline adds to a stored submission on top of the form answers
+RESULT_FIELDS = ['submitted_at', 'overall_score', 'service_area_scores', 'recommendations', 'percentiles']
+
+# Keys the submission store adds when a submission is read back
+STORAGE_FIELDS = ['id', 'rule_version']
+
+
+class AssessmentValidationError(ValueError):
+    """
+    Raised when a submission is missing data the pipeline needs
+    """
+
+
+def find_missing_field(data):
+    """
+    Return the first required field missing from a submission, or None
+    """
+    for field in REQUIRED_FIELDS:
+        if not data.get(field):
+            return field
+    return None
+
+
+@dataclass(frozen=True)
+class AssessmentResult:
+    """
+    Everything computed for one submission. Consumers read from it and never
+    recompute scores, so all paths agree on the same numbers.
+    """
+    form_data: dict
+    submitted_at: str
+    service_area_scores: dict
+    overall_score: int
+    recommendations: dict
+    percentiles: Optional[dict]
+    rule_version: str
+    report_html: Optional[str] = None
+
+    def to_submission(self):
+        """
+        The stored form of the result: the form answers plus the computed fields
+        """
+        submission = dict(self.form_data)
+        submission.update({
+            'submitted_at': self.submitted_at,
+            'overall_score': self.overall_score,
+            'service_area_scores': self.service_area_scores,
+            'recommendations': self.recommendations,
+            'percentiles': self.percentiles
+        })
+        return submission
+
+    @classmethod
+    def from_submission(cls, submission):
+        """
+        Rebuild a result from a stored submission without rescoring it
+        """
+        return cls(
+            form_data={k: v for k, v in submission.items() if k not in RESULT_FIELDS and k not in STORAGE_FIELDS},
+            submitted_at=submission.get('submitted_at') or datetime.now().isoformat(),
+            service_area_scores=submission['service_area_scores'],
+            overall_score=submission['overall_score'],
+            recommendations=submission['recommendations'],
+            percentiles=submission.get('percentiles'),
+            rule_version=submission.get('rule_version')
+        )
+
+
+class AssessmentPipeline:
+    """
+    Runs the assessment stages in order: validate, score, recommend, report
+    """
+
+    def validate(self, form_data):
+        if not form_data or not isinstance(form_data, dict):
+            raise AssessmentValidationError('No data provided')
+        missing_field = find_missing_field(form_data)
+        if missing_field:
+            raise AssessmentValidationError(f'Missing required field: {missing_field}')
+
+    def score(self, form_data, rules):
+        # O(1) table lookup when the precomputed table matches the rules
+        service_area_scores = lookup_service_area_scores(form_data, rules)
+        if service_area_scores is None:
+            service_area_scores = calculate_service_area_scores(form_data, rules)
+        return service_area_scores
+
+    def build_result(self, form_data, service_area_scores, rules, submitted_at=None, with_percentiles=True):
+        """
+        Rank already computed area scores into a result
+        """
+        overall_score = generate_overall_score(service_area_scores, rules)
+        if with_percentiles:
+            percentiles = get_score_percentiles(service_area_scores, overall_score, rules)
+        else:
+            percentiles = None
+        return AssessmentResult(
+            form_data=form_data,
+            submitted_at=submitted_at or datetime.now().isoformat(),
+            service_area_scores=service_area_scores,
+            overall_score=overall_score,
+            recommendations=get_recommendations_for_scores(service_area_scores, rules),
+            percentiles=percentiles,
+            rule_version=rules.rule_version
+        )
+
+    def render(self, result):
+        """
+        Render the report HTML for a result
+        """
+        report_html, _ = render_report(
+            result.to_submission(),
+            result.service_area_scores,
+            result.recommendations,
+            result.overall_score,
+            result.percentiles
+        )
+        return report_html
+
+    def run(self, form_data, render=True, stage_timer=None):
+        """
+        Process one submission. stage_timer(stage) may return a context manager
+        used to time each stage.
+        """
+        timer = stage_timer or (lambda stage: nullcontext())
+        # One rule pack for the whole submission, even if a new one is swapped in meanwhile
+        rules = get_active_rules()
+
+        with timer('validate'):
+            self.validate(form_data)
+            form_data = {k: v for k, v in form_data.items() if k not in RESULT_FIELDS}
+
+        with timer('score'):
+            service_area_scores = self.score(form_data, rules)
+
+        with timer('recommend'):
+            result = self.build_result(form_data, service_area_scores, rules)
+
+        if render:
+            with timer('report'):
+                result = replace(result, report_html=self.render(result))
+        return result
+
+    def run_batch(self, records):
+        """
+        Score validated records together through the vectorised engine. Returns one
+        AssessmentResult, or the TypeError raised by a malformed answer, per record.
+        """
+        # The engine pulls in numpy, which single submissions never need
+        from api.scoring_engine import get_scoring_engine
+
+        rules = get_active_rules()
+        try:
+            scored = get_scoring_engine(rules).score_batch(records)
+        except TypeError:
+            # A malformed answer poisoned the batch; fall back to per-record scoring
+            scored = None
+
+        results = []
+        for i, record in enumerate(records):
+            if scored is not None:
+                service_area_scores = scored[i]
+            else:
+                try:
+                    service_area_scores = calculate_service_area_scores(record, rules)
+                except TypeError as e:
+                    results.append(e)
+                    continue
+            results.append(self.build_result(record, service_area_scores, rules, with_percentiles=False))
+        return results
+
+
+_pipeline = AssessmentPipeline()
+
+
+def get_assessment_pipeline():
+    return _pipeline
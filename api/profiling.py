@@ -0,0 +1,175 @@
+"""
+On-Demand Request Profiler
+Opt-in WSGI hook that profiles selected requests with cProfile and a stack sampler,
+writing pstats and collapsed-stack (flamegraph-ready) files
+
+Enable with PROFILE_REQUESTS=true and a secret PROFILE_TOKEN, then profile a
+request by sending the token in the X-Profile-Request header or by setting
+PROFILE_SAMPLE_RATE to a fraction of requests. Without a token the profiler stays
+off. When disabled the app is not wrapped at all; when enabled, unsampled
+requests cost one header lookup.
+"""
+
+import glob
+import hmac
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+from api.storage import DATA_DIR
+
+# Set in a request's environ once it is decided whether to profile it
+PROFILE_ENVIRON_KEY = 'api.profile_request'
+
+PROFILE_DIR = os.environ.get('PROFILE_DIR', os.path.join(DATA_DIR, 'profiles'))
+
+
+def _frame_label(code):
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+
+
+class StackSampler:
+    """
+    Samples one thread's Python stack at a fixed interval and counts each
+    distinct root-to-leaf stack
+    """
+
+    def __init__(self, thread_id, interval=0.001):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='request-stack-sampler', daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self):
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+
+class ProfilingMiddleware:
+    """
+    Profiles the full handling of selected requests, including the response body
+    """
+
+    def __init__(self, wsgi_app, directory=PROFILE_DIR, sample_rate=0.0, header='X-Profile-Request',
+                 token=None, max_profiles=50, sample_interval=0.001):
+        self.wsgi_app = wsgi_app
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.environ_key = 'HTTP_' + header.upper().replace('-', '_')
+        self.token = token
+        self.max_profiles = max_profiles
+        self.sample_interval = sample_interval
+        self._retention_lock = threading.Lock()
+
+    def _should_profile(self, environ):
+        requested = environ.get(self.environ_key)
+        if requested is not None and self.token and hmac.compare_digest(
+            requested.encode('utf-8'), self.token.encode('utf-8')
+        ):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def selects(self, environ):
+        """
+        Whether this request is profiled; decided once per request, so a caller
+        can route on it before the middleware runs
+        """
+        if PROFILE_ENVIRON_KEY not in environ:
+            environ[PROFILE_ENVIRON_KEY] = self._should_profile(environ)
+        return environ[PROFILE_ENVIRON_KEY]
+
+    def __call__(self, environ, start_response):
+        if not self.selects(environ):
+            return self.wsgi_app(environ, start_response)
+
+        import cProfile
+
+        profiler = cProfile.Profile()
+        sampler = StackSampler(threading.get_ident(), self.sample_interval)
+        started = time.perf_counter()
+        sampler.start()
+        profiler.enable()
+        try:
+            result = self.wsgi_app(environ, start_response)
+            try:
+                body = list(result)
+            finally:
+                if hasattr(result, 'close'):
+                    result.close()
+        finally:
+            profiler.disable()
+            sampler.stop()
+            elapsed = time.perf_counter() - started
+            try:
+                self._write(environ, profiler, sampler, elapsed)
+            except OSError as e:
+                print(f"Failed to write request profile: {str(e)}")
+        return body
+
+    def _write(self, environ, profiler, sampler, elapsed):
+        os.makedirs(self.directory, exist_ok=True)
+        path_slug = re.sub(r'[^A-Za-z0-9]+', '_', environ.get('PATH_INFO', '')).strip('_') or 'root'
+        name = (f"{time.strftime('%Y%m%d-%H%M%S')}-{int(time.time() * 1000) % 1000:03d}-{os.getpid()}-"
+                f"{environ.get('REQUEST_METHOD', 'GET')}-{path_slug[:60]}-{elapsed * 1000:.0f}ms")
+        base = os.path.join(self.directory, name)
+
+        profiler.dump_stats(base + '.pstats')
+        with open(base + '.collapsed', 'w') as f:
+            f.write(sampler.collapsed())
+        print(f"Request profile written: {base}.pstats ({elapsed * 1000:.1f} ms)")
+        self._enforce_retention()
+
+    def _enforce_retention(self):
+        with self._retention_lock:
+            profiles = sorted(glob.glob(os.path.join(self.directory, '*.pstats')), key=os.path.getmtime)
+            for path in profiles[:max(0, len(profiles) - self.max_profiles)]:
+                for stale in (path, path[:-len('.pstats')] + '.collapsed'):
+                    try:
+                        os.remove(stale)
+                    except FileNotFoundError:
+                        pass
+
+
+def install_profiler(app):
+    """
+    Wrap a Flask app's WSGI callable with the profiler when PROFILE_REQUESTS is
+    on and PROFILE_TOKEN is set
+    """
+    if os.environ.get('PROFILE_REQUESTS', 'false').lower() != 'true':
+        return app
+    token = os.environ.get('PROFILE_TOKEN')
+    if not token:
+        print("Request profiling not enabled - PROFILE_REQUESTS needs PROFILE_TOKEN to be set")
+        return app
+    app.wsgi_app = ProfilingMiddleware(
+        app.wsgi_app,
+        directory=PROFILE_DIR,
+        sample_rate=float(os.environ.get('PROFILE_SAMPLE_RATE', '0')),
+        header=os.environ.get('PROFILE_HEADER', 'X-Profile-Request'),
+        token=token,
+        max_profiles=int(os.environ.get('PROFILE_MAX_FILES', '50')),
+        sample_interval=float(os.environ.get('PROFILE_SAMPLE_INTERVAL', '0.001'))
+    )
+    print(f"Request profiling enabled - writing profiles to {PROFILE_DIR}")
+    return app
@@ -0,0 +1,225 @@
+"""
+Rendered Report Cache
+Caches rendered report HTML per submission and rule version in an in-process LRU
+backed by an on-disk store shared by all workers, with single-flight rendering
+"""
+
+import glob
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from api.storage import DATA_DIR
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+REPORT_CACHE_DIR = os.environ.get('REPORT_CACHE_DIR', os.path.join(DATA_DIR, 'report-cache'))
+REPORT_CACHE_SIZE = int(os.environ.get('REPORT_CACHE_SIZE', '256'))
+REPORT_CACHE_DISK_ENTRIES = int(os.environ.get('REPORT_CACHE_DISK_ENTRIES', '10000'))
+
+# The disk tier is pruned after every this many writes by a process rather than on each one
+PRUNE_EVERY = 64
+
+# Cross-process render locks are striped so the lock files stay bounded
+LOCK_STRIPES = 64
+
+
+def compute_etag(body):
+    """
+    Strong ETag for a rendered report
+    """
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+class ReportCache:
+    """
+    Two-level cache of rendered reports: an in-process LRU in front of a
+    directory of files that every gunicorn worker can read.
+
+    Entries are immutable, since a submission's report never changes once it
+    is scored, so keys include the rule and template versions instead of
+    being invalidated. Concurrent misses for the same key render only once:
+    threads in a process wait on the first renderer, and processes serialize
+    on a striped file lock and re-check the disk before rendering.
+
+    The directory holds at most about max_disk_entries reports: reading a
+    report from disk refreshes its mtime, and the least recently used files
+    are removed once the limit is exceeded.
+    """
+
+    def __init__(self, directory=REPORT_CACHE_DIR, max_entries=REPORT_CACHE_SIZE,
+                 max_disk_entries=REPORT_CACHE_DISK_ENTRIES):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self._writes = 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, f'{key}.html')
+
+    def _remember(self, key, entry):
+        with self._lock:
+            self._lru[key] = entry
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.max_entries:
+                self._lru.popitem(last=False)
+
+    def _read_disk(self, key):
+        try:
+            with open(self._path(key), 'rb') as f:
+                etag = f.readline().rstrip(b'\n').decode('ascii')
+                body = f.read()
+        except FileNotFoundError:
+            return None
+        try:
+            # Mark it recently used, so pruning keeps it
+            os.utime(self._path(key))
+        except FileNotFoundError:
+            pass
+        return body, etag
+
+    def _write_disk(self, key, body, etag):
+        path = self._path(key)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(etag.encode('ascii') + b'\n')
+            f.write(body)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._writes += 1
+            due = self._writes % PRUNE_EVERY == 0
+        if due:
+            self.prune()
+
+    def prune(self):
+        """
+        Remove the least recently used reports from disk until at most
+        max_disk_entries remain; returns how many were removed
+        """
+        entries = []
+        for path in glob.glob(os.path.join(self.directory, '*.html')):
+            try:
+                entries.append((os.stat(path).st_mtime, path))
+            except FileNotFoundError:
+                pass  # removed by another worker's prune
+        excess = len(entries) - self.max_disk_entries
+        if excess <= 0:
+            return 0
+        entries.sort()
+        removed = 0
+        for _, path in entries[:excess]:
+            try:
+                os.unlink(path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+        return removed
+
+    def get(self, key):
+        """
+        Return (body, etag) if the report is cached in memory or on disk
+        """
+        with self._lock:
+            entry = self._lru.get(key)
+            if entry is not None:
+                self._lru.move_to_end(key)
+                return entry
+        entry = self._read_disk(key)
+        if entry is not None:
+            self._remember(key, entry)
+        return entry
+
+    def get_or_render(self, key, render):
+        """
+        Return (body, etag), calling render() -> str at most once per key across
+        concurrent callers in this process and, via the lock file, across workers
+        """
+        entry = self.get(key)
+        if entry is not None:
+            return entry
+
+        with self._lock:
+            waiter = self._in_flight.get(key)
+            if waiter is None:
+                waiter = self._in_flight[key] = {'event': threading.Event(), 'entry': None, 'error': None}
+                leader = True
+            else:
+                leader = False
+
+        if not leader:
+            waiter['event'].wait()
+            if waiter['error'] is not None:
+                raise waiter['error']
+            return waiter['entry']
+
+        try:
+            waiter['entry'] = self._render_once(key, render)
+            return waiter['entry']
+        except Exception as e:
+            waiter['error'] = e
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            waiter['event'].set()
+
+    def _render_once(self, key, render):
+        os.makedirs(self.directory, exist_ok=True)
+        stripe = int(hashlib.md5(key.encode('utf-8')).hexdigest(), 16) % LOCK_STRIPES
+        with open(os.path.join(self.directory, f'.lock-{stripe}'), 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                # Another worker may have rendered it while we waited for the lock
+                entry = self._read_disk(key)
+                if entry is None:
+                    body = render().encode('utf-8')
+                    entry = (body, compute_etag(body))
+                    self._write_disk(key, *entry)
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+        self._remember(key, entry)
+        return entry
+
+    def put(self, key, html):
+        """
+        Store a report that was already rendered elsewhere and return (body, etag)
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        body = html.encode('utf-8')
+        entry = (body, compute_etag(body))
+        self._write_disk(key, *entry)
+        self._remember(key, entry)
+        return entry
+
+
+def report_cache_key(submission_id, rule_version, template_version):
+    """
+    Cache key for one submission's report under given rule and template versions
+    """
+    return f'{submission_id}-{rule_version or "none"}-{template_version}'
+
+
+_report_cache = None
+_report_cache_lock = threading.Lock()
+
+
+def get_report_cache():
+    """
+    Get the process-wide report cache
+    """
+    global _report_cache
+    if _report_cache is None:
+        with _report_cache_lock:
+            if _report_cache is None:
+                _report_cache = ReportCache()
+    return _report_cache
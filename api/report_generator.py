@@ -4,21 +4,17 @@ Generates personalized HTML reports based on assessment scores and recommendatio
 """
 
 from datetime import datetime
-from api.scoring_analysis import calculate_service_area_scores, get_recommendations_for_scores, SERVICE_AREAS
+from html import escape
+from api.scoring_analysis import calculate_service_area_scores, get_recommendations_for_scores, get_active_rules, SERVICE_AREAS
+from api.score_table import get_score_percentiles
+from api.report_template import get_report_template
 
-def generate_overall_score(service_area_scores):
+def generate_overall_score(service_area_scores, rules=None):
     """
     Calculate overall AI readiness score as weighted average of service areas
     """
-    # Weight the service areas based on typical business importance
-    weights = {
-        'marketing_sales': 0.25,
-        'customer_service': 0.25,
-        'business_process': 0.30,  # Slightly higher weight for process automation
-        'data_analytics': 0.20
-    }
-    
-    weighted_score = sum(score * weights[area] for area, score in service_area_scores.items())
+    overall_weights = (rules or get_active_rules()).overall_weights
+    weighted_score = sum(score * overall_weights[area] for area, score in service_area_scores.items())
     return int(weighted_score)
 
 def get_overall_description(overall_score):
@@ -34,6 +30,14 @@ def get_overall_description(overall_score):
     else:
         return "Perfect starting point! AI can provide significant value as you build your digital foundation."
 
+def get_percentile_description(percentiles):
+    """
+    Describe how the overall score ranks against all possible profiles
+    """
+    if not percentiles:
+        return ""
+    return f"You score higher than {percentiles['overall']:.0f}% of possible business profiles."
+
 def get_priority_class(priority):
     """
     Convert priority text to CSS class
@@ -92,31 +96,41 @@ def get_top_priority_area(recommendations):
     
     return "Business Process Automation"  # Default fallback
 
-def generate_personalized_report(form_data):
+def get_assessment_date(form_data):
     """
-    Generate a complete personalized report based on form data
+    Date the assessment was submitted, falling back to today for unsaved data
     """
-    # Calculate scores and recommendations
-    service_area_scores = calculate_service_area_scores(form_data)
-    recommendations = get_recommendations_for_scores(service_area_scores)
-    overall_score = generate_overall_score(service_area_scores)
-    
-    # Read the HTML template
-    with open('api/report.html', 'r') as f:
-        template = f.read()
-    
-    # Prepare template variables
-    template_vars = {
+    submitted_at = form_data.get('submitted_at')
+    if submitted_at:
+        try:
+            return datetime.fromisoformat(submitted_at)
+        except (TypeError, ValueError):
+            pass
+    return datetime.now()
+
+def submitted_text(form_data, field, default):
+    """
+    A submitted answer escaped for the report HTML; submissions are untrusted
+    """
+    return escape(str(form_data.get(field, default)))
+
+def build_template_vars(form_data, recommendations, overall_score, percentiles=None):
+    """
+    Prepare the report template variables. Every submitted value is HTML-escaped;
+    the rest comes from the rule pack and the generator's own markup.
+    """
+    return {
         # Company information
-        'company_name': form_data.get('company', 'Your Company'),
-        'contact_name': form_data.get('name', 'Contact Name'),
-        'industry': form_data.get('industry', 'Not specified').title(),
-        'company_size': form_data.get('employees', 'Not specified'),
-        'assessment_date': datetime.now().strftime('%B %d, %Y'),
+        'company_name': submitted_text(form_data, 'company', 'Your Company'),
+        'contact_name': submitted_text(form_data, 'name', 'Contact Name'),
+        'industry': escape(str(form_data.get('industry', 'Not specified')).title()),
+        'company_size': submitted_text(form_data, 'employees', 'Not specified'),
+        'assessment_date': get_assessment_date(form_data).strftime('%B %d, %Y'),
         
         # Overall score
         'overall_score': overall_score,
         'overall_description': get_overall_description(overall_score),
+        'overall_percentile_text': get_percentile_description(percentiles),
         
         # Marketing & Sales AI
         'marketing_score': recommendations['marketing_sales']['score'],
@@ -150,15 +164,32 @@ def generate_personalized_report(form_data):
         'priority_matrix': create_priority_matrix(recommendations),
         'top_priority_area': get_top_priority_area(recommendations)
     }
+
+def render_report(form_data, service_area_scores, recommendations, overall_score, percentiles=None):
+    """
+    Render the report HTML from already computed scores (e.g. a stored submission)
+    """
+    template_vars = build_template_vars(form_data, recommendations, overall_score, percentiles)
+    report_html = get_report_template().render(template_vars)
     
-    # Replace template variables
-    for key, value in template_vars.items():
-        template = template.replace('{{' + key + '}}', str(value))
-    
-    return template, {
+    return report_html, {
         'service_area_scores': service_area_scores,
         'recommendations': recommendations,
         'overall_score': overall_score,
+        'percentiles': percentiles,
         'template_vars': template_vars
     }
 
+def generate_personalized_report(form_data):
+    """
+    Generate a complete personalized report based on form data
+    """
+    # Calculate scores and recommendations under one rule pack
+    rules = get_active_rules()
+    service_area_scores = calculate_service_area_scores(form_data, rules)
+    recommendations = get_recommendations_for_scores(service_area_scores, rules)
+    overall_score = generate_overall_score(service_area_scores, rules)
+    percentiles = get_score_percentiles(service_area_scores, overall_score, rules)
+    
+    # Render the cached template
+    return render_report(form_data, service_area_scores, recommendations, overall_score, percentiles)
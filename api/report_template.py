@@ -0,0 +1,76 @@
+"""
+Report Template Cache
+Parses report.html once into literal/placeholder segments and renders it in a single join
+"""
+
+import hashlib
+import os
+import re
+import threading
+
+REPORT_TEMPLATE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'report.html')
+
+PLACEHOLDER_PATTERN = re.compile(r'\{\{(\w+)\}\}')
+
+
+class CompiledTemplate:
+    """
+    A template split into alternating literal text and {{placeholder}} names
+    """
+
+    def __init__(self, source):
+        self.version = hashlib.sha256(source.encode('utf-8')).hexdigest()[:12]
+        parts = PLACEHOLDER_PATTERN.split(source)
+        self.literals = parts[0::2]
+        self.placeholders = parts[1::2]
+
+    def render(self, template_vars):
+        """
+        Substitute every placeholder in one pass. Placeholders without a value
+        are left in place, as the old str.replace loop did.
+        """
+        pieces = [self.literals[0]]
+        for name, literal in zip(self.placeholders, self.literals[1:]):
+            if name in template_vars:
+                pieces.append(str(template_vars[name]))
+            else:
+                pieces.append('{{' + name + '}}')
+            pieces.append(literal)
+        return ''.join(pieces)
+
+
+class TemplateCache:
+    """
+    Keeps compiled templates in memory and reloads one only when its file's
+    modification time changes
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        mtime = os.stat(path).st_mtime_ns
+        entry = self._entries.get(path)
+        if entry is not None and entry[0] == mtime:
+            return entry[1]
+
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == mtime:
+                return entry[1]
+
+            with open(path, 'r') as f:
+                template = CompiledTemplate(f.read())
+            self._entries[path] = (mtime, template)
+            return template
+
+
+_template_cache = TemplateCache()
+
+
+def get_report_template(path=REPORT_TEMPLATE_PATH):
+    """
+    Get the compiled report template, reloading it if the file has changed
+    """
+    return _template_cache.get(path)
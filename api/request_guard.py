@@ -0,0 +1,173 @@
+"""
+Submission Request Guard
+Rejects oversized and malformed submissions before any parsing or scoring work
+
+The body size is checked against MAX_SUBMISSION_BYTES from Content-Length before
+anything is read (and enforced while reading a chunked body). The JSON is then
+checked in one pass against a schema compiled from ASSESSMENT_QUESTIONS:
+- single-choice answers must be one of the question's options
+- multi-choice answers must be lists of distinct options, no longer than the option list
+- text answers must be strings within a length limit
+Fields the form does not score are allowed as short scalars, up to MAX_FIELDS
+fields in all. Answers the site form (assessment.html) spells differently are
+accepted and rewritten to the scored option (see FORM_ALIASES).
+
+Rejections are structured:
+    413 {"error": "Submission too large", "max_bytes": 16384}
+    415 {"error": "Content-Type must be application/json"}
+    400 {"error": "<first problem>", "errors": [{"field": "goals", "code": "invalid_option", "message": "..."}]}
+"""
+
+import json
+import os
+
+from api.pipeline import REQUIRED_FIELDS
+from api.scoring_analysis import ASSESSMENT_QUESTIONS
+
+MAX_SUBMISSION_BYTES = int(os.environ.get('MAX_SUBMISSION_BYTES', str(16 * 1024)))
+MAX_FIELDS = int(os.environ.get('MAX_SUBMISSION_FIELDS', '40'))
+
+# Longest accepted string per free-text question type
+STRING_LIMITS = {'text': 200, 'email': 254, 'tel': 40}
+# Free-text fields that are not assessment questions
+EXTRA_STRING_LIMITS = {'additional_info': 2000}
+# Any other field must be a scalar; strings are capped at this length
+MAX_EXTRA_LENGTH = 1000
+
+CHOICE_TYPES = ('radio', 'select')
+
+# Site form answers -> the scored option they are counted as
+FORM_ALIASES = {
+    'employees': {'201-500': '200+', '500+': '200+'},
+    'industry': {'professional_services': 'professional-services', 'hospitality': 'other'}
+}
+
+
+class RequestRejected(Exception):
+    """
+    Raised for a submission rejected by the guard; carries the HTTP status and JSON body
+    """
+
+    def __init__(self, status, body):
+        super().__init__(body['error'])
+        self.status = status
+        self.body = body
+
+
+def _problem(field, code, message):
+    return {'field': field, 'code': code, 'message': message}
+
+
+class SubmissionSchema:
+    """
+    Per-field checks compiled once from the assessment questions
+    """
+
+    def __init__(self, questions, required_fields, max_fields=MAX_FIELDS, aliases=FORM_ALIASES):
+        self.required_fields = list(required_fields)
+        self.max_fields = max_fields
+        self.aliases = {field: dict(mapping) for field, mapping in aliases.items() if field in questions}
+        # field -> (kind, allowed options or None, limit)
+        self.fields = {}
+        for question, config in questions.items():
+            options = config.get('options')
+            if config['type'] in CHOICE_TYPES and options:
+                self.fields[question] = ('choice', frozenset(options) | set(self.aliases.get(question, ())), None)
+            elif config['type'] == 'checkbox' and options:
+                self.fields[question] = ('multi', frozenset(options) | set(self.aliases.get(question, ())), len(options))
+            else:
+                self.fields[question] = ('string', None, STRING_LIMITS.get(config['type'], STRING_LIMITS['text']))
+        for field, limit in EXTRA_STRING_LIMITS.items():
+            self.fields.setdefault(field, ('string', None, limit))
+
+    def check(self, payload):
+        """
+        Every problem with a decoded payload, in one pass; an empty list when valid
+        """
+        if not isinstance(payload, dict):
+            return [_problem(None, 'invalid_type', 'Submission must be a JSON object')]
+        problems = []
+        if len(payload) > self.max_fields:
+            problems.append(_problem(None, 'too_many_fields', f'Submission has more than {self.max_fields} fields'))
+
+        for field in self.required_fields:
+            if not payload.get(field):
+                problems.append(_problem(field, 'required', f'Missing required field: {field}'))
+
+        for field, value in payload.items():
+            if value is None or value == '':
+                continue
+            kind, options, limit = self.fields.get(field, ('extra', None, MAX_EXTRA_LENGTH))
+
+            if kind == 'choice':
+                if not isinstance(value, str) or value not in options:
+                    problems.append(_problem(field, 'invalid_option',
+                                             f'{field} must be one of {", ".join(sorted(options))}'))
+            elif kind == 'multi':
+                if not isinstance(value, list):
+                    problems.append(_problem(field, 'invalid_type', f'{field} must be a list'))
+                elif len(value) > limit:
+                    problems.append(_problem(field, 'too_many_items', f'{field} accepts at most {limit} items'))
+                elif not all(isinstance(item, str) and item in options for item in value):
+                    problems.append(_problem(field, 'invalid_option',
+                                             f'{field} items must be among {", ".join(sorted(options))}'))
+                elif len(set(value)) != len(value):
+                    problems.append(_problem(field, 'duplicate_item', f'{field} lists an option more than once'))
+            elif kind == 'string':
+                if not isinstance(value, str):
+                    problems.append(_problem(field, 'invalid_type', f'{field} must be a string'))
+                elif len(value) > limit:
+                    problems.append(_problem(field, 'too_long', f'{field} must be at most {limit} characters'))
+                elif field == 'email' and '@' not in value:
+                    problems.append(_problem(field, 'invalid_email', 'email must be an email address'))
+            elif isinstance(value, str):
+                if len(value) > limit:
+                    problems.append(_problem(field, 'too_long', f'{field} must be at most {limit} characters'))
+            elif not isinstance(value, (bool, int, float)):
+                problems.append(_problem(field, 'invalid_type', f'{field} must be a string, number or boolean'))
+        return problems
+
+    def normalize(self, payload):
+        """
+        Rewrite aliased answers of a valid payload to the options they are scored as
+        """
+        for field, mapping in self.aliases.items():
+            value = payload.get(field)
+            if isinstance(value, str):
+                payload[field] = mapping.get(value, value)
+            elif isinstance(value, list):
+                payload[field] = list(dict.fromkeys(mapping.get(item, item) for item in value))
+        return payload
+
+
+submission_schema = SubmissionSchema(ASSESSMENT_QUESTIONS, REQUIRED_FIELDS)
+# What-if exploration takes answers alone, without contact details
+what_if_schema = SubmissionSchema(ASSESSMENT_QUESTIONS, ())
+
+
+def _invalid(problems):
+    return RequestRejected(400, {'error': problems[0]['message'], 'errors': problems})
+
+
+def read_submission(request, max_bytes=MAX_SUBMISSION_BYTES, schema=submission_schema):
+    """
+    The validated submission from a Flask request, or RequestRejected
+    """
+    if request.content_length is not None and request.content_length > max_bytes:
+        raise RequestRejected(413, {'error': 'Submission too large', 'max_bytes': max_bytes})
+    if not request.is_json:
+        raise RequestRejected(415, {'error': 'Content-Type must be application/json'})
+
+    # Never read more than the cap, even from a chunked body without a length
+    body = request.stream.read(max_bytes + 1)
+    if len(body) > max_bytes:
+        raise RequestRejected(413, {'error': 'Submission too large', 'max_bytes': max_bytes})
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        raise _invalid([_problem(None, 'invalid_json', 'Request body must be valid JSON')])
+
+    problems = schema.check(payload)
+    if problems:
+        raise _invalid(problems)
+    return schema.normalize(payload)
@@ -0,0 +1,350 @@
+"""
+Scoring Rule Packs
+Versioned JSON files holding the tunable scoring rules (answer weights, level
+ranges and recommendations, normalizers and overall weights), validated and
+compiled into lookup tables and swapped into running workers without a restart
+
+A pack looks like:
+    {
+        "version": "2025-02-01",
+        "questions": {"employees": {"scoring": {"1-10": {"marketing_sales": 5, ...}, ...}}, ...},
+        "score_ranges": {"marketing_sales": {"ranges": [...], "recommendations": {...}}, ...},
+        "max_possible_scores": {"marketing_sales": 140, ...},
+        "overall_weights": {"marketing_sales": 0.25, ...}
+    }
+
+Packs live in RULES_DIR (default api/rules). The active pack is RULES_PACK if set,
+otherwise the last *.json file by name; with no pack files the rules built into
+scoring_analysis.py apply. Each worker re-checks the directory at most every
+RULES_CHECK_INTERVAL seconds and swaps in a changed pack once it compiles; an
+invalid pack is rejected and the previous one stays active.
+
+Tools:
+    python -m api.rule_packs export > api/rules/2025-02-01.json
+    python -m api.rule_packs validate api/rules/2025-02-01.json
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+RULES_DIR = os.environ.get('RULES_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'rules'))
+RULES_PACK = os.environ.get('RULES_PACK')
+RULES_CHECK_INTERVAL = float(os.environ.get('RULES_CHECK_INTERVAL', '2'))
+
+# Area scores are normalized to 0-100, so level lookups are a 101-entry array
+LEVEL_POINTS = 101
+
+DEFAULT_LEVEL = {'level': 'Basic', 'priority': 'Low'}
+
+VERSION_PATTERN = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+
+class RulePackError(ValueError):
+    """
+    Raised when a rule pack fails validation
+    """
+
+
+def rules_fingerprint(questions, score_ranges, max_possible_scores, overall_weights):
+    """
+    Short hash of everything that affects results (question weights, level ranges
+    and recommendations, normalizers and overall weights), independent of the
+    pack's declared version
+    """
+    scored = {
+        question: {'type': config['type'], 'scoring': config['scoring']}
+        for question, config in questions.items()
+        if config['scoring'] is not None
+    }
+    payload = json.dumps(
+        {'questions': scored, 'score_ranges': score_ranges, 'normalizers': max_possible_scores,
+         'overall_weights': overall_weights},
+        sort_keys=True
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _area_mapping(source, name, areas, check):
+    if not isinstance(source, dict) or set(source) != set(areas):
+        raise RulePackError(f'{name} must have exactly the areas {", ".join(areas)}')
+    for area in areas:
+        if not check(source[area]):
+            raise RulePackError(f'{name}.{area} has an invalid value: {source[area]!r}')
+    return {area: source[area] for area in areas}
+
+
+class RulePack:
+    """
+    A validated, compiled rule pack. Instances are never modified after
+    construction, so a request can hold one for its whole duration while
+    another pack is swapped in.
+    """
+
+    def __init__(self, source, form_questions, service_areas):
+        if not isinstance(source, dict):
+            raise RulePackError('Rule pack must be a JSON object')
+        areas = list(service_areas)
+
+        self.version = source.get('version')
+        if not isinstance(self.version, str) or not VERSION_PATTERN.match(self.version):
+            raise RulePackError('version must be 1-64 letters, digits, ".", "_" or "-"')
+
+        self.max_possible_scores = _area_mapping(
+            source.get('max_possible_scores'), 'max_possible_scores', areas, lambda v: _is_number(v) and v > 0
+        )
+        self.overall_weights = _area_mapping(
+            source.get('overall_weights'), 'overall_weights', areas, lambda v: _is_number(v) and v >= 0
+        )
+        self.questions = self._compile_questions(source.get('questions'), form_questions, areas)
+        self.scored_questions = [
+            (question, config['type'] == 'checkbox', config['scoring'])
+            for question, config in self.questions.items()
+            if config['scoring'] is not None
+        ]
+        self.score_ranges, self.levels = self._compile_levels(source.get('score_ranges'), areas)
+
+        self.fingerprint = rules_fingerprint(
+            self.questions, self.score_ranges, self.max_possible_scores, self.overall_weights
+        )
+        self.rule_version = f'{self.version}-{self.fingerprint}'
+
+    @staticmethod
+    def _compile_questions(source, form_questions, areas):
+        if not isinstance(source, dict):
+            raise RulePackError('questions must be an object')
+        unknown = set(source) - set(form_questions)
+        if unknown:
+            raise RulePackError(f'questions has unknown questions: {", ".join(sorted(unknown))}')
+
+        # Keep the form's question order, which fixes the engine and table layouts
+        questions = {}
+        for question, form_config in form_questions.items():
+            entry = source.get(question)
+            if entry is not None and not isinstance(entry, dict):
+                raise RulePackError(f'questions.{question} must be an object')
+            scoring = (entry or {}).get('scoring')
+            if scoring is None:
+                questions[question] = {'type': form_config['type'], 'scoring': None}
+                continue
+            if not isinstance(scoring, dict) or not scoring:
+                raise RulePackError(f'questions.{question}.scoring must be a non-empty object')
+            options = form_config.get('options') or []
+            for option, points in scoring.items():
+                if option not in options:
+                    raise RulePackError(f'questions.{question} scores unknown option {option!r}')
+                if not isinstance(points, dict) or set(points) - set(areas):
+                    raise RulePackError(f'questions.{question}.{option} must map service areas to points')
+                if not all(_is_int(p) and p >= 0 for p in points.values()):
+                    raise RulePackError(f'questions.{question}.{option} points must be non-negative integers')
+            questions[question] = {'type': form_config['type'], 'scoring': scoring}
+        return questions
+
+    @staticmethod
+    def _compile_levels(source, areas):
+        if not isinstance(source, dict) or set(source) != set(areas):
+            raise RulePackError(f'score_ranges must have exactly the areas {", ".join(areas)}')
+
+        score_ranges = {}
+        levels = {}
+        for area in areas:
+            config = source[area]
+            recommendations = config.get('recommendations') if isinstance(config, dict) else None
+            ranges = config.get('ranges') if isinstance(config, dict) else None
+            if not isinstance(recommendations, dict) or not isinstance(ranges, list):
+                raise RulePackError(f'score_ranges.{area} needs "ranges" and "recommendations"')
+            for level, items in recommendations.items():
+                if not isinstance(items, list) or not all(isinstance(item, str) for item in items):
+                    raise RulePackError(f'score_ranges.{area}.recommendations.{level} must be a list of strings')
+
+            default = config.get('default', DEFAULT_LEVEL)
+            compiled_ranges = []
+            for range_config in ranges + [default]:
+                level = range_config.get('level') if isinstance(range_config, dict) else None
+                if not isinstance(level, str) or level not in recommendations:
+                    raise RulePackError(f'score_ranges.{area} refers to a level without recommendations')
+                if not isinstance(range_config.get('priority'), str):
+                    raise RulePackError(f'score_ranges.{area} has a range without a priority')
+            for range_config in ranges:
+                low, high = range_config.get('min'), range_config.get('max')
+                if not (_is_int(low) and _is_int(high) and 0 <= low <= high <= 100):
+                    raise RulePackError(f'score_ranges.{area} range bounds must be integers within 0-100')
+                compiled_ranges.append(range_config)
+
+            # First matching range wins, as in the original range scan
+            table = []
+            for score in range(LEVEL_POINTS):
+                match = next((r for r in compiled_ranges if r['min'] <= score <= r['max']), default)
+                table.append((match['level'], match['priority']))
+            levels[area] = (tuple(table), (default['level'], default['priority']))
+            score_ranges[area] = {'ranges': compiled_ranges, 'recommendations': recommendations, 'default': default}
+        return score_ranges, levels
+
+    def level_for(self, area, score):
+        """
+        (level, priority) for an area score
+        """
+        table, default = self.levels[area]
+        if _is_int(score) and 0 <= score < LEVEL_POINTS:
+            return table[score]
+        for range_config in self.score_ranges[area]['ranges']:
+            if range_config['min'] <= score <= range_config['max']:
+                return range_config['level'], range_config['priority']
+        return default
+
+    def to_source(self):
+        """
+        The pack in its JSON file form
+        """
+        return {
+            'version': self.version,
+            'questions': {
+                question: {'scoring': config['scoring']}
+                for question, config in self.questions.items()
+                if config['scoring'] is not None
+            },
+            'score_ranges': self.score_ranges,
+            'max_possible_scores': self.max_possible_scores,
+            'overall_weights': self.overall_weights
+        }
+
+
+def load_rule_pack(path, form_questions, service_areas):
+    """
+    Read, validate and compile a rule pack file
+    """
+    with open(path, encoding='utf-8') as f:
+        try:
+            source = json.load(f)
+        except ValueError as e:
+            raise RulePackError(f'Invalid JSON: {e}')
+    return RulePack(source, form_questions, service_areas)
+
+
+class RulePackRegistry:
+    """
+    Holds the active rule pack for this process and swaps in new pack files.
+    The swap is a single reference assignment, so readers see either the old
+    or the new pack, never a mix.
+    """
+
+    def __init__(self, builtin, form_questions, service_areas, directory=RULES_DIR, pack_name=RULES_PACK,
+                 check_interval=RULES_CHECK_INTERVAL):
+        self.form_questions = form_questions
+        self.service_areas = service_areas
+        self.directory = directory
+        self.pack_name = pack_name
+        self.check_interval = check_interval
+        self.builtin = RulePack(builtin, form_questions, service_areas)
+        self._active = self.builtin
+        self._signature = None
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    def _select_path(self):
+        if self.pack_name:
+            return os.path.join(self.directory, self.pack_name)
+        paths = sorted(glob.glob(os.path.join(self.directory, '*.json')))
+        return paths[-1] if paths else None
+
+    def active(self):
+        """
+        The current pack, re-checking the rules directory at most once per interval
+        """
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.check_interval:
+            return self._active
+
+        with self._lock:
+            if self._checked_at is not None and now - self._checked_at < self.check_interval:
+                return self._active
+            self._checked_at = now
+            self._refresh()
+            return self._active
+
+    def reload(self):
+        """
+        Re-check the rules directory now
+        """
+        with self._lock:
+            self._checked_at = time.monotonic()
+            self._refresh()
+            return self._active
+
+    def _refresh(self):
+        path = self._select_path()
+        try:
+            stat = os.stat(path) if path else None
+        except OSError:
+            stat = None
+        signature = (path, stat.st_mtime_ns, stat.st_size) if stat else None
+        if signature == self._signature:
+            return
+        # Remember the signature even if the pack is rejected, so it is not re-parsed every check
+        self._signature = signature
+
+        if signature is None:
+            if path:
+                print(f"Rule pack {path} not found - using built-in scoring rules")
+            pack = self.builtin
+        else:
+            try:
+                pack = load_rule_pack(path, self.form_questions, self.service_areas)
+            except Exception as e:
+                # Whatever is wrong with the file, the last good pack stays active
+                print(f"Rule pack {path} rejected, keeping {self._active.rule_version}: {str(e)}")
+                return
+
+        if pack.rule_version != self._active.rule_version:
+            print(f"Scoring rules {pack.rule_version} active")
+        self._active = pack
+
+
+def main(argv=None):
+    from api.scoring_analysis import ASSESSMENT_QUESTIONS, SERVICE_AREAS, rule_packs
+
+    parser = argparse.ArgumentParser(description='Scoring rule pack tools')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    validate_parser = subparsers.add_parser('validate', help='Validate and compile pack files')
+    validate_parser.add_argument('paths', nargs='+')
+    export_parser = subparsers.add_parser('export', help='Print the active rules as a pack file')
+    export_parser.add_argument('--version', help='Version to give the exported pack')
+    args = parser.parse_args(argv)
+
+    if args.command == 'export':
+        source = rule_packs.active().to_source()
+        if args.version:
+            source['version'] = args.version
+        json.dump(source, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+        return
+
+    failed = False
+    for path in args.paths:
+        try:
+            pack = load_rule_pack(path, ASSESSMENT_QUESTIONS, SERVICE_AREAS)
+        except (OSError, ValueError) as e:
+            print(f"{path}: INVALID - {str(e)}")
+            failed = True
+        else:
+            print(f"{path}: OK - rule version {pack.rule_version}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
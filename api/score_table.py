@@ -0,0 +1,395 @@
+"""
+Answer-Space Score Table
+Precomputes the service area scores of every possible combination of scored answers
+into a memory-mappable file, together with score CDFs for percentile ranking
+
+Server warm-up (api/warmup.py) builds the table when it is missing or was built
+from other rules; it can also be built offline with:
+    python -m api.score_table build [--output PATH]
+Without a current table, scores are computed directly and reports carry no
+percentiles.
+"""
+
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from api.scoring_analysis import ASSESSMENT_QUESTIONS, SERVICE_AREAS, get_active_rules
+from api.rule_packs import load_rule_pack
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+SCORE_TABLE_PATH = os.environ.get(
+    'SCORE_TABLE_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'score_table.bin')
+)
+
+MAGIC = b'AISCTBL1'
+PREFIX = struct.Struct('<8sI')
+ALIGNMENT = 64
+CDF_POINTS = 101  # scores 0..100
+
+
+class AnswerSpaceLayout:
+    """
+    Mixed-radix packing of the scored answers into a single integer code.
+
+    Single-choice questions contribute one digit (0 = unanswered, i = option i-1).
+    Checkbox questions contribute a bitmask over their options that carry points;
+    zero-weight options such as 'none' never change a score and are folded away.
+    The first scored question is the most significant digit.
+    """
+
+    def __init__(self, fields):
+        self.fields = fields
+        self._lookups = []
+        for field in fields:
+            if field['kind'] == 'checkbox':
+                self._lookups.append({option: 1 << bit for bit, option in enumerate(field['options'])})
+            else:
+                self._lookups.append({option: state + 1 for state, option in enumerate(field['options'])})
+
+    @classmethod
+    def from_questions(cls, questions=ASSESSMENT_QUESTIONS):
+        fields = []
+        for question, config in questions.items():
+            if config['scoring'] is None:
+                continue
+            if config['type'] == 'checkbox':
+                options = [option for option, points in config['scoring'].items() if any(points.values())]
+                fields.append({'question': question, 'kind': 'checkbox', 'options': options,
+                               'radix': 1 << len(options)})
+            else:
+                options = list(config['scoring'])
+                fields.append({'question': question, 'kind': 'single', 'options': options,
+                               'radix': len(options) + 1})
+        return cls(fields)
+
+    @property
+    def num_codes(self):
+        total = 1
+        for field in self.fields:
+            total *= field['radix']
+        return total
+
+    def encode(self, form_data):
+        """
+        Pack a submission into its answer code. Returns None when the submission
+        repeats a checkbox option, since repeats are scored more than once and
+        have no slot in the table.
+        """
+        code = 0
+        for field, lookup in zip(self.fields, self._lookups):
+            value = form_data.get(field['question'])
+            state = 0
+            if field['kind'] == 'checkbox':
+                if value and isinstance(value, list):
+                    for item in value:
+                        bit = lookup.get(item, 0)
+                        if state & bit:
+                            return None
+                        state |= bit
+            elif value and value in lookup:
+                state = lookup[value]
+            code = code * field['radix'] + state
+        return code
+
+    def state_points(self, questions, areas):
+        """
+        Raw points per area for every digit value of every field
+        """
+        import numpy as np
+
+        tables = []
+        for field in self.fields:
+            scoring = questions[field['question']]['scoring']
+            option_points = np.array(
+                [[scoring[option].get(area, 0) for area in areas] for option in field['options']],
+                dtype=np.int64
+            ).reshape(len(field['options']), len(areas))
+
+            if field['kind'] == 'checkbox':
+                masks = np.arange(field['radix'])
+                bits = (masks[:, None] >> np.arange(len(field['options']))) & 1
+                tables.append(bits @ option_points)
+            else:
+                tables.append(np.vstack([np.zeros((1, len(areas)), dtype=np.int64), option_points]))
+        return tables
+
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def build_score_table(path=SCORE_TABLE_PATH, rules=None):
+    """
+    Score every possible answer combination under a rule pack (default: the
+    active one) and write the table file.
+
+    Each row holds one uint8 score per service area followed by the overall
+    score. The CDFs count complete profiles only, i.e. every single-choice
+    question answered and any subset of checkbox options.
+    """
+    import numpy as np
+
+    rules = rules or get_active_rules()
+    questions = rules.questions
+    max_possible_scores = rules.max_possible_scores
+    overall_weights = rules.overall_weights
+    layout = AnswerSpaceLayout.from_questions(questions)
+    areas = list(max_possible_scores.keys())
+    metrics = areas + ['overall']
+    row_width = len(metrics)
+    state_points = layout.state_points(questions, areas)
+
+    # Exact lookup from raw points to normalized score, per area
+    low = sum(points.min(axis=0) for points in state_points)
+    high = sum(points.max(axis=0) for points in state_points)
+    normalize_luts = []
+    for a, area in enumerate(areas):
+        lut = [min(100, int((raw / max_possible_scores[area]) * 100)) for raw in range(low[a], high[a] + 1)]
+        if min(lut) < 0:
+            raise ValueError(f'Scores for {area} can go negative and cannot be tabulated')
+        normalize_luts.append(np.array(lut, dtype=np.uint8))
+
+    # Raw points and completeness of every combination of the non-leading fields
+    inner_shape = tuple(field['radix'] for field in layout.fields[1:])
+    inner_raw = np.zeros(inner_shape + (len(areas),), dtype=np.int64)
+    inner_complete = np.ones(inner_shape, dtype=bool)
+    for axis, (field, points) in enumerate(zip(layout.fields[1:], state_points[1:])):
+        shape = [1] * len(inner_shape)
+        shape[axis] = field['radix']
+        inner_raw = inner_raw + points.reshape(shape + [len(areas)])
+        if field['kind'] == 'single':
+            inner_complete = inner_complete & (np.arange(field['radix']) > 0).reshape(shape)
+    inner_raw = inner_raw.reshape(-1, len(areas))
+    inner_complete = inner_complete.reshape(-1)
+
+    header = json.dumps({
+        'version': 1,
+        'rules_fingerprint': rules.fingerprint,
+        'rule_version': rules.rule_version,
+        'areas': areas,
+        'metrics': metrics,
+        'fields': layout.fields,
+        'num_codes': layout.num_codes,
+        'row_width': row_width
+    }).encode('utf-8')
+    cdf_offset = _align(PREFIX.size + len(header))
+    table_offset = _align(cdf_offset + len(metrics) * CDF_POINTS * 8)
+
+    histograms = np.zeros((len(metrics), CDF_POINTS), dtype=np.int64)
+    weights = [overall_weights[area] for area in areas]
+    leading = layout.fields[0]
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(PREFIX.pack(MAGIC, len(header)))
+        f.write(header)
+        f.write(b'\0' * (table_offset - PREFIX.size - len(header)))
+
+        for state, points in enumerate(state_points[0]):
+            raw = inner_raw + points
+            rows = np.empty((len(raw), row_width), dtype=np.uint8)
+            for a in range(len(areas)):
+                rows[:, a] = normalize_luts[a][raw[:, a] - low[a]]
+
+            # Same float operations, in the same order, as generate_overall_score
+            overall = rows[:, 0] * weights[0]
+            for a in range(1, len(areas)):
+                overall = overall + rows[:, a] * weights[a]
+            rows[:, -1] = overall.astype(np.int64)
+
+            f.write(rows.tobytes())
+
+            if leading['kind'] == 'checkbox' or state > 0:
+                complete_rows = rows[inner_complete]
+                for m in range(len(metrics)):
+                    histograms[m] += np.bincount(complete_rows[:, m], minlength=CDF_POINTS)[:CDF_POINTS]
+
+        # Share of complete profiles scoring strictly below each score
+        totals = histograms.sum(axis=1, keepdims=True)
+        below = np.cumsum(histograms, axis=1) - histograms
+        f.seek(cdf_offset)
+        f.write((below / np.maximum(totals, 1)).astype('<f8').tobytes())
+
+    os.replace(tmp_path, path)
+    return layout.num_codes
+
+
+class ScoreTable:
+    """
+    Read-only, memory-mapped view of a built score table
+    """
+
+    def __init__(self, path=SCORE_TABLE_PATH):
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, header_length = PREFIX.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f'{path} is not a score table')
+        header = json.loads(self._mmap[PREFIX.size:PREFIX.size + header_length])
+
+        self.rules_fingerprint = header['rules_fingerprint']
+        self.areas = header['areas']
+        self.metrics = header['metrics']
+        self.row_width = header['row_width']
+        self.num_codes = header['num_codes']
+        self.layout = AnswerSpaceLayout(header['fields'])
+
+        cdf_offset = _align(PREFIX.size + header_length)
+        cdf_size = len(self.metrics) * CDF_POINTS * 8
+        self.table_offset = _align(cdf_offset + cdf_size)
+
+        cdf = array('d', self._mmap[cdf_offset:cdf_offset + cdf_size])
+        if sys.byteorder != 'little':
+            cdf.byteswap()
+        self._share_below = {
+            metric: cdf[m * CDF_POINTS:(m + 1) * CDF_POINTS] for m, metric in enumerate(self.metrics)
+        }
+
+    def lookup(self, form_data):
+        """
+        Return (service_area_scores, overall_score) for a submission, or None if
+        the submission cannot be represented by an answer code
+        """
+        code = self.layout.encode(form_data)
+        if code is None:
+            return None
+        offset = self.table_offset + code * self.row_width
+        row = self._mmap[offset:offset + self.row_width]
+        return dict(zip(self.areas, row)), row[-1]
+
+    def share_below(self, metric, score):
+        """
+        Fraction of possible profiles that score strictly below the given score
+        """
+        return self._share_below[metric][max(0, min(100, int(score)))]
+
+    def percentiles(self, service_area_scores, overall_score):
+        """
+        "Higher than X% of possible profiles" for the overall and each area score
+        """
+        result = {'overall': round(self.share_below('overall', overall_score) * 100, 1)}
+        for area, score in service_area_scores.items():
+            result[area] = round(self.share_below(area, score) * 100, 1)
+        return result
+
+
+# (rules fingerprint, table or None) for the most recently used rule pack
+_score_table_state = (None, None)
+
+
+def get_score_table(rules=None):
+    """
+    Get the built score table, or None if it is missing or built from other rules
+    """
+    global _score_table_state
+    rules = rules or get_active_rules()
+    fingerprint, table = _score_table_state
+    if fingerprint == rules.fingerprint:
+        return table
+
+    table = _open_current(SCORE_TABLE_PATH, rules)
+    if table is None:
+        print(f"Warning: no score table for rules {rules.rule_version} - scoring without it and reports "
+              f"carry no percentiles (build with python -m api.score_table build)")
+    _score_table_state = (rules.fingerprint, table)
+    return table
+
+
+def _open_current(path, rules):
+    """
+    The table at path if it was built from these rules, else None
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        table = ScoreTable(path)
+    except (OSError, ValueError) as e:
+        print(f"Score table unavailable: {str(e)}")
+        return None
+    if table.rules_fingerprint != rules.fingerprint:
+        print(f"Score table was built from different scoring rules than {rules.rule_version} - ignoring it")
+        return None
+    return table
+
+
+def ensure_score_table(rules=None):
+    """
+    Build the score table for the rules (default: the active ones) if it is missing
+    or stale. Concurrent callers wait on a lock file and build it once. Returns
+    True when a current table is available.
+    """
+    global _score_table_state
+    rules = rules or get_active_rules()
+    if _open_current(SCORE_TABLE_PATH, rules) is not None:
+        return True
+
+    with open(SCORE_TABLE_PATH + '.lock', 'a') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            # Another process may have built it while we waited
+            if _open_current(SCORE_TABLE_PATH, rules) is None:
+                try:
+                    build_score_table(SCORE_TABLE_PATH, rules)
+                except (ImportError, OSError, ValueError) as e:
+                    print(f"Warning: could not build the score table: {str(e)}")
+                    return False
+                print(f"Built the score table for rules {rules.rule_version} at {SCORE_TABLE_PATH}")
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    # Reopen on next use instead of keeping a cached None
+    _score_table_state = (None, None)
+    return True
+
+
+def lookup_service_area_scores(form_data, rules=None):
+    """
+    O(1) score lookup; returns None when no table is available for the submission
+    """
+    table = get_score_table(rules)
+    if table is None:
+        return None
+    result = table.lookup(form_data)
+    return result[0] if result is not None else None
+
+
+def get_score_percentiles(service_area_scores, overall_score, rules=None):
+    """
+    Percentile ranking against all possible profiles, or None without a table
+    """
+    table = get_score_table(rules)
+    if table is None:
+        return None
+    return table.percentiles(service_area_scores, overall_score)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Answer-space score table tools')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build_parser = subparsers.add_parser('build', help='Build the score table file')
+    build_parser.add_argument('--output', default=SCORE_TABLE_PATH)
+    build_parser.add_argument('--rules', help='Rule pack file to build for (default: the active rules)')
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        rules = load_rule_pack(args.rules, ASSESSMENT_QUESTIONS, SERVICE_AREAS) if args.rules else None
+        num_codes = build_score_table(args.output, rules)
+        size_mb = os.path.getsize(args.output) / (1024 * 1024)
+        print(f"Wrote {num_codes} answer codes to {args.output} ({size_mb:.1f} MB)")
+
+
+if __name__ == '__main__':
+    main()
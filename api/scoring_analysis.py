@@ -3,6 +3,8 @@ AI Assessment Scoring Analysis
 Maps current assessment questions to the four service areas and creates scoring logic
 """
 
+from api.rule_packs import RulePackRegistry
+
 # Four Service Areas from Market Research
 SERVICE_AREAS = {
     'marketing_sales': 'Marketing & Sales AI Solutions',
@@ -258,10 +260,49 @@ SCORE_RANGES = {
     }
 }
 
-def calculate_service_area_scores(form_data):
+# Normalizers used to map raw points onto the 0-100 range
+MAX_POSSIBLE_SCORES = {
+    'marketing_sales': 140,  # Calculated based on maximum possible points
+    'customer_service': 140,
+    'business_process': 140,
+    'data_analytics': 140
+}
+
+# Weight the service areas based on typical business importance
+OVERALL_SCORE_WEIGHTS = {
+    'marketing_sales': 0.25,
+    'customer_service': 0.25,
+    'business_process': 0.30,  # Slightly higher weight for process automation
+    'data_analytics': 0.20
+}
+
+# The literals above are the built-in rule pack; versioned pack files in
+# api/rules/ replace them at runtime (see api/rule_packs.py)
+BUILTIN_RULE_PACK = {
+    'version': 'builtin',
+    'questions': {
+        question: {'scoring': config['scoring']}
+        for question, config in ASSESSMENT_QUESTIONS.items()
+        if config['scoring'] is not None
+    },
+    'score_ranges': SCORE_RANGES,
+    'max_possible_scores': MAX_POSSIBLE_SCORES,
+    'overall_weights': OVERALL_SCORE_WEIGHTS
+}
+
+rule_packs = RulePackRegistry(BUILTIN_RULE_PACK, ASSESSMENT_QUESTIONS, SERVICE_AREAS)
+
+def get_active_rules():
+    """
+    Get the compiled rule pack currently in effect
+    """
+    return rule_packs.active()
+
+def calculate_service_area_scores(form_data, rules=None):
     """
     Calculate scores for each of the four service areas based on form responses
     """
+    rules = rules or get_active_rules()
     scores = {
         'marketing_sales': 0,
         'customer_service': 0, 
@@ -269,65 +310,48 @@ def calculate_service_area_scores(form_data):
         'data_analytics': 0
     }
     
-    # Process each question
-    for question, config in ASSESSMENT_QUESTIONS.items():
-        if config['scoring'] is None:
-            continue
-            
+    # Process each scored question
+    for question, is_checkbox, scoring in rules.scored_questions:
         value = form_data.get(question)
         if not value:
             continue
             
-        if config['type'] == 'checkbox':
+        if is_checkbox:
             # Handle multiple selections
             if isinstance(value, list):
                 for item in value:
-                    if item in config['scoring']:
-                        for area, points in config['scoring'][item].items():
+                    if item in scoring:
+                        for area, points in scoring[item].items():
                             scores[area] += points
         else:
             # Handle single selections
-            if value in config['scoring']:
-                for area, points in config['scoring'][value].items():
+            if value in scoring:
+                for area, points in scoring[value].items():
                     scores[area] += points
     
     # Normalize scores to 0-100 range
-    max_possible_scores = {
-        'marketing_sales': 140,  # Calculated based on maximum possible points
-        'customer_service': 140,
-        'business_process': 140, 
-        'data_analytics': 140
-    }
-    
     normalized_scores = {}
     for area, score in scores.items():
-        normalized_scores[area] = min(100, int((score / max_possible_scores[area]) * 100))
+        normalized_scores[area] = min(100, int((score / rules.max_possible_scores[area]) * 100))
     
     return normalized_scores
 
-def get_recommendations_for_scores(scores):
+def get_recommendations_for_scores(scores, rules=None):
     """
     Get personalized recommendations based on scores for each service area
     """
+    rules = rules or get_active_rules()
     recommendations = {}
     
     for area, score in scores.items():
-        area_config = SCORE_RANGES[area]
-        
-        # Find the appropriate range
-        level = 'Basic'
-        priority = 'Low'
-        for range_config in area_config['ranges']:
-            if range_config['min'] <= score <= range_config['max']:
-                level = range_config['level']
-                priority = range_config['priority']
-                break
+        # Precompiled 0-100 score -> (level, priority) table
+        level, priority = rules.level_for(area, score)
         
         recommendations[area] = {
             'score': score,
             'level': level,
             'priority': priority,
-            'recommendations': area_config['recommendations'][level],
+            'recommendations': rules.score_ranges[area]['recommendations'][level],
             'area_name': SERVICE_AREAS[area]
         }
     
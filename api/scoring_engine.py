@@ -0,0 +1,141 @@
+"""
+Compiled Scoring Engine
+Compiles the scoring rules into a dense option-by-area weight matrix so that
+many submissions can be scored with a single matrix multiplication
+"""
+
+import numpy as np
+
+from api.scoring_analysis import ASSESSMENT_QUESTIONS, MAX_POSSIBLE_SCORES, get_active_rules
+
+
+class ScoringEngine:
+    """
+    Dense, precompiled form of the service area scoring rules.
+
+    Every (question, option) pair with a scoring entry becomes one column of the
+    encoding and one row of the weight matrix. A submission is encoded as a
+    one-hot (radio/select) or multi-hot (checkbox) count vector, so scoring N
+    submissions is a single (N x options) @ (options x areas) product.
+    """
+
+    def __init__(self, questions=ASSESSMENT_QUESTIONS, max_possible_scores=MAX_POSSIBLE_SCORES):
+        self.areas = list(max_possible_scores.keys())
+        self.columns = []
+        self.option_index = {}
+        self.checkbox_questions = []
+        self.single_questions = []
+
+        weight_rows = []
+        for question, config in questions.items():
+            if config['scoring'] is None:
+                continue
+
+            index = {}
+            for option, points in config['scoring'].items():
+                index[option] = len(self.columns)
+                self.columns.append((question, option))
+                weight_rows.append([points.get(area, 0) for area in self.areas])
+            self.option_index[question] = index
+
+            if config['type'] == 'checkbox':
+                self.checkbox_questions.append((question, index))
+            else:
+                self.single_questions.append((question, index))
+
+        self.weights = np.array(weight_rows, dtype=np.int64).reshape(len(self.columns), len(self.areas))
+        self.normalizers = np.array([max_possible_scores[area] for area in self.areas], dtype=np.float64)
+
+    @property
+    def num_options(self):
+        return len(self.columns)
+
+    def option_columns(self, form_data):
+        """
+        List the encoding columns selected by one submission (repeats allowed).
+        Mirrors the lookup rules of calculate_service_area_scores exactly.
+        """
+        columns = []
+        for question, index in self.single_questions:
+            value = form_data.get(question)
+            if not value:
+                continue
+            if value in index:
+                columns.append(index[value])
+
+        for question, index in self.checkbox_questions:
+            value = form_data.get(question)
+            if not value or not isinstance(value, list):
+                continue
+            for item in value:
+                if item in index:
+                    columns.append(index[item])
+
+        return columns
+
+    def encode_batch(self, submissions):
+        """
+        Encode a sequence of submissions into an (N x options) count matrix
+        """
+        flat_positions = []
+        count = 0
+        width = self.num_options
+        for form_data in submissions:
+            offset = count * width
+            flat_positions.extend(offset + column for column in self.option_columns(form_data))
+            count += 1
+
+        encoded = np.bincount(
+            np.asarray(flat_positions, dtype=np.int64), minlength=count * width
+        )
+        return encoded.reshape(count, width)
+
+    def raw_scores(self, encoded):
+        """
+        Raw (un-normalized) points per area for an encoded batch
+        """
+        return encoded @ self.weights
+
+    def normalize(self, raw):
+        """
+        Map raw points onto the 0-100 range using the same float arithmetic as
+        calculate_service_area_scores
+        """
+        normalized = ((raw / self.normalizers) * 100).astype(np.int64)
+        return np.minimum(100, normalized)
+
+    def score_matrix(self, encoded):
+        """
+        Normalized (N x areas) score matrix for an encoded batch
+        """
+        return self.normalize(self.raw_scores(encoded))
+
+    def to_dicts(self, matrix):
+        """
+        Convert a score matrix into calculate_service_area_scores-style dicts
+        """
+        return [dict(zip(self.areas, row)) for row in matrix.tolist()]
+
+    def score_batch(self, submissions):
+        """
+        Score many submissions at once. Returns one dict per submission, identical
+        to what calculate_service_area_scores would return for it.
+        """
+        return self.to_dicts(self.score_matrix(self.encode_batch(submissions)))
+
+
+# (rules fingerprint, engine) for the most recently used rule pack
+_engine_state = (None, None)
+
+
+def get_scoring_engine(rules=None):
+    """
+    Get the engine compiled from the active rule pack, recompiling after a pack swap
+    """
+    global _engine_state
+    rules = rules or get_active_rules()
+    fingerprint, engine = _engine_state
+    if fingerprint != rules.fingerprint:
+        engine = ScoringEngine(rules.questions, rules.max_possible_scores)
+        _engine_state = (rules.fingerprint, engine)
+    return engine
@@ -0,0 +1,122 @@
+"""
+What-if Sensitivity
+Shows which single answer change would move a submission's scores most, e.g.
+"adding a CRM adds +7 to Marketing & Sales"
+
+Every alternative option of each scored single-choice question and every checkbox
+toggle becomes one variant of the submission. The variants are encoded directly
+from the submission's own encoding (one column swapped, added or removed) and
+scored together in one matrix product through the compiled scoring engine.
+
+    POST /api/what-if   (a submission; name and email are not needed)
+"""
+
+from api.report_generator import generate_overall_score
+from api.scoring_analysis import get_active_rules
+
+ACTION_SELECT = 'select'
+ACTION_ADD = 'add'
+ACTION_REMOVE = 'remove'
+
+
+def plan_variants(engine, form_data):
+    """
+    List every single answer change as (question, action, option, previous,
+    removed column, added column); a column is None when nothing changes there
+    """
+    variants = []
+    for question, index in engine.single_questions:
+        value = form_data.get(question)
+        current = index.get(value) if value else None
+        for option, column in index.items():
+            if column != current:
+                variants.append((question, ACTION_SELECT, option, value or None, current, column))
+
+    for question, index in engine.checkbox_questions:
+        value = form_data.get(question)
+        selected = set(value) if value and isinstance(value, list) else set()
+        for option, column in index.items():
+            if option in selected:
+                variants.append((question, ACTION_REMOVE, option, None, column, None))
+            else:
+                variants.append((question, ACTION_ADD, option, None, None, column))
+    return variants
+
+
+def score_variants(engine, form_data, variants):
+    """
+    Score the submission and all of its variants in one batch. Row 0 of the
+    returned (1 + variants) x areas matrix is the submission itself.
+    """
+    import numpy as np
+
+    base = engine.encode_batch([form_data])
+    encoded = np.repeat(base, len(variants) + 1, axis=0)
+    for row, (_, _, _, _, removed, added) in enumerate(variants, start=1):
+        if removed is not None:
+            # Drops every copy, as a checkbox listing an option twice counts it twice
+            encoded[row, removed] = 0
+        if added is not None:
+            encoded[row, added] += 1
+    return engine.score_matrix(encoded)
+
+
+def analyze_what_if(form_data, rules=None):
+    """
+    The submission's scores and levels, plus the score and level deltas of every
+    single answer change, ranked by overall score gained
+    """
+    # The engine pulls in numpy, which single submissions never need
+    from api.scoring_engine import get_scoring_engine
+
+    rules = rules or get_active_rules()
+    engine = get_scoring_engine(rules)
+    variants = plan_variants(engine, form_data)
+    scored = engine.to_dicts(score_variants(engine, form_data, variants))
+
+    base_scores = scored[0]
+    base_overall = generate_overall_score(base_scores, rules)
+    base_levels = {area: rules.level_for(area, score)[0] for area, score in base_scores.items()}
+
+    changes = []
+    for (question, action, option, previous, _, _), scores in zip(variants, scored[1:]):
+        areas = {}
+        for area, score in scores.items():
+            level = rules.level_for(area, score)[0]
+            areas[area] = {
+                'score': score,
+                'delta': score - base_scores[area],
+                'level': level,
+                'level_changed': level != base_levels[area]
+            }
+        overall_score = generate_overall_score(scores, rules)
+        change = {
+            'question': question,
+            'action': action,
+            'option': option,
+            'overall_score': overall_score,
+            'overall_delta': overall_score - base_overall,
+            'areas': areas
+        }
+        if action == ACTION_SELECT:
+            change['from'] = previous
+        changes.append(change)
+
+    # Biggest overall gain first; sorted() is stable, so ties keep question order
+    changes = sorted(changes, key=lambda change: (
+        -change['overall_delta'], -sum(area['delta'] for area in change['areas'].values())
+    ))
+
+    best_by_area = {}
+    for area in base_scores:
+        best = max(changes, key=lambda change: change['areas'][area]['delta'], default=None)
+        best_by_area[area] = best if best is not None and best['areas'][area]['delta'] > 0 else None
+
+    return {
+        'rule_version': rules.rule_version,
+        'overall_score': base_overall,
+        'service_area_scores': base_scores,
+        'levels': base_levels,
+        'changes': changes,
+        'best_by_area': best_by_area
+    }
@@ -0,0 +1,264 @@
+"""
+Shadow Scoring
+Scores live submissions with all three scoring models in one table-driven pass and
+keeps a bounded summary of where they disagree
+
+Models compared:
+    service_area - overall score of the service-area model (active rule pack)
+    legacy       - calculate_ai_readiness_score_legacy (api/legacy_scoring.py)
+    site         - calculate_ai_score, the site form model (api/legacy_scoring.py)
+
+Enable with SHADOW_SCORING=true. The pass is timed; when its moving average
+exceeds SHADOW_LATENCY_BUDGET_US, only a matching fraction of submissions is
+shadow scored, so the mean added latency stays within the budget.
+"""
+
+import os
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from itertools import combinations
+
+from api.scoring_analysis import get_active_rules
+from api.legacy_scoring import (
+    SITE_SCORING_MAP, SITE_DEFAULT_SCORE, LEGACY_READINESS_CHOICES, LEGACY_READINESS_COUNTS,
+    LEGACY_READINESS_MAX_SCORE
+)
+
+SHADOW_SCORING = os.environ.get('SHADOW_SCORING', 'false').lower() == 'true'
+SHADOW_LATENCY_BUDGET_US = float(os.environ.get('SHADOW_LATENCY_BUDGET_US', '200'))
+SHADOW_DISAGREEMENT_THRESHOLD = int(os.environ.get('SHADOW_DISAGREEMENT_THRESHOLD', '15'))
+SHADOW_MAX_SAMPLES = int(os.environ.get('SHADOW_MAX_SAMPLES', '50'))
+
+MODELS = ['service_area', 'legacy', 'site']
+
+# Absolute score differences are bucketed by tens: 0-9, 10-19, ..., 90-99, 100
+DIFF_BUCKETS = 11
+
+
+class ShadowScorer:
+    """
+    All three models compiled into one table: for every answer field, each option
+    (or checkbox item) maps to a row of points for every model column.
+
+    Columns: raw points per service area, legacy points, site points and the
+    site model's best possible points for the answered question.
+    """
+
+    def __init__(self, rules):
+        self.rules = rules
+        self.areas = list(rules.max_possible_scores)
+        self.legacy_column = len(self.areas)
+        self.site_column = self.legacy_column + 1
+        self.site_possible_column = self.legacy_column + 2
+        self.width = len(self.areas) + 3
+
+        self.choices = {}   # field -> {option: row}, for single-choice answers
+        self.items = {}     # field -> {item: row}, for each item of a list answer
+        self.counts = {}    # field -> (points per item, cap) on the legacy column
+
+        for question, is_checkbox, scoring in rules.scored_questions:
+            table = self.items if is_checkbox else self.choices
+            for option, points in scoring.items():
+                row = self._row(table, question, option)
+                for area, value in points.items():
+                    row[self.areas.index(area)] += value
+
+        for field, options in LEGACY_READINESS_CHOICES.items():
+            for option, value in options.items():
+                self._row(self.choices, field, option)[self.legacy_column] += value
+        self.counts.update(LEGACY_READINESS_COUNTS)
+
+        for field, options in SITE_SCORING_MAP.items():
+            best = max(options.values())
+            for option, value in options.items():
+                row = self._row(self.choices, field, option)
+                row[self.site_column] += value
+                row[self.site_possible_column] += best
+
+        self.fields = sorted(set(self.choices) | set(self.items) | set(self.counts))
+        self.choices = {field: {o: tuple(r) for o, r in rows.items()} for field, rows in self.choices.items()}
+        self.items = {field: {o: tuple(r) for o, r in rows.items()} for field, rows in self.items.items()}
+
+    def _row(self, table, field, option):
+        return table.setdefault(field, {}).setdefault(option, [0] * self.width)
+
+    def score(self, form_data):
+        """
+        Score one submission with every model: {model: score}
+        """
+        totals = [0] * self.width
+        legacy_counts = 0
+        for field in self.fields:
+            value = form_data.get(field)
+            if isinstance(value, str):
+                row = self.choices.get(field, {}).get(value)
+                if row is not None:
+                    totals = [t + p for t, p in zip(totals, row)]
+            elif isinstance(value, list):
+                items = self.items.get(field)
+                if items:
+                    for item in value:
+                        row = items.get(item) if isinstance(item, str) else None
+                        if row is not None:
+                            totals = [t + p for t, p in zip(totals, row)]
+                if field in self.counts:
+                    points_per_item, cap = self.counts[field]
+                    legacy_counts += min(len(value) * points_per_item, cap)
+
+        area_scores = [
+            min(100, int((totals[a] / self.rules.max_possible_scores[area]) * 100))
+            for a, area in enumerate(self.areas)
+        ]
+        # Same float operations, in the same order, as generate_overall_score
+        overall = sum(score * self.rules.overall_weights[area] for area, score in zip(self.areas, area_scores))
+
+        site_possible = totals[self.site_possible_column]
+        site = (totals[self.site_column] / site_possible) * 100 if site_possible > 0 else SITE_DEFAULT_SCORE
+        return {
+            'service_area': int(overall),
+            'legacy': min(totals[self.legacy_column] + legacy_counts, LEGACY_READINESS_MAX_SCORE),
+            'site': round(min(100, max(0, site)))
+        }
+
+    def answers(self, form_data):
+        """
+        The scored answers of a submission, without contact details
+        """
+        return {field: form_data[field] for field in self.fields if field in form_data}
+
+
+class ShadowSummary:
+    """
+    Bounded, process-wide record of model disagreements and shadow pass cost
+    """
+
+    def __init__(self, budget_us=SHADOW_LATENCY_BUDGET_US, threshold=SHADOW_DISAGREEMENT_THRESHOLD,
+                 max_samples=SHADOW_MAX_SAMPLES):
+        self.budget_us = budget_us
+        self.threshold = threshold
+        self.pairs = list(combinations(MODELS, 2))
+        self._lock = threading.Lock()
+        self._samples = deque(maxlen=max_samples)
+        self._compared = 0
+        self._skipped = 0
+        self._pair_stats = {
+            pair: {'disagreements': 0, 'total_diff': 0, 'max_diff': 0, 'histogram': [0] * DIFF_BUCKETS}
+            for pair in self.pairs
+        }
+        self._latency_total_us = 0.0
+        self._latency_max_us = 0.0
+        self._over_budget = 0
+        self._latency_average_us = 0.0
+
+    def sample_rate(self):
+        # Throttle to keep the mean added latency within the budget
+        if self._latency_average_us <= self.budget_us:
+            return 1.0
+        return self.budget_us / self._latency_average_us
+
+    def should_run(self):
+        rate = self.sample_rate()
+        if rate >= 1.0 or random.random() < rate:
+            return True
+        with self._lock:
+            self._skipped += 1
+        return False
+
+    def record(self, scores, answers, elapsed_us):
+        with self._lock:
+            self._compared += 1
+            self._latency_total_us += elapsed_us
+            self._latency_max_us = max(self._latency_max_us, elapsed_us)
+            self._latency_average_us += (elapsed_us - self._latency_average_us) * 0.05
+            if elapsed_us > self.budget_us:
+                self._over_budget += 1
+
+            disagreeing = False
+            for pair in self.pairs:
+                diff = abs(scores[pair[0]] - scores[pair[1]])
+                stats = self._pair_stats[pair]
+                stats['total_diff'] += diff
+                stats['max_diff'] = max(stats['max_diff'], diff)
+                stats['histogram'][min(diff // 10, DIFF_BUCKETS - 1)] += 1
+                if diff >= self.threshold:
+                    stats['disagreements'] += 1
+                    disagreeing = True
+
+            if disagreeing:
+                self._samples.append({
+                    'recorded_at': datetime.now().isoformat(),
+                    'scores': scores,
+                    'answers': answers
+                })
+
+    def snapshot(self):
+        with self._lock:
+            compared = self._compared
+            return {
+                'enabled': SHADOW_SCORING,
+                'compared': compared,
+                'skipped': self._skipped,
+                'disagreement_threshold': self.threshold,
+                'pairs': {
+                    f'{a}_vs_{b}': {
+                        'disagreements': stats['disagreements'],
+                        'mean_abs_diff': round(stats['total_diff'] / compared, 2) if compared else None,
+                        'max_abs_diff': stats['max_diff'],
+                        'abs_diff_histogram': {
+                            str(i * 10) if i == DIFF_BUCKETS - 1 else f'{i * 10}-{i * 10 + 9}': count
+                            for i, count in enumerate(stats['histogram'])
+                        }
+                    }
+                    for (a, b), stats in self._pair_stats.items()
+                },
+                'latency_us': {
+                    'budget': self.budget_us,
+                    'mean': round(self._latency_total_us / compared, 1) if compared else None,
+                    'moving_average': round(self._latency_average_us, 1),
+                    'max': round(self._latency_max_us, 1),
+                    'over_budget': self._over_budget,
+                    'sample_rate': round(self.sample_rate(), 3)
+                },
+                'recent_disagreements': list(self._samples)
+            }
+
+
+# (rules fingerprint, scorer) for the most recently used rule pack
+_scorer_state = (None, None)
+shadow_summary = ShadowSummary()
+
+
+def get_shadow_scorer(rules=None):
+    global _scorer_state
+    rules = rules or get_active_rules()
+    fingerprint, scorer = _scorer_state
+    if fingerprint != rules.fingerprint:
+        scorer = ShadowScorer(rules)
+        _scorer_state = (rules.fingerprint, scorer)
+    return scorer
+
+
+def shadow_score(form_data, rules=None):
+    """
+    Score a submission with every model and record how they compare. Does nothing
+    unless SHADOW_SCORING is on, and never raises into the request.
+    """
+    if not SHADOW_SCORING or not isinstance(form_data, dict) or not shadow_summary.should_run():
+        return None
+    try:
+        started = time.perf_counter()
+        scorer = get_shadow_scorer(rules)
+        scores = scorer.score(form_data)
+        elapsed_us = (time.perf_counter() - started) * 1e6
+        shadow_summary.record(scores, scorer.answers(form_data), elapsed_us)
+        return scores
+    except Exception as e:
+        print(f"Shadow scoring failed: {str(e)}")
+        return None
+
+
+def get_shadow_summary():
+    return shadow_summary.snapshot()
@@ -0,0 +1,149 @@
+"""
+Local SMTP Sink
+A minimal stand-in SMTP server that accepts and records every message, for
+exercising the notification outbox and load tests without a real mail server
+
+Run with:
+    python -m api.smtp_sink [--host 127.0.0.1] [--port 1025]
+Then point the apps at it with SMTP_SERVER=127.0.0.1 SMTP_PORT=1025 SMTP_STARTTLS=false
+"""
+
+import argparse
+import socketserver
+import threading
+import time
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    """
+    Speaks just enough SMTP for smtplib: EHLO/HELO, AUTH, MAIL, RCPT, DATA, RSET, NOOP, QUIT
+    """
+
+    def _reply(self, line):
+        self.wfile.write((line + '\r\n').encode('utf-8'))
+
+    def handle(self):
+        sink = self.server.sink
+        sink._record_connection()
+        self._reply('220 localhost SMTP sink ready')
+        sender, recipients = None, []
+
+        while True:
+            raw = self.rfile.readline()
+            if not raw:
+                return
+            line = raw.decode('utf-8', 'replace').rstrip('\r\n')
+            command = line[:4].upper()
+
+            if command in ('EHLO', 'HELO'):
+                if command == 'EHLO':
+                    self._reply('250-localhost')
+                    self._reply('250 AUTH PLAIN LOGIN')
+                else:
+                    self._reply('250 localhost')
+            elif command == 'AUTH':
+                self._reply('235 Authentication successful')
+            elif command == 'MAIL':
+                sender, recipients = line.split(':', 1)[1].strip(), []
+                self._reply('250 OK')
+            elif command == 'RCPT':
+                recipients.append(line.split(':', 1)[1].strip())
+                self._reply('250 OK')
+            elif command == 'DATA':
+                self._reply('354 End data with <CR><LF>.<CR><LF>')
+                lines = []
+                while True:
+                    data_line = self.rfile.readline()
+                    if not data_line or data_line in (b'.\r\n', b'.\n'):
+                        break
+                    if data_line.startswith(b'..'):
+                        data_line = data_line[1:]
+                    lines.append(data_line)
+                if sink.delay:
+                    time.sleep(sink.delay)  # a slow mail server
+                sink._record_message(sender, recipients, b''.join(lines).decode('utf-8', 'replace'))
+                self._reply('250 OK: queued')
+            elif command == 'RSET':
+                sender, recipients = None, []
+                self._reply('250 OK')
+            elif command == 'NOOP':
+                self._reply('250 OK')
+            elif command == 'QUIT':
+                self._reply('221 Bye')
+                return
+            else:
+                self._reply('502 Command not implemented')
+
+
+class _ThreadingSMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class SMTPSink:
+    """
+    Threaded SMTP sink. Messages are kept in memory as (sender, recipients, text).
+    Use port 0 to bind an ephemeral port. delay is how many seconds each message
+    takes to be accepted.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, keep_messages=True, delay=0.0):
+        self.keep_messages = keep_messages
+        self.delay = delay
+        self.messages = []
+        self.message_count = 0
+        self.connection_count = 0
+        self._lock = threading.Lock()
+        self._server = _ThreadingSMTPServer((host, port), _SMTPHandler)
+        self._server.sink = self
+        self._thread = None
+
+    @property
+    def address(self):
+        return self._server.server_address
+
+    def _record_connection(self):
+        with self._lock:
+            self.connection_count += 1
+
+    def _record_message(self, sender, recipients, text):
+        with self._lock:
+            self.message_count += 1
+            if self.keep_messages:
+                self.messages.append((sender, recipients, text))
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='smtp-sink', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local SMTP sink')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=1025)
+    parser.add_argument('--delay', type=float, default=0.0, help='Seconds to take accepting each message')
+    args = parser.parse_args()
+
+    sink = SMTPSink(args.host, args.port, keep_messages=False, delay=args.delay)
+    print(f"SMTP sink listening on {args.host}:{sink.address[1]}")
+    try:
+        sink._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"Received {sink.message_count} message(s) over {sink.connection_count} connection(s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+Static Page Cache
+Keeps the site's HTML pages in memory with precompressed variants and answers
+conditional requests without touching disk
+"""
+
+import gzip
+import hashlib
+import os
+import threading
+import time
+from email.utils import formatdate
+
+from flask import Response
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+STATIC_MAX_AGE = int(os.environ.get('STATIC_MAX_AGE', '300'))
+STATIC_CHECK_INTERVAL = float(os.environ.get('STATIC_CHECK_INTERVAL', '2'))
+
+# Server preference when the client accepts several encodings equally; werkzeug
+# breaks quality ties by candidate order
+ENCODING_PREFERENCE = ('br', 'gzip', 'identity')
+
+
+class CachedPage:
+    """
+    One page's bytes in every supported encoding, plus its validators
+    """
+
+    def __init__(self, path):
+        stat = os.stat(path)
+        with open(path, 'rb') as f:
+            body = f.read()
+
+        self.mtime_ns = stat.st_mtime_ns
+        self.last_modified = formatdate(stat.st_mtime, usegmt=True)
+        digest = hashlib.sha256(body).hexdigest()[:24]
+
+        self.variants = {'identity': body}
+        self.variants['gzip'] = gzip.compress(body, compresslevel=9, mtime=0)
+        if brotli is not None:
+            self.variants['br'] = brotli.compress(body, quality=11)
+
+        # Each encoding is a different representation, so it gets its own strong ETag
+        self.etags = {
+            encoding: f'"{digest}"' if encoding == 'identity' else f'"{digest}-{encoding}"'
+            for encoding in self.variants
+        }
+
+
+class StaticPageCache:
+    """
+    In-memory cache for a fixed set of pages. Files are re-stat'ed at most once
+    per check interval and reloaded when their modification time changes.
+    """
+
+    def __init__(self, directory, filenames, check_interval=STATIC_CHECK_INTERVAL, max_age=STATIC_MAX_AGE):
+        self.directory = directory
+        self.check_interval = check_interval
+        self.max_age = max_age
+        self._pages = {}
+        self._checked_at = {}
+        self._lock = threading.Lock()
+        for filename in filenames:
+            self._load(filename)
+
+    def _load(self, filename):
+        page = CachedPage(os.path.join(self.directory, filename))
+        self._pages[filename] = page
+        self._checked_at[filename] = time.monotonic()
+        return page
+
+    def get(self, filename):
+        page = self._pages[filename]
+        now = time.monotonic()
+        if now - self._checked_at[filename] < self.check_interval:
+            return page
+
+        with self._lock:
+            page = self._pages[filename]
+            if now - self._checked_at[filename] < self.check_interval:
+                return page
+            self._checked_at[filename] = now
+            try:
+                if os.stat(os.path.join(self.directory, filename)).st_mtime_ns != page.mtime_ns:
+                    page = self._load(filename)
+            except OSError as e:
+                # Keep serving the last good copy if the file is briefly missing
+                print(f"Static page reload failed for {filename}: {str(e)}")
+            return page
+
+    def serve(self, filename, request):
+        """
+        Build the response for a cached page, negotiating Content-Encoding and
+        answering If-None-Match/If-Modified-Since with 304
+        """
+        page = self.get(filename)
+        candidates = [encoding for encoding in ENCODING_PREFERENCE if encoding in page.variants]
+        encoding = request.accept_encodings.best_match(candidates, default='identity')
+        if encoding not in page.variants:
+            encoding = 'identity'
+
+        response = Response(page.variants[encoding], mimetype='text/html')
+        if encoding != 'identity':
+            response.headers['Content-Encoding'] = encoding
+        response.headers['Vary'] = 'Accept-Encoding'
+        response.headers['ETag'] = page.etags[encoding]
+        response.headers['Last-Modified'] = page.last_modified
+        response.headers['Cache-Control'] = f'public, max-age={self.max_age}'
+        return response.make_conditional(request)
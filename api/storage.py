@@ -0,0 +1,427 @@
+"""
+Submission Storage
+Persists scored assessment submissions in SQLite (WAL mode) so reports can be
+served from the stored scores instead of being rebuilt, together with the
+analytics aggregates that are updated as each submission is stored, the
+recent idempotency keys shared by all workers and the lead notifications held
+for the next digest email
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+DATA_DIR = os.environ.get(
+    'DATA_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+)
+SUBMISSIONS_DB_PATH = os.environ.get('SUBMISSIONS_DB', os.path.join(DATA_DIR, 'submissions.db'))
+
+SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS submissions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        email_identifier TEXT NOT NULL,
+        submitted_at TEXT NOT NULL,
+        overall_score INTEGER NOT NULL,
+        rule_version TEXT,
+        payload TEXT NOT NULL,
+        report_token TEXT
+    )''',
+    # One row per (dimension, key, bucket): a count and a running total, e.g.
+    # ('industry', 'retail', '7') counts retail leads with an overall score of 70-79
+    '''CREATE TABLE IF NOT EXISTS analytics_aggregates (
+        dimension TEXT NOT NULL,
+        key TEXT NOT NULL,
+        bucket TEXT NOT NULL,
+        count INTEGER NOT NULL,
+        total INTEGER NOT NULL,
+        PRIMARY KEY (dimension, key, bucket)
+    ) WITHOUT ROWID''',
+    # Recent submit requests by idempotency key; status is NULL while in flight
+    '''CREATE TABLE IF NOT EXISTS idempotency_keys (
+        key TEXT PRIMARY KEY,
+        payload_hash TEXT NOT NULL,
+        created_at REAL NOT NULL,
+        status INTEGER,
+        body TEXT
+    ) WITHOUT ROWID''',
+    '''CREATE INDEX IF NOT EXISTS idx_idempotency_keys_created_at
+        ON idempotency_keys (created_at)''',
+    # Lead notifications held for the next digest, per sender and recipient list
+    '''CREATE TABLE IF NOT EXISTS digest_entries (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        sender TEXT NOT NULL,
+        recipients TEXT NOT NULL,
+        subject TEXT NOT NULL,
+        body TEXT NOT NULL,
+        score INTEGER NOT NULL,
+        queued_at REAL NOT NULL
+    )''',
+    '''CREATE INDEX IF NOT EXISTS idx_digest_entries_key
+        ON digest_entries (sender, recipients, queued_at)'''
+]
+
+# Columns added after the first release, added to older databases on connect
+ADDED_COLUMNS = [
+    ('submissions', 'report_token', 'TEXT')
+]
+
+# Index changes that need the added columns, applied once they exist
+SCHEMA_AFTER_MIGRATION = [
+    '''CREATE UNIQUE INDEX IF NOT EXISTS idx_submissions_report_token
+        ON submissions (report_token)''',
+    # Reports used to be looked up by email identifier
+    'DROP INDEX IF EXISTS idx_submissions_email_identifier'
+]
+
+# Statements are kept as constants so sqlite3's per-connection statement cache
+# reuses the prepared statements
+INSERT_SUBMISSION = '''
+    INSERT INTO submissions (email_identifier, submitted_at, overall_score, rule_version, payload, report_token)
+    VALUES (?, ?, ?, ?, ?, ?)
+'''
+SELECT_REF_BY_REPORT_TOKEN = '''
+    SELECT id, rule_version FROM submissions WHERE report_token = ?
+'''
+SELECT_BY_ID = '''
+    SELECT id, rule_version, payload FROM submissions WHERE id = ?
+'''
+UPSERT_AGGREGATE = '''
+    INSERT INTO analytics_aggregates (dimension, key, bucket, count, total)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (dimension, key, bucket)
+    DO UPDATE SET count = count + excluded.count, total = total + excluded.total
+'''
+SELECT_AGGREGATES_FROM_KEY = '''
+    SELECT dimension, key, bucket, count, total FROM analytics_aggregates
+    WHERE dimension = ? AND key >= ?
+'''
+SELECT_PAYLOADS_AFTER_ID = '''
+    SELECT id, payload FROM submissions WHERE id > ? ORDER BY id LIMIT ?
+'''
+CLAIM_IDEMPOTENCY_KEY = '''
+    INSERT INTO idempotency_keys (key, payload_hash, created_at, status, body)
+    VALUES (?, ?, ?, NULL, NULL)
+    ON CONFLICT (key) DO UPDATE SET
+        payload_hash = excluded.payload_hash, created_at = excluded.created_at, status = NULL, body = NULL
+    WHERE idempotency_keys.created_at < ?
+        OR (idempotency_keys.status IS NULL AND idempotency_keys.created_at < ?)
+'''
+SELECT_IDEMPOTENCY_KEY = '''
+    SELECT payload_hash, created_at, status, body FROM idempotency_keys WHERE key = ?
+'''
+COMPLETE_IDEMPOTENCY_KEY = '''
+    UPDATE idempotency_keys SET status = ?, body = ? WHERE key = ? AND created_at = ?
+'''
+RELEASE_IDEMPOTENCY_KEY = '''
+    DELETE FROM idempotency_keys WHERE key = ? AND created_at = ? AND status IS NULL
+'''
+PRUNE_EXPIRED_IDEMPOTENCY_KEYS = '''
+    DELETE FROM idempotency_keys WHERE created_at < ?
+'''
+PRUNE_OLDEST_IDEMPOTENCY_KEYS = '''
+    DELETE FROM idempotency_keys WHERE key IN (
+        SELECT key FROM idempotency_keys ORDER BY created_at DESC LIMIT -1 OFFSET ?
+    )
+'''
+INSERT_DIGEST_ENTRY = '''
+    INSERT INTO digest_entries (sender, recipients, subject, body, score, queued_at)
+    VALUES (?, ?, ?, ?, ?, ?)
+'''
+COUNT_DIGEST_ENTRIES = '''
+    SELECT COUNT(*) FROM digest_entries WHERE sender = ? AND recipients = ?
+'''
+TAKE_DIGEST_ENTRIES = '''
+    DELETE FROM digest_entries WHERE sender = ? AND recipients = ?
+    RETURNING subject, body, score, queued_at
+'''
+SELECT_DUE_DIGEST_KEYS = '''
+    SELECT sender, recipients FROM digest_entries
+    GROUP BY sender, recipients HAVING MIN(queued_at) <= ?
+'''
+
+
+def email_to_identifier(email):
+    """
+    Encode an email address into the identifier stored submissions are indexed by
+    """
+    return email.replace("@", "_at_").replace(".", "_dot_")
+
+
+class SubmissionStore:
+    """
+    Thread- and process-safe access to the submissions database.
+
+    Each thread gets its own connection (reopened after a fork). WAL mode lets
+    readers proceed while another worker writes, and every write is one insert
+    plus a handful of aggregate upserts in a short transaction, so gunicorn
+    workers only ever wait on each other for the duration of one submission.
+    """
+
+    def __init__(self, path=SUBMISSIONS_DB_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._schema_ready = False
+        self._schema_lock = threading.Lock()
+
+    def connection(self):
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            local.connection = self._connect()
+            local.pid = os.getpid()
+        return local.connection
+
+    def _connect(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=10.0, isolation_level=None,
+                                     check_same_thread=False, cached_statements=64)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        connection.execute('PRAGMA busy_timeout=10000')
+
+        if not self._schema_ready:
+            with self._schema_lock:
+                for statement in SCHEMA:
+                    connection.execute(statement)
+                self._add_missing_columns(connection)
+                for statement in SCHEMA_AFTER_MIGRATION:
+                    connection.execute(statement)
+                self._schema_ready = True
+        return connection
+
+    def _add_missing_columns(self, connection):
+        for table, column, column_type in ADDED_COLUMNS:
+            existing = {row[1] for row in connection.execute(f'PRAGMA table_info({table})')}
+            if column in existing:
+                continue
+            try:
+                connection.execute(f'ALTER TABLE {table} ADD COLUMN {column} {column_type}')
+            except sqlite3.OperationalError as e:
+                # Another worker added it first
+                if 'duplicate column' not in str(e):
+                    raise
+
+    @contextmanager
+    def _transaction(self, connection):
+        # BEGIN IMMEDIATE takes the write lock up front, so the transaction cannot
+        # fail half way on a lock upgrade
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def save_submission(self, email_identifier, submission, rule_version=None, aggregates=(), report_token=None):
+        """
+        Store an enriched submission and return its id. report_token is the
+        unguessable identifier its report is served under. aggregates are
+        (dimension, key, bucket, count, total) increments applied in the same
+        transaction, so the analytics never count a submission that was not stored.
+        """
+        row = (
+            email_identifier,
+            submission['submitted_at'],
+            submission['overall_score'],
+            rule_version,
+            json.dumps(submission),
+            report_token
+        )
+        connection = self.connection()
+        if not aggregates:
+            return connection.execute(INSERT_SUBMISSION, row).lastrowid
+        with self._transaction(connection):
+            submission_id = connection.execute(INSERT_SUBMISSION, row).lastrowid
+            connection.executemany(UPSERT_AGGREGATE, aggregates)
+        return submission_id
+
+    def get_aggregates(self, dimension, min_key=''):
+        """
+        A dimension's aggregate rows as (dimension, key, bucket, count, total),
+        limited to keys that sort at or after min_key; one primary key range scan
+        """
+        return self.connection().execute(SELECT_AGGREGATES_FROM_KEY, (dimension, min_key)).fetchall()
+
+    def rebuild_aggregates(self, aggregate_rows, batch_size=1000):
+        """
+        Recompute every aggregate from the stored submissions, where
+        aggregate_rows(submission) gives one submission's increments. Submissions
+        are only ever inserted, so they are counted in keyset batches of short
+        reads without blocking submits; the write lock is then held only to count
+        those stored during the scan and swap in the new aggregates. Readers see
+        the old aggregates until the swap commits. Returns the number of
+        submissions counted.
+        """
+        connection = self.connection()
+        totals = {}
+
+        def count_after(last_id):
+            counted = 0
+            while True:
+                rows = connection.execute(SELECT_PAYLOADS_AFTER_ID, (last_id, batch_size)).fetchall()
+                if not rows:
+                    return last_id, counted
+                for last_id, payload in rows:
+                    for dimension, key, bucket, count, total in aggregate_rows(json.loads(payload)):
+                        entry = totals.setdefault((dimension, key, bucket), [0, 0])
+                        entry[0] += count
+                        entry[1] += total
+                    counted += 1
+
+        last_id, counted = count_after(0)
+        with self._transaction(connection):
+            _, caught_up = count_after(last_id)
+            connection.execute('DELETE FROM analytics_aggregates')
+            connection.executemany(UPSERT_AGGREGATE, (
+                (dimension, key, bucket, count, total)
+                for (dimension, key, bucket), (count, total) in totals.items()
+            ))
+        return counted + caught_up
+
+    def iter_submissions(self, after_id=0, since=None, until=None, min_score=None, industry=None,
+                         limit=None, batch_size=500):
+        """
+        Yield stored submissions in id order, starting after after_id, filtered by
+        submitted_at (since inclusive, until exclusive; ISO strings), overall score
+        and industry. Pages by id rather than OFFSET, and each page is a separate
+        short query, so memory and lock time stay flat however many rows match.
+        """
+        conditions, params = ['id > ?'], []
+        if since is not None:
+            conditions.append('submitted_at >= ?')
+            params.append(since)
+        if until is not None:
+            conditions.append('submitted_at < ?')
+            params.append(until)
+        if min_score is not None:
+            conditions.append('overall_score >= ?')
+            params.append(min_score)
+        if industry is not None:
+            conditions.append("json_extract(payload, '$.industry') = ?")
+            params.append(industry)
+        query = f'''
+            SELECT id, rule_version, payload FROM submissions
+            WHERE {' AND '.join(conditions)}
+            ORDER BY id LIMIT ?
+        '''
+
+        last_id = after_id
+        remaining = limit
+        while remaining is None or remaining > 0:
+            page_size = batch_size if remaining is None else min(batch_size, remaining)
+            rows = self.connection().execute(query, [last_id, *params, page_size]).fetchall()
+            for row in rows:
+                yield self._decode(row)
+            if len(rows) < page_size:
+                return
+            last_id = rows[-1][0]
+            if remaining is not None:
+                remaining -= len(rows)
+
+    def claim_idempotency_key(self, key, payload_hash, now, expired_before, abandoned_before):
+        """
+        Record a submit request as in flight under key. Succeeds (returns True) if
+        the key is new, its entry expired before expired_before, or it was left
+        in flight since before abandoned_before (e.g. by a killed worker).
+        """
+        cursor = self.connection().execute(
+            CLAIM_IDEMPOTENCY_KEY, (key, payload_hash, now, expired_before, abandoned_before)
+        )
+        return cursor.rowcount == 1
+
+    def get_idempotency_key(self, key):
+        """
+        (payload_hash, created_at, status, body) recorded under key, or None
+        """
+        return self.connection().execute(SELECT_IDEMPOTENCY_KEY, (key,)).fetchone()
+
+    def complete_idempotency_key(self, key, created_at, status, body):
+        """
+        Store the response for a claim made at created_at
+        """
+        self.connection().execute(COMPLETE_IDEMPOTENCY_KEY, (status, body, key, created_at))
+
+    def release_idempotency_key(self, key, created_at):
+        """
+        Drop an unfinished claim made at created_at so the request can be retried
+        """
+        self.connection().execute(RELEASE_IDEMPOTENCY_KEY, (key, created_at))
+
+    def prune_idempotency_keys(self, expired_before, max_entries):
+        """
+        Drop expired entries, then the oldest beyond max_entries
+        """
+        connection = self.connection()
+        connection.execute(PRUNE_EXPIRED_IDEMPOTENCY_KEYS, (expired_before,))
+        connection.execute(PRUNE_OLDEST_IDEMPOTENCY_KEYS, (max_entries,))
+
+    def add_digest_entries(self, sender, recipients, entries):
+        """
+        Hold lead notifications ({subject, body, score, queued_at}) for a digest to
+        recipients; returns how many are now held for it
+        """
+        key = (sender, json.dumps(list(recipients)))
+        connection = self.connection()
+        with self._transaction(connection):
+            connection.executemany(INSERT_DIGEST_ENTRY, [
+                key + (entry['subject'], entry['body'], entry['score'], entry['queued_at']) for entry in entries
+            ])
+            return connection.execute(COUNT_DIGEST_ENTRIES, key).fetchone()[0]
+
+    def take_digest_entries(self, sender, recipients):
+        """
+        Remove and return the entries held for a digest. Each entry is returned to
+        exactly one caller, however many workers race for it.
+        """
+        rows = self.connection().execute(TAKE_DIGEST_ENTRIES, (sender, json.dumps(list(recipients)))).fetchall()
+        return [{'subject': subject, 'body': body, 'score': score, 'queued_at': queued_at}
+                for subject, body, score, queued_at in rows]
+
+    def due_digest_keys(self, queued_before):
+        """
+        (sender, recipients) of every digest whose oldest entry was queued at or before queued_before
+        """
+        rows = self.connection().execute(SELECT_DUE_DIGEST_KEYS, (queued_before,)).fetchall()
+        return [(sender, json.loads(recipients)) for sender, recipients in rows]
+
+    def get_submission_ref_by_report_token(self, report_token):
+        """
+        (id, rule_version) of the submission a report token was issued for, or None
+        """
+        return self.connection().execute(SELECT_REF_BY_REPORT_TOKEN, (report_token,)).fetchone()
+
+    def get_submission(self, submission_id):
+        """
+        Fetch one submission by id, or None
+        """
+        row = self.connection().execute(SELECT_BY_ID, (submission_id,)).fetchone()
+        return self._decode(row)
+
+    def _decode(self, row):
+        if row is None:
+            return None
+        submission = json.loads(row[2])
+        submission['id'] = row[0]
+        submission['rule_version'] = row[1]
+        return submission
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_submission_store():
+    """
+    Get the process-wide submission store
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = SubmissionStore()
+    return _store
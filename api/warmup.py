@@ -0,0 +1,57 @@
+"""
+Server Warm-Up
+Builds the score table if it is missing or stale, then exercises the scoring and
+report paths once so that everything built lazily on first use (rule pack, score
+table mapping, scoring engine, report template) exists before a server process
+takes traffic
+
+Called from gunicorn.conf.py: once in the master after the app is preloaded, so
+workers inherit the results copy-on-write, and again in each worker before it
+accepts requests. Warm-up never stores submissions or sends email.
+"""
+
+import time
+
+WARMUP_SUBMISSIONS = [
+    {
+        'name': 'Warm Up',
+        'email': 'warmup@example.com',
+        'company': 'Warm-Up Ltd',
+        'employees': '11-50',
+        'industry': 'technology',
+        'current_tools': ['crm', 'analytics', 'cloud'],
+        'budget': '5k-10k',
+        'timeline': '1-3-months',
+        'goals': ['efficiency', 'data-insights']
+    },
+    {
+        'name': 'Warm Up',
+        'email': 'warmup@example.com',
+        'company': 'Warm-Up Ltd',
+        'employees': '1-10',
+        'industry': 'retail',
+        'current_tools': ['none'],
+        'budget': 'under-1k',
+        'timeline': 'exploring',
+        'goals': ['customer-experience']
+    }
+]
+
+
+def warm_up():
+    """
+    Score, rank and render the sample submissions, singly and as a batch.
+    Returns the time taken in seconds.
+    """
+    from api.pipeline import get_assessment_pipeline
+    from api.score_table import ensure_score_table
+    from api.shadow_scoring import get_shadow_scorer
+
+    started = time.perf_counter()
+    ensure_score_table()
+    pipeline = get_assessment_pipeline()
+    for submission in WARMUP_SUBMISSIONS:
+        pipeline.run(submission, render=True)
+    pipeline.run_batch(WARMUP_SUBMISSIONS)
+    get_shadow_scorer()
+    return time.perf_counter() - started
@@ -2,19 +2,26 @@ from flask import Flask, render_template, request, jsonify, send_from_directory
 import os
 import json
 from datetime import datetime
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+from api.notifications import notify_lead
+from api.static_cache import StaticPageCache
+from api.profiling import install_profiler
+from api.legacy_scoring import calculate_ai_score
+from api.shadow_scoring import get_shadow_summary, shadow_score
 
 app = Flask(__name__, static_folder='.', template_folder='.')
+install_profiler(app)  # No-op unless PROFILE_REQUESTS=true and PROFILE_TOKEN is set
+
+# The two landing pages are most of our traffic; serve them from memory,
+# precompressed, with validators (see api/static_cache.py)
+static_pages = StaticPageCache(os.path.dirname(os.path.abspath(__file__)), ['index.html', 'assessment.html'])
 
 @app.route('/')
 def home():
-    return send_from_directory('.', 'index.html')
+    return static_pages.serve('index.html', request)
 
 @app.route('/assessment')
 def assessment():
-    return send_from_directory('.', 'assessment.html')
+    return static_pages.serve('assessment.html', request)
 
 @app.route('/submit-assessment', methods=['POST'])
 def submit_assessment():
@@ -24,6 +31,9 @@ def submit_assessment():
         # Calculate AI readiness score
         score = calculate_ai_score(data)
         
+        # Compare all scoring models on live traffic (SHADOW_SCORING=true)
+        shadow_score(data)
+        
         # Send notification email (if configured)
         send_notification_email(data, score)
         
@@ -37,35 +47,6 @@ def submit_assessment():
         print(f"Error processing assessment: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
-def calculate_ai_score(data):
-    """Calculate AI readiness score based on assessment responses"""
-    score = 0
-    total_possible = 0
-    
-    # Scoring weights for different factors
-    scoring_map = {
-        'current_tech': {'high': 25, 'medium': 15, 'low': 5, 'none': 0},
-        'team_size': {'large': 20, 'medium': 15, 'small': 10, 'solo': 5},
-        'budget': {'high': 25, 'medium': 15, 'low': 8, 'minimal': 3},
-        'urgency': {'immediate': 20, 'soon': 15, 'exploring': 10, 'no_rush': 5},
-        'data_usage': {'extensive': 15, 'moderate': 10, 'minimal': 5, 'none': 0},
-        'automation_interest': {'very_interested': 15, 'interested': 10, 'somewhat': 5, 'not_interested': 0}
-    }
-    
-    # Calculate score based on responses
-    for key, value in data.items():
-        if key in scoring_map and value in scoring_map[key]:
-            score += scoring_map[key][value]
-            total_possible += max(scoring_map[key].values())
-    
-    # Normalize to 0-100 scale
-    if total_possible > 0:
-        normalized_score = (score / total_possible) * 100
-    else:
-        normalized_score = 50  # Default score if no valid responses
-    
-    return round(min(100, max(0, normalized_score)))
-
 def get_recommendation(score):
     """Get recommendation based on AI readiness score"""
     if score >= 80:
@@ -83,8 +64,7 @@ def send_notification_email(data, score):
     """Send email notification about new assessment submission"""
     try:
         # Email configuration from environment variables
-        smtp_server = os.environ.get('SMTP_SERVER', 'smtp.gmail.com')
-        smtp_port = int(os.environ.get('SMTP_PORT', '587'))
+        # (SMTP_SERVER/SMTP_PORT are read by the notification outbox)
         email_user = os.environ.get('EMAIL_USER', '')
         email_password = os.environ.get('EMAIL_PASSWORD', '')
         
@@ -92,11 +72,8 @@ def send_notification_email(data, score):
             print("Email not configured - skipping notification")
             return
         
-        # Create message
-        msg = MIMEMultipart()
-        msg['From'] = email_user
-        msg['To'] = email_user  # Send to yourself
-        msg['Subject'] = f"🚀 New AI Assessment: {score}% Readiness - {data.get('name', 'Unknown')}"
+        # Create message (sent to yourself)
+        subject = f"🚀 New AI Assessment: {score}% Readiness - {data.get('name', 'Unknown')}"
         
         # Email body
         body = f"""
@@ -139,20 +116,19 @@ Full Response Data:
 {json.dumps(data, indent=2)}
         """
         
-        msg.attach(MIMEText(body, 'plain'))
-        
-        # Send email
-        server = smtplib.SMTP(smtp_server, smtp_port)
-        server.starttls()
-        server.login(email_user, email_password)
-        server.send_message(msg)
-        server.quit()
+        # Send now, or hold for the next digest (EMAIL_DIGEST_SIZE/EMAIL_DIGEST_INTERVAL)
+        notify_lead(email_user, [email_user], subject, body, score, data)
         
-        print(f"Notification email sent for assessment score: {score}%")
+        print(f"Notification email queued for assessment score: {score}%")
         
     except Exception as e:
         print(f"Failed to send notification email: {e}")
 
+@app.route('/shadow-scoring')
+def shadow_scoring():
+    """Summary of how the scoring models disagree on this app's submissions"""
+    return jsonify(get_shadow_summary())
+
 @app.route('/health')
 def health_check():
     """Health check endpoint for monitoring"""
@@ -0,0 +1,142 @@
+"""
+Sync vs Async Serving Benchmark
+Runs the same submit/report traffic at high concurrency against the API in the
+sync mode (gunicorn.conf.py, gthread workers running api.app:app) and the async
+mode (uvicorn running api.asgi:app), with the same number of worker processes and
+notification emails sent inline to a local SMTP sink that answers slowly
+
+Usage:
+    python benchmarks/async_serving.py --concurrency 256 --duration 20
+    python benchmarks/async_serving.py --smtp-delay 0.2 --workers 4 --output async.json
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCHMARKS_DIR)
+sys.path.insert(0, ROOT_DIR)
+
+from api.smtp_sink import SMTPSink
+from loadgen import EndpointStats, LoadGenerator, free_port, parse_mix, wait_for
+from run_benchmarks import random_submission
+
+MODES = {
+    'sync': lambda port, workers: [
+        'gunicorn', '-c', 'gunicorn.conf.py', '--bind', f'127.0.0.1:{port}', '--workers', str(workers),
+        '--access-logfile', '/dev/null', 'api.app:app'
+    ],
+    'async': lambda port, workers: [
+        'uvicorn', 'api.asgi:app', '--host', '127.0.0.1', '--port', str(port), '--workers', str(workers),
+        '--no-access-log'
+    ]
+}
+
+
+def spawn_server(mode, workers, sink, email_mode):
+    data_dir = tempfile.mkdtemp(prefix=f'async-bench-{mode}-')
+    env = dict(os.environ)
+    env.update({
+        'SMTP_SERVER': sink.address[0],
+        'SMTP_PORT': str(sink.address[1]),
+        'SMTP_STARTTLS': 'false',
+        'EMAIL_USER': 'loadtest@example.com',
+        'EMAIL_PASSWORD': 'loadtest',
+        'RECIPIENT_EMAIL': 'sales@example.com',
+        'EMAIL_OUTBOX': 'false' if email_mode == 'inline' else 'true',
+        'DATA_DIR': data_dir,
+        'SUBMISSIONS_DB': os.path.join(data_dir, 'submissions.db'),
+        'REPORT_CACHE_DIR': os.path.join(data_dir, 'report-cache'),
+        'EMAIL_OUTBOX_SPILL': os.path.join(data_dir, 'outbox-spill.jsonl')
+    })
+    port = free_port()
+    process = subprocess.Popen(MODES[mode](port, workers), cwd=ROOT_DIR, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f'http://127.0.0.1:{port}'
+    try:
+        wait_for(url)
+    except RuntimeError:
+        process.terminate()
+        raise
+    return process, url, data_dir
+
+
+def run_mode(mode, args, submissions):
+    sink = SMTPSink(keep_messages=False, delay=args.smtp_delay).start()
+    process = data_dir = None
+    try:
+        process, url, data_dir = spawn_server(mode, args.workers, sink, args.email_mode)
+        generator = LoadGenerator(url, url, submissions, args.mix, timeout=args.timeout)
+        generator.seed_reports(args.seed_reports)
+        generator.stats = {name: EndpointStats() for name in generator.stats}
+
+        started = time.perf_counter()
+        generator.run_closed_loop(args.concurrency, args.duration)
+        elapsed = time.perf_counter() - started
+
+        total = sum(len(stats.latencies) for stats in generator.stats.values())
+        return {
+            'command': ' '.join(MODES[mode]('PORT', args.workers)),
+            'total': {'requests': total, 'throughput_rps': round(total / elapsed, 2)},
+            'endpoints': {
+                name: stats.summary(elapsed) for name, stats in generator.stats.items() if stats.latencies
+            },
+            'emails_received': sink.message_count
+        }
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=60)
+        sink.stop()
+        if data_dir:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the sync and async serving modes under load')
+    parser.add_argument('--modes', default='sync,async', help='Comma-separated: sync, async')
+    parser.add_argument('--workers', type=int, default=2, help='Server processes in each mode')
+    parser.add_argument('--concurrency', type=int, default=128, help='Closed-loop client threads')
+    parser.add_argument('--duration', type=float, default=15.0)
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix('submit=1,report=1'))
+    parser.add_argument('--smtp-delay', type=float, default=0.1, help='Seconds the SMTP sink takes per message')
+    parser.add_argument('--email-mode', choices=['inline', 'outbox'], default='inline',
+                        help='inline sends during the request (EMAIL_OUTBOX=false)')
+    parser.add_argument('--seed-reports', type=int, default=20, help='Submissions made before timing starts')
+    parser.add_argument('--synthetic', type=int, default=1000, help='Synthetic submissions to generate')
+    parser.add_argument('--timeout', type=float, default=60.0, help='Client socket timeout')
+    parser.add_argument('--output', help='Write the JSON report to this file')
+    args = parser.parse_args()
+
+    rng = random.Random(1234)
+    submissions = [random_submission(rng) for _ in range(args.synthetic)]
+
+    report = {
+        'config': {
+            'workers': args.workers, 'concurrency': args.concurrency, 'duration_s': args.duration,
+            'mix': args.mix, 'smtp_delay_s': args.smtp_delay, 'email_mode': args.email_mode
+        },
+        'modes': {mode: run_mode(mode, args, submissions) for mode in args.modes.split(',')}
+    }
+    modes = report['modes']
+    if 'sync' in modes and 'async' in modes and modes['sync']['total']['throughput_rps']:
+        report['async_vs_sync_throughput'] = round(
+            modes['async']['total']['throughput_rps'] / modes['sync']['total']['throughput_rps'], 2
+        )
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    print(output)
+
+
+if __name__ == '__main__':
+    main()
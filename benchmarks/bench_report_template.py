@@ -0,0 +1,79 @@
+"""
+Report Template Benchmark
+Compares the compiled, cached report template against the old read-and-replace loop
+
+Usage: python benchmarks/bench_report_template.py [--iterations N]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.scoring_analysis import calculate_service_area_scores, get_recommendations_for_scores
+from api.report_generator import build_template_vars, generate_overall_score
+from api.report_template import REPORT_TEMPLATE_PATH, get_report_template
+
+SAMPLE_SUBMISSION = {
+    'name': 'Sample User',
+    'email': 'sample@example.com',
+    'company': 'Sample Company',
+    'employees': '11-50',
+    'industry': 'retail',
+    'current_tools': ['crm', 'analytics'],
+    'budget': '5k-10k',
+    'timeline': '1-3-months',
+    'goals': ['customer-experience', 'automation']
+}
+
+
+def render_legacy(template_vars):
+    """
+    The pre-cache rendering path: reread the file and run one replace per variable
+    """
+    with open(REPORT_TEMPLATE_PATH, 'r') as f:
+        template = f.read()
+    for key, value in template_vars.items():
+        template = template.replace('{{' + key + '}}', str(value))
+    return template
+
+
+def render_compiled(template_vars):
+    return get_report_template().render(template_vars)
+
+
+def time_per_call(func, template_vars, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func(template_vars)
+    return (time.perf_counter() - start) / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=2000)
+    args = parser.parse_args()
+
+    scores = calculate_service_area_scores(SAMPLE_SUBMISSION)
+    recommendations = get_recommendations_for_scores(scores)
+    template_vars = build_template_vars(SAMPLE_SUBMISSION, recommendations, generate_overall_score(scores))
+
+    if render_legacy(template_vars) != render_compiled(template_vars):
+        sys.exit('Compiled template output differs from the legacy loop')
+
+    # Warm both paths before timing
+    time_per_call(render_legacy, template_vars, 50)
+    time_per_call(render_compiled, template_vars, 50)
+
+    legacy = time_per_call(render_legacy, template_vars, args.iterations)
+    compiled = time_per_call(render_compiled, template_vars, args.iterations)
+
+    print(f"Legacy read + replace loop: {legacy * 1e6:8.1f} us/report")
+    print(f"Compiled cached template:   {compiled * 1e6:8.1f} us/report")
+    print(f"Speedup:                    {legacy / compiled:8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+"""
+Serverless Cold-Start Benchmark
+Measures what a fresh interpreter pays before api.app can answer: `-X importtime`
+module costs and the time from process spawn to the handler's first response
+
+Usage:
+    python benchmarks/cold_start.py --runs 10 --output cold_start.json
+    python benchmarks/cold_start.py --request health
+
+Fast start for the serverless handler comes from two things:
+- Deferred imports. smtplib and email.mime load only when mail is sent. Modules
+  off the request path load on first use.
+- The precompiled score table. api/score_table.bin is built at deploy with
+  `python -m api.score_table build` and memory-mapped on first use.
+There is deliberately no snapshot of the compiled rule pack or report template.
+Compiling both from source takes about 1 ms of an import that takes about
+240 ms, so a snapshot file would save less than it costs to read and validate.
+An earlier pickled snapshot was removed because loading it could execute code.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SAMPLE_SUBMISSION = {
+    'name': 'Cold Start',
+    'email': 'cold.start@example.com',
+    'company': 'Benchmark Ltd',
+    'employees': '11-50',
+    'industry': 'technology',
+    'current_tools': ['crm', 'cloud'],
+    'budget': '5k-10k',
+    'timeline': '1-3-months',
+    'goals': ['efficiency', 'automation']
+}
+
+REQUESTS = {
+    'submit': ('POST', '/api/submit-assessment', json.dumps(SAMPLE_SUBMISSION)),
+    'health': ('GET', '/api/health', ''),
+}
+
+# Runs in the fresh interpreter: import the app and push one request through the
+# serverless handler, as the platform would
+FIRST_RESPONSE_SCRIPT = r'''
+import io, json, sys, time
+started = time.time()
+import api.app
+imported = time.time()
+method, path, body = sys.argv[1], sys.argv[2], sys.argv[3].encode('utf-8')
+environ = {
+    'REQUEST_METHOD': method, 'PATH_INFO': path, 'QUERY_STRING': '', 'SERVER_NAME': 'localhost',
+    'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1', 'CONTENT_TYPE': 'application/json',
+    'CONTENT_LENGTH': str(len(body)), 'wsgi.input': io.BytesIO(body), 'wsgi.errors': sys.stderr,
+    'wsgi.url_scheme': 'http', 'wsgi.version': (1, 0), 'wsgi.multithread': False,
+    'wsgi.multiprocess': True, 'wsgi.run_once': True
+}
+class Request:
+    pass
+request = Request()
+request.environ = environ
+response_bytes = sum(len(chunk) for chunk in api.app.handler(request))
+done = time.time()
+print(json.dumps({'started': started, 'imported': imported, 'done': done, 'bytes': response_bytes}))
+'''
+
+
+def child_env(data_dir):
+    env = dict(os.environ)
+    env.update({
+        'PYTHONPATH': ROOT_DIR,
+        'DATA_DIR': data_dir,
+        'SUBMISSIONS_DB': os.path.join(data_dir, 'submissions.db'),
+        'REPORT_CACHE_DIR': os.path.join(data_dir, 'report-cache')
+    })
+    for name in ('EMAIL_USER', 'EMAIL_PASSWORD', 'RECIPIENT_EMAIL', 'METRICS_DIR', 'PROFILE_REQUESTS'):
+        env.pop(name, None)
+    return env
+
+
+def parse_importtime(stderr):
+    """
+    {module: (self_us, cumulative_us)} from -X importtime output
+    """
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def measure_imports(data_dir):
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import api.app'],
+        cwd=ROOT_DIR, env=child_env(data_dir), capture_output=True, text=True, check=True
+    )
+    return parse_importtime(result.stderr)
+
+
+def measure_first_response(data_dir, request_name):
+    method, path, body = REQUESTS[request_name]
+    spawned = time.time()
+    result = subprocess.run(
+        [sys.executable, '-c', FIRST_RESPONSE_SCRIPT, method, path, body],
+        cwd=ROOT_DIR, env=child_env(data_dir), capture_output=True, text=True, check=True
+    )
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    return {
+        'spawn_to_response_ms': (timings['done'] - spawned) * 1000,
+        'interpreter_startup_ms': (timings['started'] - spawned) * 1000,
+        'import_ms': (timings['imported'] - timings['started']) * 1000,
+        'first_request_ms': (timings['done'] - timings['imported']) * 1000
+    }
+
+
+def summarize(values):
+    return {
+        'median': round(statistics.median(values), 2),
+        'min': round(min(values), 2),
+        'max': round(max(values), 2)
+    }
+
+
+def run(runs, request_name, top):
+    import_totals = []
+    self_times = {}
+    responses = []
+    for _ in range(runs):
+        # A fresh data dir each run, like a new serverless instance
+        data_dir = tempfile.mkdtemp(prefix='cold-start-')
+        try:
+            modules = measure_imports(data_dir)
+            import_totals.append(modules['api.app'][1] / 1000)
+            for name, (self_us, _) in modules.items():
+                self_times.setdefault(name, []).append(self_us / 1000)
+            responses.append(measure_first_response(data_dir, request_name))
+        finally:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+    slowest = sorted(self_times.items(), key=lambda item: statistics.median(item[1]), reverse=True)[:top]
+    return {
+        'importtime_api_app_ms': summarize(import_totals),
+        'first_response': {key: summarize([r[key] for r in responses]) for key in responses[0]},
+        'slowest_modules_self_ms': {name: round(statistics.median(values), 2) for name, values in slowest}
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Cold-start benchmark for the serverless handler')
+    parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters to measure')
+    parser.add_argument('--request', choices=sorted(REQUESTS), default='submit', help='First request to send')
+    parser.add_argument('--top', type=int, default=15, help='Slowest modules to list')
+    parser.add_argument('--output', help='Write the JSON report to this file')
+    args = parser.parse_args()
+
+    report = {
+        'meta': {'python': sys.version.split()[0], 'runs': args.runs, 'request': args.request},
+        **run(args.runs, args.request, args.top)
+    }
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,362 @@
+"""
+End-to-End Load Generator
+Replays assessment submissions against running servers and reports throughput,
+latency percentiles and error rates per endpoint as JSON
+
+The site pages (/ and /assessment) are served by the root app from the Procfile and
+the /api endpoints by api.app, so each has its own base URL. With --spawn both are
+started under gunicorn with SMTP pointed at a local sink and a throwaway data dir.
+
+Usage:
+    python benchmarks/loadgen.py --spawn --concurrency 16 --duration 30
+    python benchmarks/loadgen.py --spawn --rate 200 --duration 30 --output capacity.json
+    python benchmarks/loadgen.py --site-url http://127.0.0.1:8000 --api-url http://127.0.0.1:8001 \\
+        --replay leads.jsonl --mix submit=3,report=2,home=4,assessment=1
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCHMARKS_DIR)
+sys.path.insert(0, ROOT_DIR)
+
+from api.smtp_sink import SMTPSink
+from run_benchmarks import random_submission
+
+ENDPOINTS = ['submit', 'report', 'home', 'assessment']
+
+
+class EndpointStats:
+    """
+    Latencies and outcomes for one endpoint
+    """
+
+    def __init__(self):
+        self.latencies = []
+        self.errors = 0
+        self.status_counts = {}
+        self._lock = threading.Lock()
+
+    def record(self, latency, status):
+        with self._lock:
+            self.latencies.append(latency)
+            key = str(status)
+            self.status_counts[key] = self.status_counts.get(key, 0) + 1
+            if not isinstance(status, int) or status >= 400:
+                self.errors += 1
+
+    def summary(self, elapsed):
+        latencies = sorted(self.latencies)
+        count = len(latencies)
+
+        def percentile(p):
+            if not latencies:
+                return None
+            return round(latencies[min(count - 1, int(p / 100 * count))] * 1000, 3)
+
+        return {
+            'requests': count,
+            'throughput_rps': round(count / elapsed, 2) if elapsed else 0.0,
+            'errors': self.errors,
+            'error_rate': round(self.errors / count, 4) if count else 0.0,
+            'status_counts': self.status_counts,
+            'latency_ms': {
+                'p50': percentile(50),
+                'p90': percentile(90),
+                'p99': percentile(99),
+                'max': round(latencies[-1] * 1000, 3) if latencies else None
+            }
+        }
+
+
+class LoadGenerator:
+    def __init__(self, site_url, api_url, submissions, mix, timeout=30.0):
+        self.site = urlsplit(site_url)
+        self.api = urlsplit(api_url)
+        self.submissions = submissions
+        self.mix_names = list(mix)
+        self.mix_weights = [mix[name] for name in self.mix_names]
+        self.timeout = timeout
+        self.stats = {name: EndpointStats() for name in ENDPOINTS}
+        self.report_ids = []
+        self._local = threading.local()
+        self._counter = 0
+        self._lock = threading.Lock()
+
+    def _connection(self, target):
+        connections = getattr(self._local, 'connections', None)
+        if connections is None:
+            connections = self._local.connections = {}
+        key = target.netloc
+        if key not in connections:
+            connections[key] = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=self.timeout)
+        return connections[key]
+
+    def _request(self, target, method, path, body=None, headers=None):
+        connection = self._connection(target)
+        try:
+            connection.request(method, path, body=body, headers=headers or {})
+            response = connection.getresponse()
+            payload = response.read()
+            return response.status, payload
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            raise
+
+    def _next_submission(self):
+        with self._lock:
+            self._counter += 1
+            counter = self._counter
+        data = dict(self.submissions[counter % len(self.submissions)])
+        # Unique email per request so every submit is a distinct lead
+        local_part = str(data.get('email') or 'lead@example.com').split('@')[0]
+        data['email'] = f'{local_part}+{os.getpid()}-{counter}@loadtest.example.com'
+        return data
+
+    def submit(self):
+        data = self._next_submission()
+        status, payload = self._request(self.api, 'POST', '/api/submit-assessment', json.dumps(data),
+                                        {'Content-Type': 'application/json'})
+        if status == 200:
+            report_url = json.loads(payload).get('report_url')
+            if report_url:
+                with self._lock:
+                    self.report_ids.append(report_url)
+        return status
+
+    def report(self):
+        with self._lock:
+            report_url = random.choice(self.report_ids) if self.report_ids else None
+        if report_url is None:
+            return self.submit()
+        status, _ = self._request(self.api, 'GET', report_url)
+        return status
+
+    def home(self):
+        status, _ = self._request(self.site, 'GET', '/', headers={'Accept-Encoding': 'gzip, br'})
+        return status
+
+    def assessment(self):
+        status, _ = self._request(self.site, 'GET', '/assessment', headers={'Accept-Encoding': 'gzip, br'})
+        return status
+
+    def run_one(self, name, scheduled_at=None):
+        start = scheduled_at if scheduled_at is not None else time.perf_counter()
+        try:
+            status = getattr(self, name)()
+        except Exception as e:
+            status = type(e).__name__
+        # Open-loop latency is measured from the scheduled send time, so queueing
+        # in the generator is not hidden (no coordinated omission)
+        self.stats[name].record(time.perf_counter() - start, status)
+
+    def pick(self):
+        return random.choices(self.mix_names, weights=self.mix_weights)[0]
+
+    def seed_reports(self, count):
+        for _ in range(count):
+            try:
+                self.submit()
+            except Exception:
+                pass
+
+    def run_closed_loop(self, concurrency, duration):
+        deadline = time.perf_counter() + duration
+
+        def worker():
+            while time.perf_counter() < deadline:
+                self.run_one(self.pick())
+
+        threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def run_open_loop(self, rate, duration, max_in_flight):
+        start = time.perf_counter()
+        scheduled_at = start
+        with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+            while True:
+                # Poisson arrivals at the requested average rate
+                scheduled_at += random.expovariate(rate)
+                if scheduled_at - start >= duration:
+                    break
+                delay = scheduled_at - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                executor.submit(self.run_one, self.pick(), scheduled_at)
+
+
+def load_submissions(path):
+    submissions = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(record, dict):
+                submissions.append(record)
+    return submissions
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f'Unknown endpoint in mix: {name}')
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_for(url, timeout=30.0):
+    target = urlsplit(url)
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            connection = http.client.HTTPConnection(target.hostname, target.port, timeout=2)
+            connection.request('GET', '/')
+            connection.getresponse().read()
+            connection.close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'Server at {url} did not come up')
+
+
+def spawn_servers(args, sink):
+    """
+    Start the site and API apps under gunicorn with SMTP pointed at the sink
+    """
+    data_dir = tempfile.mkdtemp(prefix='loadgen-')
+    env = dict(os.environ)
+    env.update({
+        'SMTP_SERVER': sink.address[0],
+        'SMTP_PORT': str(sink.address[1]),
+        'SMTP_STARTTLS': 'false',
+        'EMAIL_USER': 'loadtest@example.com',
+        'EMAIL_PASSWORD': 'loadtest',
+        'RECIPIENT_EMAIL': 'sales@example.com',
+        'DATA_DIR': data_dir,
+        'SUBMISSIONS_DB': os.path.join(data_dir, 'submissions.db'),
+        'REPORT_CACHE_DIR': os.path.join(data_dir, 'report-cache'),
+        'EMAIL_OUTBOX_SPILL': os.path.join(data_dir, 'outbox-spill.jsonl')
+    })
+
+    processes, urls = [], []
+    for app_path in (args.site_app, args.api_app):
+        port = free_port()
+        command = ['gunicorn', '--bind', f'127.0.0.1:{port}', '--workers', str(args.workers)]
+        command += args.gunicorn_args.split() + [app_path]
+        processes.append(subprocess.Popen(command, cwd=ROOT_DIR, env=env,
+                                          stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+        urls.append(f'http://127.0.0.1:{port}')
+    for url in urls:
+        wait_for(url)
+    return processes, urls, data_dir
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay assessment traffic against the real servers')
+    parser.add_argument('--base-url', default='http://127.0.0.1:5000', help='Default for --site-url/--api-url')
+    parser.add_argument('--site-url', help='Server for / and /assessment')
+    parser.add_argument('--api-url', help='Server for /api/submit-assessment and /api/report/<id>')
+    parser.add_argument('--spawn', action='store_true', help='Start gunicorn servers and an SMTP sink')
+    parser.add_argument('--site-app', default='app:app', help='WSGI app for the site (as in the Procfile)')
+    parser.add_argument('--api-app', default='api.app:app', help='WSGI app for the API')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers per spawned server')
+    parser.add_argument('--gunicorn-args', default='', help='Extra arguments for spawned gunicorn servers')
+    parser.add_argument('--replay', help='JSON-lines file of submissions to replay (default: synthetic)')
+    parser.add_argument('--synthetic', type=int, default=1000, help='Synthetic submissions to generate')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix('submit=1,report=1,home=1,assessment=1'))
+    parser.add_argument('--concurrency', type=int, default=8, help='Closed-loop client threads')
+    parser.add_argument('--rate', type=float, help='Open-loop arrival rate in requests/second')
+    parser.add_argument('--max-in-flight', type=int, default=256, help='Open-loop concurrency cap')
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--seed-reports', type=int, default=20, help='Submissions made before timing starts')
+    parser.add_argument('--output', help='Write the JSON report to this file')
+    args = parser.parse_args()
+
+    if args.replay:
+        submissions = load_submissions(args.replay)
+        if not submissions:
+            sys.exit(f'No JSON object lines found in {args.replay}')
+    else:
+        rng = random.Random(1234)
+        submissions = [random_submission(rng) for _ in range(args.synthetic)]
+
+    sink = processes = data_dir = None
+    site_url = args.site_url or args.base_url
+    api_url = args.api_url or args.base_url
+    try:
+        if args.spawn:
+            sink = SMTPSink(keep_messages=False).start()
+            processes, (site_url, api_url), data_dir = spawn_servers(args, sink)
+
+        generator = LoadGenerator(site_url, api_url, submissions, args.mix)
+        generator.seed_reports(args.seed_reports)
+        generator.stats = {name: EndpointStats() for name in ENDPOINTS}
+
+        started = time.perf_counter()
+        if args.rate:
+            generator.run_open_loop(args.rate, args.duration, args.max_in_flight)
+            mode = {'mode': 'open-loop', 'rate_rps': args.rate, 'max_in_flight': args.max_in_flight}
+        else:
+            generator.run_closed_loop(args.concurrency, args.duration)
+            mode = {'mode': 'closed-loop', 'concurrency': args.concurrency}
+        elapsed = time.perf_counter() - started
+
+        total = sum(len(stats.latencies) for stats in generator.stats.values())
+        report = {
+            'config': dict(mode, duration_s=round(elapsed, 3), site_url=site_url, api_url=api_url,
+                           mix=args.mix, submissions=len(submissions), spawned=args.spawn),
+            'total': {'requests': total, 'throughput_rps': round(total / elapsed, 2)},
+            'endpoints': {
+                name: stats.summary(elapsed) for name, stats in generator.stats.items() if stats.latencies
+            }
+        }
+        if sink is not None:
+            report['emails_received'] = sink.message_count
+    finally:
+        for process in processes or []:
+            process.terminate()
+            process.wait(timeout=30)
+        if sink is not None:
+            sink.stop()
+        if data_dir:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+"""
+Hot Path Micro-Benchmarks
+Times the scoring and report functions on randomized, realistic answer sets and
+compares results against a saved baseline
+
+Usage:
+    python benchmarks/run_benchmarks.py --output results.json
+    python benchmarks/run_benchmarks.py --compare baseline.json [--threshold 0.10]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from api.scoring_analysis import ASSESSMENT_QUESTIONS, calculate_service_area_scores, get_recommendations_for_scores
+from api.report_generator import create_priority_matrix, generate_personalized_report
+from api.app import calculate_ai_readiness_score_legacy
+from app import calculate_ai_score
+
+COMPANY_NAMES = ['Acme Ltd', 'Northwind Traders', 'Blue Harbour Consulting', 'Greenfield Farms', 'Apex Dental']
+FIRST_NAMES = ['Alex', 'Sam', 'Jordan', 'Priya', 'Chen', 'Fatima', 'Liam', 'Sofia']
+
+
+def random_submission(rng):
+    """
+    Build one realistic submission from the options in ASSESSMENT_QUESTIONS
+    """
+    name = rng.choice(FIRST_NAMES)
+    data = {
+        'name': name,
+        'email': f'{name.lower()}{rng.randint(1, 9999)}@example.com',
+        'phone': f'+44 7{rng.randint(100000000, 999999999)}',
+        'company': rng.choice(COMPANY_NAMES)
+    }
+    for question, config in ASSESSMENT_QUESTIONS.items():
+        options = config.get('options')
+        if not options:
+            continue
+        if config['type'] == 'checkbox':
+            data[question] = rng.sample(options, rng.randint(0, min(4, len(options))))
+        elif rng.random() < 0.95:  # occasionally leave a question unanswered
+            data[question] = rng.choice(options)
+    return data
+
+
+def build_cases(submissions):
+    """
+    name -> (function, list of argument tuples)
+    """
+    scores = [calculate_service_area_scores(data) for data in submissions]
+    recommendations = [get_recommendations_for_scores(s) for s in scores]
+    return {
+        'calculate_service_area_scores': (calculate_service_area_scores, [(d,) for d in submissions]),
+        'get_recommendations_for_scores': (get_recommendations_for_scores, [(s,) for s in scores]),
+        'create_priority_matrix': (create_priority_matrix, [(r,) for r in recommendations]),
+        'generate_personalized_report': (generate_personalized_report, [(d,) for d in submissions]),
+        'calculate_ai_score': (calculate_ai_score, [(d,) for d in submissions]),
+        'calculate_ai_readiness_score_legacy': (calculate_ai_readiness_score_legacy, [(d,) for d in submissions])
+    }
+
+
+def time_case(func, arguments, iterations, repeats):
+    """
+    Run `iterations` calls cycling through the inputs, `repeats` times.
+    Returns per-call timings in microseconds.
+    """
+    samples = []
+    count = len(arguments)
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for i in range(iterations):
+            func(*arguments[i % count])
+        samples.append((time.perf_counter() - start) / iterations * 1e6)
+    return {
+        'median_us': statistics.median(samples),
+        'min_us': min(samples),
+        'stdev_us': statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        'iterations': iterations,
+        'repeats': repeats
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    rng = random.Random(args.seed)
+    submissions = [random_submission(rng) for _ in range(args.inputs)]
+    cases = build_cases(submissions)
+
+    results = {}
+    # Silence the functions' own print logging while timing
+    with contextlib.redirect_stdout(io.StringIO()):
+        for name, (func, arguments) in cases.items():
+            if args.filter and args.filter not in name:
+                continue
+            time_case(func, arguments, max(1, args.iterations // 10), 1)  # warm-up
+            results[name] = time_case(func, arguments, args.iterations, args.repeats)
+
+    return {
+        'meta': {
+            'timestamp': datetime.now().isoformat(),
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'seed': args.seed,
+            'inputs': args.inputs
+        },
+        'results': results
+    }
+
+
+def compare(current, baseline, threshold):
+    """
+    Print a comparison table and return the names that slowed down beyond threshold
+    """
+    regressions = []
+    print(f"{'benchmark':40} {'baseline us':>12} {'current us':>12} {'change':>8}")
+    for name, result in current['results'].items():
+        base = baseline['results'].get(name)
+        if base is None:
+            print(f"{name:40} {'-':>12} {result['median_us']:12.2f} {'new':>8}")
+            continue
+        change = result['median_us'] / base['median_us'] - 1
+        flag = ''
+        if change > threshold:
+            flag = '  SLOWER'
+            regressions.append(name)
+        print(f"{name:40} {base['median_us']:12.2f} {result['median_us']:12.2f} {change:+8.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Scoring and report hot path benchmarks')
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    parser.add_argument('--compare', metavar='BASELINE', help='Compare against a saved results file')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='Relative slowdown that counts as a regression (default 0.10)')
+    parser.add_argument('--filter', help='Only run benchmarks whose name contains this text')
+    parser.add_argument('--iterations', type=int, default=2000)
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--inputs', type=int, default=500, help='Number of randomized submissions')
+    parser.add_argument('--seed', type=int, default=1234)
+    args = parser.parse_args()
+
+    current = run(args)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(current, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(current, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} benchmark(s) slower than baseline by more than {args.threshold:.0%}")
+            sys.exit(1)
+    else:
+        for name, result in current['results'].items():
+            print(f"{name:40} {result['median_us']:10.2f} us/call (min {result['min_us']:.2f})")
+
+
+if __name__ == '__main__':
+    main()
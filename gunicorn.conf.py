@@ -0,0 +1,95 @@
+"""
+Production gunicorn profile
+
+    gunicorn -c gunicorn.conf.py wsgi:app       (site and API, as in the Procfile)
+    gunicorn -c gunicorn.conf.py api.app:app    (API only)
+
+Worker and thread counts follow the CPUs available to the process; override with
+WEB_CONCURRENCY and GUNICORN_THREADS. The app is preloaded and warmed up in the
+master so compiled rules, the score table mapping and the parsed templates are
+shared copy-on-write, and every worker warms up again before accepting traffic.
+Workers are recycled after GUNICORN_MAX_REQUESTS requests; a recycled or stopped
+worker finishes its in-flight requests and flushes queued notification emails
+before it exits, and the master then folds its metrics file into the archive.
+"""
+
+import os
+
+
+def _available_cores():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # pragma: no cover - not available on macOS/Windows
+        return os.cpu_count() or 1
+
+
+cores = _available_cores()
+
+bind = os.environ.get('GUNICORN_BIND', f"0.0.0.0:{os.environ.get('PORT', '5000')}")
+
+# Handlers are short and mostly CPU-bound, so one process per core plus one;
+# threads cover the waits on SQLite and the clients
+workers = int(os.environ.get('WEB_CONCURRENCY', cores + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', '4'))
+worker_class = 'gthread'
+
+preload_app = True
+
+# Recycle workers to bound memory growth; jitter keeps them from restarting together
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', '2000'))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', '200'))
+
+# In-flight requests get this long to finish when a worker is recycled or stopped
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '30'))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', '5'))
+
+# Keep worker heartbeat files off disk where possible
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-')
+
+WARMUP = os.environ.get('WARMUP', 'true').lower() != 'false'
+
+# Seconds a stopping worker may spend delivering queued notification emails
+OUTBOX_FLUSH_TIMEOUT = float(os.environ.get('OUTBOX_FLUSH_TIMEOUT', '10'))
+
+
+def on_starting(server):
+    # Runs in the master before any worker starts: counts from the previous run or
+    # deploy must not be summed into this one's
+    from api.metrics import registry
+    registry.clear_directory()
+
+
+def when_ready(server):
+    # Runs in the master after the preloaded app is imported and before any worker forks
+    if WARMUP:
+        from api.warmup import warm_up
+        server.log.info('Master warm-up done in %.1f ms', warm_up() * 1000)
+
+
+def post_worker_init(worker):
+    # The worker is forked and initialized but not yet accepting connections.
+    # Send lead digests held by workers that have since exited
+    from api.notifications import recover_digests
+    recover_digests()
+    if WARMUP:
+        from api.warmup import warm_up
+        from api.metrics import registry
+        registry.store()  # create this worker's metrics file up front
+        worker.log.info('Worker %s warm-up done in %.1f ms', worker.pid, warm_up() * 1000)
+
+
+def worker_exit(server, worker):
+    # In-flight requests have finished; deliver (or spill to disk) queued emails
+    from api.notifications import shutdown_outbox
+    shutdown_outbox(OUTBOX_FLUSH_TIMEOUT)
+
+
+def child_exit(server, worker):
+    # Runs in the master once a worker has exited, however it stopped: keep its
+    # metrics without leaving a file behind for every recycled worker
+    from api.metrics import registry
+    registry.fold_process(worker.pid)
@@ -0,0 +1,31 @@
+import os
+import tempfile
+
+# Keep the submissions database, report cache and outbox spill out of the repo;
+# set before any api module reads its paths at import time
+os.environ['DATA_DIR'] = tempfile.mkdtemp(prefix='assessment-tests-')
+for name in ('SUBMISSIONS_DB', 'REPORT_CACHE_DIR', 'EMAIL_OUTBOX_SPILL', 'METRICS_DIR', 'PROFILE_DIR', 'EMAIL_USER'):
+    os.environ.pop(name, None)
+
+import pytest
+
+
+@pytest.fixture
+def submission():
+    return {
+        'name': 'Ada Lovelace',
+        'email': 'ada@example.com',
+        'company': 'Analytical Engines',
+        'industry': 'retail',
+        'employees': '11-50',
+        'current_tools': ['crm', 'cloud'],
+        'budget': '5k-10k',
+        'timeline': '1-3-months',
+        'goals': ['automation', 'efficiency']
+    }
+
+
+@pytest.fixture
+def client():
+    from api.app import app
+    return app.test_client()
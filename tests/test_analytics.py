@@ -0,0 +1,58 @@
+from api.analytics import ANALYTICS_TOP_GOALS, ANALYTICS_WEEKS, aggregate_rows, get_analytics, summarize
+from api.storage import SubmissionStore, get_submission_store
+
+ANSWERS = [
+    {'industry': 'retail', 'employees': '1-10', 'budget': 'under-1k', 'goals': ['automation']},
+    {'industry': 'finance', 'employees': '51-200', 'budget': '25k+', 'goals': ['data-insights', 'efficiency']},
+    {'industry': 'technology', 'employees': '200+', 'budget': '10k-25k', 'goals': ['efficiency', 'competitive-advantage']},
+    {'industry': 'hospitality', 'employees': '500+', 'budget': '1k-5k', 'goals': []},
+    {'industry': 'education', 'budget': '5k-10k', 'goals': ['customer-experience']},
+]
+
+
+def recount(store):
+    """
+    The analytics summary computed from every stored submission
+    """
+    totals = {}
+    for submission in store.iter_submissions():
+        for dimension, key, bucket, count, total in aggregate_rows(submission):
+            entry = totals.setdefault((dimension, key, bucket), [0, 0])
+            entry[0] += count
+            entry[1] += total
+    rows = [key + tuple(entry) for key, entry in totals.items()]
+    return summarize(rows, ANALYTICS_WEEKS, ANALYTICS_TOP_GOALS)
+
+
+def submit_all(client, submission):
+    for n, answers in enumerate(ANSWERS):
+        answers = dict(submission, email=f'analytics-{n}@example.com', **answers)
+        assert client.post('/api/submit-assessment', json=answers).status_code == 200
+
+
+def test_aggregates_match_a_recount(client, submission):
+    submit_all(client, submission)
+
+    assert get_analytics() == recount(get_submission_store())
+
+
+def test_rebuild_counts_submissions_stored_during_the_scan(client, submission):
+    submit_all(client, submission)
+    store = get_submission_store()
+    expected = recount(store)
+    stored_before = sum(1 for _ in store.iter_submissions())
+    store.connection().execute('DELETE FROM analytics_aggregates')
+
+    # A submit on another connection while the scan runs must not wait on a lock
+    other = SubmissionStore(store.path)
+    late = next(store.iter_submissions())
+    inserted = []
+
+    def rows_inserting_once(stored):
+        if not inserted:
+            inserted.append(other.save_submission('late', dict(late, email='late@example.com'),
+                                                  late['rule_version'], aggregate_rows(late)))
+        return aggregate_rows(stored)
+
+    assert store.rebuild_aggregates(rows_inserting_once, batch_size=2) == stored_before + 1
+    assert get_analytics() == recount(store) != expected
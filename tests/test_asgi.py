@@ -0,0 +1,92 @@
+import asyncio
+import json
+
+import pytest
+
+from api import asgi
+from api import metrics
+from api.profiling import ProfilingMiddleware
+from api.request_guard import MAX_SUBMISSION_BYTES
+
+
+async def call(method, path, body=b'', headers=()):
+    """
+    (status, headers, body) of one request through the ASGI app
+    """
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {'type': 'http.disconnect'}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        'type': 'http', 'method': method, 'path': path, 'query_string': b'', 'root_path': '',
+        'http_version': '1.1', 'scheme': 'http', 'server': ('testserver', 80), 'client': ('127.0.0.1', 5000),
+        'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())]
+                   + [(name.lower().encode(), value.encode()) for name, value in headers]
+    }
+    await asgi.app(scope, receive, send)
+    return sent[0]['status'], dict(sent[0]['headers']), b''.join(m.get('body', b'') for m in sent[1:])
+
+
+def request(method, path, body=b'', headers=()):
+    return asyncio.run(call(method, path, body, headers))
+
+
+def submit_count():
+    series = metrics.requests_total.labels(endpoint='submit_assessment', status='2xx')
+    return metrics.registry.store().values()[series._start]
+
+
+def test_submit_and_report(submission):
+    counted = submit_count()
+    status, _, body = request('POST', '/api/submit-assessment', json.dumps(dict(submission, budget='1k-5k')).encode())
+
+    assert status == 200
+    # Counted once, by the Flask app's after_request hook
+    assert submit_count() == counted + 1
+    report_url = json.loads(body)['report_url']
+
+    status, headers, report = request('GET', report_url)
+    assert status == 200
+    assert b'Analytical Engines' in report
+
+    status, _, _ = request('GET', report_url, headers=[('If-None-Match', headers[b'etag'].decode())])
+    assert status == 304
+
+
+def test_oversized_submission_is_rejected():
+    status, _, body = request('POST', '/api/submit-assessment', b' ' * (MAX_SUBMISSION_BYTES + 1))
+
+    assert status == 413
+    assert json.loads(body)['max_bytes'] == MAX_SUBMISSION_BYTES
+
+
+def test_saturated_limiter_returns_503(monkeypatch):
+    limiter = asgi._Limiter(1, 0.05)
+    monkeypatch.setattr(asgi, 'limiter', limiter)
+
+    async def saturated():
+        assert await limiter.acquire()
+        try:
+            return await call('GET', '/api/health')
+        finally:
+            limiter.release()
+
+    status, headers, _ = asyncio.run(saturated())
+    assert status == 503
+    assert b'retry-after' in headers
+
+
+def test_profiled_request_takes_the_wsgi_path(submission, tmp_path, monkeypatch):
+    flask_app = asgi.flask_app
+    monkeypatch.setattr(flask_app, 'wsgi_app', ProfilingMiddleware(flask_app.wsgi_app, str(tmp_path), token='s3cret'))
+
+    status, _, _ = request('POST', '/api/submit-assessment', json.dumps(dict(submission, budget='25k+')).encode(),
+                           headers=[('X-Profile-Request', 's3cret')])
+
+    assert status == 200
+    assert len(list(tmp_path.glob('*.pstats'))) == 1
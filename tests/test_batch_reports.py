@@ -0,0 +1,99 @@
+import io
+import json
+
+import pytest
+
+from api import batch_reports
+from api.batch_reports import MANIFEST_NAME, generate_reports
+
+
+@pytest.fixture
+def leads(submission):
+    return [dict(submission, email=f'lead{i}@example.com', name=f'Lead {i}') for i in range(3)]
+
+
+def ndjson(records, extra_lines=()):
+    lines = [json.dumps(record) for record in records] + list(extra_lines)
+    return io.BytesIO(('\n'.join(lines) + '\n').encode('utf-8'))
+
+
+def generate(stream, output_dir, **kwargs):
+    return generate_reports(stream, str(output_dir), workers=1, progress_interval=60, **kwargs)
+
+
+def test_current_reports_are_skipped(leads, tmp_path):
+    first = generate(ndjson(leads), tmp_path)
+    assert (first['written'], first['skipped_current'], first['failed']) == (3, 0, 0)
+    assert len(json.loads((tmp_path / MANIFEST_NAME).read_text())) == 3
+    assert sorted(path.name for path in tmp_path.glob('*.html')) == [
+        'lead0_at_example_dot_com.html', 'lead1_at_example_dot_com.html', 'lead2_at_example_dot_com.html'
+    ]
+
+    second = generate(ndjson(leads), tmp_path)
+    assert (second['written'], second['skipped_current']) == (0, 3)
+
+    # A deleted report is rendered again even though its hash is unchanged
+    (tmp_path / 'lead1_at_example_dot_com.html').unlink()
+    third = generate(ndjson(leads), tmp_path)
+    assert (third['written'], third['skipped_current']) == (1, 2)
+
+    forced = generate(ndjson(leads), tmp_path, force=True)
+    assert (forced['written'], forced['skipped_current']) == (3, 0)
+
+
+def test_changed_answers_re_render_only_that_report(leads, tmp_path):
+    generate(ndjson(leads), tmp_path)
+    report = tmp_path / 'lead1_at_example_dot_com.html'
+    before = report.read_text()
+
+    leads[1] = dict(leads[1], company='Difference Engines')
+    summary = generate(ndjson(leads), tmp_path)
+
+    assert (summary['written'], summary['skipped_current']) == (1, 2)
+    assert 'Difference Engines' in report.read_text()
+    assert report.read_text() != before
+
+
+def test_bad_lines_are_reported_and_the_rest_rendered(leads, tmp_path):
+    broken = ['{"name": "Truncated",', json.dumps({'name': 'No Email', 'company': 'Co'}), '["not", "an", "object"]']
+    summary = generate(ndjson(leads, broken), tmp_path)
+
+    assert summary['written'] == 3
+    assert summary['failed'] == 3
+    assert [error['line'] for error in summary['errors']] == [4, 5, 6]
+    assert summary['errors'][0]['error'].startswith('Invalid JSON')
+    assert summary['errors'][1]['error'] == 'Missing required field: email'
+
+
+def test_failed_render_is_reported_by_line_and_left_out_of_the_manifest(leads, tmp_path, monkeypatch):
+    render = batch_reports.render_job
+
+    def failing_render(job):
+        if job[0] == 2:
+            return job[0], job[1], None, 'ValueError: template exploded'
+        return render(job)
+
+    monkeypatch.setattr(batch_reports, 'render_job', failing_render)
+    summary = generate(ndjson(leads), tmp_path)
+
+    assert summary['written'] == 2
+    assert summary['errors'] == [{'line': 2, 'error': 'ValueError: template exploded'}]
+    assert 'lead1_at_example_dot_com.html' not in json.loads((tmp_path / MANIFEST_NAME).read_text())
+
+    # The next run retries only the failed line
+    monkeypatch.setattr(batch_reports, 'render_job', render)
+    retry = generate(ndjson(leads), tmp_path)
+    assert (retry['written'], retry['skipped_current'], retry['failed']) == (1, 2, 0)
+
+
+def test_cli_exits_non_zero_when_a_line_fails(leads, tmp_path, capsys):
+    input_path = tmp_path / 'leads.jsonl'
+    input_path.write_bytes(ndjson(leads, ['not json']).getvalue())
+
+    with pytest.raises(SystemExit) as exit_info:
+        batch_reports.main([str(input_path), '--output-dir', str(tmp_path / 'reports'), '--workers', '1'])
+
+    assert exit_info.value.code == 1
+    output = capsys.readouterr()
+    assert 'Line 4: Invalid JSON' in output.err
+    assert 'Wrote 3 report(s)' in output.out
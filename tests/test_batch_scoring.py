@@ -0,0 +1,14 @@
+import json
+
+
+def test_batch_results_match_submit_and_have_no_report_url(client, submission):
+    body = json.dumps(submission) + '\n{"name": "No email"}\n'
+    response = client.post('/api/score-batch', data=body, content_type='application/x-ndjson')
+    scored, rejected = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+    submitted = client.post('/api/submit-assessment', json=dict(submission, email='batch@example.com')).get_json()
+    assert scored['success'] is True
+    assert 'report_url' not in scored
+    assert scored['service_area_scores'] == submitted['service_area_scores']
+    assert scored['overall_score'] == submitted['overall_score']
+    assert rejected == {'line': 2, 'success': False, 'error': 'Missing required field: email'}
@@ -0,0 +1,35 @@
+import csv
+import io
+import json
+
+from api.export import export_rows
+
+
+def lead(**answers):
+    return dict({
+        'id': 1, 'submitted_at': '2026-01-05T10:00:00', 'name': 'Ada Lovelace', 'email': 'ada@example.com',
+        'company': 'Analytical Engines', 'overall_score': 72, 'goals': ['automation', 'efficiency']
+    }, **answers)
+
+
+def test_csv_cells_cannot_start_a_formula():
+    submission = lead(name='=HYPERLINK("http://evil.example","click")', company='@SUM(A1)',
+                      phone='+44 20 7946 0000', additional_info='-2+3')
+
+    row = next(csv.DictReader(io.StringIO(''.join(export_rows('csv', [submission])))))
+
+    assert row['name'] == '\'=HYPERLINK("http://evil.example","click")'
+    assert row['company'] == "'@SUM(A1)"
+    assert row['phone'] == "'+44 20 7946 0000"
+    assert row['additional_info'] == "'-2+3"
+    assert row['email'] == 'ada@example.com'
+    assert row['goals'] == 'automation;efficiency'
+    assert row['overall_score'] == '72'
+
+
+def test_jsonl_values_stay_raw():
+    submission = lead(name='=HYPERLINK("http://evil.example","click")', company='@SUM(A1)')
+
+    exported = json.loads(''.join(export_rows('jsonl', [submission])))
+
+    assert exported == submission
@@ -0,0 +1,74 @@
+import threading
+import time
+
+import pytest
+
+from api.idempotency import IdempotencyCache, IdempotencyError
+from api.storage import SubmissionStore
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return IdempotencyCache(SubmissionStore(str(tmp_path / 'submissions.db')), wait=0.2)
+
+
+def test_duplicate_key_replays_the_stored_response(cache):
+    with cache.claim('order-1', {'budget': '5k-10k'}) as claim:
+        assert claim.replay is None
+        claim.complete({'report_url': '/api/report/abc'})
+
+    # Key order does not make a different payload
+    repeat = cache.claim('order-1', {'budget': '5k-10k'})
+    assert repeat.replay == (200, {'report_url': '/api/report/abc'})
+    # Without a header the payload itself is the key
+    with cache.claim(None, {'budget': '5k-10k', 'goals': ['automation']}) as claim:
+        claim.complete({'report_url': '/api/report/def'})
+    assert cache.claim(None, {'goals': ['automation'], 'budget': '5k-10k'}).replay[1] == {
+        'report_url': '/api/report/def'
+    }
+
+
+def test_key_reused_for_another_payload_is_rejected(cache):
+    with cache.claim('order-1', {'budget': '5k-10k'}) as claim:
+        claim.complete({'report_url': '/api/report/abc'})
+
+    with pytest.raises(IdempotencyError) as error:
+        cache.claim('order-1', {'budget': '25k+'})
+    assert error.value.status == 422
+
+
+def test_failed_handler_releases_its_claim(cache):
+    with pytest.raises(RuntimeError):
+        with cache.claim('order-1', {'budget': '5k-10k'}):
+            raise RuntimeError('scoring failed')
+
+    retry = cache.claim('order-1', {'budget': '5k-10k'})
+    assert retry.replay is None and not retry.done
+
+
+def test_waiter_gets_the_response_of_the_request_in_flight(cache):
+    first = cache.claim('order-1', {'budget': '5k-10k'})
+    timer = threading.Timer(0.05, first.complete, [{'report_url': '/api/report/abc'}])
+    timer.start()
+    try:
+        assert cache.claim('order-1', {'budget': '5k-10k'}).replay == (200, {'report_url': '/api/report/abc'})
+    finally:
+        timer.join()
+
+
+def test_waiter_times_out_while_the_request_is_in_flight(cache):
+    cache.claim('order-1', {'budget': '5k-10k'})
+
+    started = time.monotonic()
+    with pytest.raises(IdempotencyError) as error:
+        cache.claim('order-1', {'budget': '5k-10k'})
+    assert error.value.status == 409
+    assert time.monotonic() - started >= cache.wait
+
+
+def test_submit_with_reused_key_returns_422(client, submission):
+    headers = {'Idempotency-Key': 'submit-422'}
+    assert client.post('/api/submit-assessment', json=submission, headers=headers).status_code == 200
+
+    response = client.post('/api/submit-assessment', json=dict(submission, budget='25k+'), headers=headers)
+    assert response.status_code == 422
@@ -0,0 +1,70 @@
+import os
+
+from api.metrics import ARCHIVE_NAME, MetricsRegistry
+
+
+def make_registry(directory):
+    registry = MetricsRegistry(str(directory))
+    requests = registry.counter('requests_total', 'Requests.', [{'endpoint': 'a'}, {'endpoint': 'b'}])
+    return registry, requests
+
+
+def metric_files(directory):
+    return sorted(name for name in os.listdir(directory) if name.startswith('metrics-'))
+
+
+def run_child(registry, requests, amount):
+    pid = os.fork()
+    if pid == 0:
+        try:
+            requests.labels(endpoint='a').inc(amount)
+        finally:
+            os._exit(0)
+    os.waitpid(pid, 0)
+    return pid
+
+
+def test_existing_file_is_not_truncated(tmp_path):
+    registry, requests = make_registry(tmp_path)
+    requests.labels(endpoint='a').inc(3)
+
+    # A new process with the same PID keeps the unfolded counts
+    reopened, reopened_requests = make_registry(tmp_path)
+    reopened_requests.labels(endpoint='a').inc()
+    assert reopened.store().values() == [4.0, 0.0]
+
+
+def test_exited_workers_are_folded_into_archive(tmp_path):
+    registry, requests = make_registry(tmp_path)
+    requests.labels(endpoint='b').inc()
+
+    for amount in (2, 5):
+        registry.fold_process(run_child(registry, requests, amount))
+
+    assert metric_files(tmp_path) == sorted([ARCHIVE_NAME, f'metrics-{os.getpid()}.db'])
+    assert registry.collect() == [7.0, 1.0]
+
+
+def test_clear_directory_drops_previous_run(tmp_path):
+    registry, requests = make_registry(tmp_path)
+    registry.fold_process(run_child(registry, requests, 4))
+    registry.clear_directory()
+
+    fresh, _ = make_registry(tmp_path)
+    assert fresh.collect() == [0.0, 0.0]
+
+
+def test_every_route_is_counted_and_unknown_paths_are_other(client):
+    from api import metrics
+    from api.app import app
+
+    assert set(metrics.ENDPOINTS) == {rule.endpoint for rule in app.url_map.iter_rules()} | {'other'}
+
+    def count(endpoint, status):
+        series = metrics.requests_total.labels(endpoint=endpoint, status=status)
+        return metrics.registry.store().values()[series._start]
+
+    health, missing = count('health_check', '2xx'), count('other', '4xx')
+    client.get('/api/health')
+    client.get('/api/no-such-route')
+    assert (count('health_check', '2xx'), count('other', '4xx')) == (health + 1, missing + 1)
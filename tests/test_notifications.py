@@ -0,0 +1,184 @@
+import json
+import os
+import socket
+
+import pytest
+
+from api.notifications import DEFAULT_SPILL_PATH, NotificationOutbox, SMTPSession, build_message
+from api.smtp_sink import SMTPSink
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def make_outbox(port, spill_path, **kwargs):
+    return NotificationOutbox(
+        session_factory=lambda: SMTPSession('127.0.0.1', port, use_starttls=False, timeout=5),
+        spill_path=str(spill_path), backoff_base=0.01, idle_timeout=0.2, **kwargs
+    )
+
+
+def message(n):
+    text = build_message('site@example.com', ['sales@example.com'], f'Lead {n}', f'Lead number {n}')
+    return {'from': 'site@example.com', 'to': ['sales@example.com'], 'message': text}
+
+
+@pytest.fixture
+def sink():
+    with SMTPSink() as sink:
+        yield sink
+
+
+def test_messages_are_delivered_over_one_session(sink, tmp_path):
+    outbox = make_outbox(sink.address[1], tmp_path / 'spill.jsonl')
+    for n in range(3):
+        outbox.enqueue(message(n))
+    outbox.flush(timeout=5)
+
+    assert sink.message_count == 3
+    assert sink.connection_count == 1
+    assert [recipients for _, recipients, _ in sink.messages] == [['<sales@example.com>']] * 3
+    assert outbox.sent_count == 3 and outbox.failed_count == 0
+    assert not (tmp_path / 'spill.jsonl').exists()
+
+
+def test_failed_delivery_is_spilled_and_replayed_on_restart(sink, tmp_path):
+    spill_path = tmp_path / 'spill.jsonl'
+
+    # Nothing listens on this port, so every attempt fails and the message is spilled
+    failing = make_outbox(free_port(), spill_path, max_retries=1)
+    lead = message(1)
+    failing.enqueue(lead)
+    failing.flush(timeout=5)
+
+    assert failing.failed_count == 1
+    spilled = [json.loads(line) for line in spill_path.read_text().splitlines()]
+    assert spilled == [lead]
+
+    # The next outbox to start re-queues the spill file and delivers it
+    restarted = make_outbox(sink.address[1], spill_path)
+    restarted.start()
+    restarted.flush(timeout=5)
+
+    assert sink.message_count == 1
+    assert 'Lead number 1' in sink.messages[0][2]
+    assert not spill_path.exists()
+
+
+def test_overflow_and_shutdown_leftovers_are_spilled(tmp_path):
+    spill_path = tmp_path / 'spill.jsonl'
+    # Keep the worker busy retrying an unreachable server so the queue backs up
+    outbox = make_outbox(free_port(), spill_path, maxsize=1, max_retries=50)
+    leads = [message(n) for n in range(4)]
+    for lead in leads:
+        outbox.enqueue(lead)
+    outbox.flush(timeout=0.1)
+
+    spilled = sorted(json.loads(line)['message'] for line in spill_path.read_text().splitlines())
+    assert spilled == sorted(lead['message'] for lead in leads)
+
+
+class RecordingSend:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.messages = []
+
+    def __call__(self, sender, recipients, message_text):
+        if self.fail:
+            raise OSError('mail server down')
+        self.messages.append(message_text)
+        return True
+
+
+@pytest.fixture
+def store(tmp_path):
+    from api.storage import SubmissionStore
+    return SubmissionStore(str(tmp_path / 'submissions.db'))
+
+
+def hold_leads(digest, scores):
+    for score in scores:
+        digest.add('site@example.com', ['sales@example.com'], f'Lead scoring {score}', 'details', score)
+
+
+def test_digest_is_sent_when_full(store):
+    from api.notifications import LeadDigest
+
+    send = RecordingSend()
+    hold_leads(LeadDigest(size=3, send=send, store=store), [40, 70, 55])
+
+    assert len(send.messages) == 1
+    assert send.messages[0].index('Lead scoring 70') < send.messages[0].index('Lead scoring 40')
+    assert store.due_digest_keys(float('inf')) == []
+
+
+def test_held_leads_survive_a_restart(store):
+    from api.notifications import LeadDigest
+
+    send = RecordingSend()
+    # The first process holds two leads and dies without flushing
+    hold_leads(LeadDigest(size=5, send=send, store=store), [30, 60])
+    assert send.messages == []
+
+    LeadDigest(size=5, send=send, store=store).recover()
+    assert len(send.messages) == 1
+    assert 'Digest: 2 new lead(s) - top score 60%' in send.messages[0]
+
+
+def test_interval_recovery_sends_only_due_digests(store):
+    from api.notifications import LeadDigest
+
+    send = RecordingSend()
+    old = {'subject': 'Old lead', 'body': 'details', 'score': 50, 'queued_at': 0.0}
+    store.add_digest_entries('site@example.com', ['old@example.com'], [old])
+    digest = LeadDigest(interval=3600, send=send, store=store)
+    try:
+        hold_leads(digest, [45])
+        digest.recover()
+    finally:
+        digest.stop()
+
+    assert len(send.messages) == 1 and 'Old lead' in send.messages[0]
+    assert store.due_digest_keys(float('inf')) == [('site@example.com', ['sales@example.com'])]
+
+
+def test_failed_digest_is_held_again(store):
+    from api.notifications import LeadDigest
+
+    hold_leads(LeadDigest(size=2, send=RecordingSend(fail=True), store=store), [20, 90])
+
+    send = RecordingSend()
+    LeadDigest(send=send, store=store).recover()
+    assert len(send.messages) == 1 and 'top score 90%' in send.messages[0]
+
+
+def test_lead_is_emailed_once_after_it_is_stored(client, submission, monkeypatch):
+    import api.app
+
+    emailed = []
+    monkeypatch.setattr(api.app, 'send_notification_email', lambda data, *scores: emailed.append(data) or True)
+    store_submission = api.app.store_submission
+
+    def failing_store(result, data):
+        raise OSError('database is locked')
+
+    monkeypatch.setattr(api.app, 'store_submission', failing_store)
+    assert client.post('/api/submit-assessment', json=submission).status_code == 500
+    assert emailed == []
+
+    monkeypatch.setattr(api.app, 'store_submission', store_submission)
+    first = client.post('/api/submit-assessment', json=submission)
+    retry = client.post('/api/submit-assessment', json=submission)
+
+    assert first.get_json()['email_sent'] is True
+    assert retry.headers['Idempotent-Replayed'] == 'true'
+    assert retry.get_json()['email_sent'] is False
+    assert retry.get_json()['report_url'] == first.get_json()['report_url']
+    assert len(emailed) == 1
+
+
+def test_spill_file_defaults_to_the_data_dir():
+    assert os.path.dirname(DEFAULT_SPILL_PATH) == os.environ['DATA_DIR']
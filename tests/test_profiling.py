@@ -0,0 +1,47 @@
+import os
+
+from flask import Flask
+
+from api.profiling import PROFILE_DIR, ProfilingMiddleware, install_profiler
+
+
+def make_app():
+    app = Flask(__name__)
+    app.add_url_rule('/ping', 'ping', lambda: 'pong')
+    return app
+
+
+def test_profiler_stays_off_without_a_token(monkeypatch):
+    monkeypatch.setenv('PROFILE_REQUESTS', 'true')
+    monkeypatch.delenv('PROFILE_TOKEN', raising=False)
+    app = install_profiler(make_app())
+
+    assert not isinstance(app.wsgi_app, ProfilingMiddleware)
+
+
+def test_only_the_matching_token_profiles_a_request(tmp_path):
+    app = make_app()
+    app.wsgi_app = ProfilingMiddleware(app.wsgi_app, directory=str(tmp_path), token='s3cret')
+    client = app.test_client()
+
+    assert client.get('/ping').data == b'pong'
+    assert client.get('/ping', headers={'X-Profile-Request': 'guess'}).data == b'pong'
+    assert client.get('/ping', headers={'X-Profile-Request': ''}).data == b'pong'
+    assert list(tmp_path.iterdir()) == []
+
+    assert client.get('/ping', headers={'X-Profile-Request': 's3cret'}).data == b'pong'
+    assert len(list(tmp_path.glob('*.pstats'))) == 1
+    assert len(list(tmp_path.glob('*.collapsed'))) == 1
+
+
+def test_header_never_profiles_without_a_token(tmp_path):
+    app = make_app()
+    app.wsgi_app = ProfilingMiddleware(app.wsgi_app, directory=str(tmp_path))
+
+    app.test_client().get('/ping', headers={'X-Profile-Request': ''})
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_profiles_default_to_the_data_dir():
+    assert os.path.dirname(PROFILE_DIR) == os.environ['DATA_DIR']
@@ -0,0 +1,29 @@
+import os
+
+from api import report_cache
+from api.report_cache import ReportCache
+
+
+def test_disk_tier_keeps_most_recently_used_reports(tmp_path):
+    cache = ReportCache(str(tmp_path), max_entries=1, max_disk_entries=3)
+    for i in range(5):
+        cache.put(f'report-{i}', f'<p>{i}</p>')
+        os.utime(tmp_path / f'report-{i}.html', (1000 + i, 1000 + i))
+
+    # Reading report-0 back from disk makes it the most recently used
+    assert cache.get('report-0') == (b'<p>0</p>', report_cache.compute_etag(b'<p>0</p>'))
+    assert cache.prune() == 2
+
+    assert sorted(path.name for path in tmp_path.glob('*.html')) == [
+        'report-0.html', 'report-3.html', 'report-4.html'
+    ]
+    assert cache.get('report-1') is None
+
+
+def test_writes_prune_the_disk_tier(tmp_path, monkeypatch):
+    monkeypatch.setattr(report_cache, 'PRUNE_EVERY', 4)
+    cache = ReportCache(str(tmp_path), max_disk_entries=2)
+    for i in range(8):
+        cache.get_or_render(f'report-{i}', lambda: '<p>report</p>')
+
+    assert len(list(tmp_path.glob('*.html'))) == 2
@@ -0,0 +1,49 @@
+from api.storage import email_to_identifier
+
+
+def submit(client, submission):
+    response = client.post('/api/submit-assessment', json=submission)
+    assert response.status_code == 200
+    return response.get_json()['report_url']
+
+
+def test_submitted_text_is_escaped_in_report(client, submission):
+    submission.update(name='<script>alert(1)</script>', company='Smith & <b>Sons</b>')
+    report = client.get(submit(client, submission)).get_data(as_text=True)
+
+    assert '<script>alert(1)</script>' not in report
+    assert '&lt;script&gt;alert(1)&lt;/script&gt;' in report
+    assert 'Smith &amp; &lt;b&gt;Sons&lt;/b&gt;' in report
+
+
+def test_report_url_is_not_derived_from_email(client, submission):
+    report_url = submit(client, submission)
+
+    assert email_to_identifier(submission['email']) not in report_url
+    assert client.get(f"/api/report/{email_to_identifier(submission['email'])}").status_code == 404
+    # A later submission from the same lead gets its own report
+    assert submit(client, dict(submission, budget='25k+')) != report_url
+    assert client.get(report_url).status_code == 200
+
+
+def test_old_database_is_migrated_to_report_tokens(tmp_path):
+    import sqlite3
+
+    from api.storage import SubmissionStore
+
+    path = str(tmp_path / 'submissions.db')
+    old = sqlite3.connect(path)
+    old.execute('''CREATE TABLE submissions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, email_identifier TEXT NOT NULL, submitted_at TEXT NOT NULL,
+        overall_score INTEGER NOT NULL, rule_version TEXT, payload TEXT NOT NULL)''')
+    old.execute('CREATE INDEX idx_submissions_email_identifier ON submissions (email_identifier, id)')
+    old.close()
+
+    store = SubmissionStore(path)
+    submission_id = store.save_submission('ada-example-com', {'submitted_at': '2026-01-05', 'overall_score': 70},
+                                          'v1', report_token='token-1')
+
+    assert store.get_submission_ref_by_report_token('token-1') == (submission_id, 'v1')
+    indexes = {row[1] for row in store.connection().execute('PRAGMA index_list(submissions)')}
+    assert 'idx_submissions_report_token' in indexes
+    assert 'idx_submissions_email_identifier' not in indexes
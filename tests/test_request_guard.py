@@ -0,0 +1,90 @@
+import os
+from html.parser import HTMLParser
+
+import pytest
+
+from api.request_guard import FORM_ALIASES, MAX_SUBMISSION_BYTES
+from api.scoring_analysis import ASSESSMENT_QUESTIONS, calculate_service_area_scores
+
+FORM_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'assessment.html')
+
+
+class FormInputs(HTMLParser):
+    """
+    The <input> fields of assessment.html: text values by name and choice options by group
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.text = {}
+        self.choices = {}
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag != 'input' or 'name' not in attrs:
+            return
+        if attrs.get('type') in ('radio', 'checkbox'):
+            # A checkbox without a value submits 'on', as in the browser
+            self.choices.setdefault(attrs['name'], []).append(attrs.get('value', 'on'))
+        else:
+            self.text[attrs['name']] = 'user@example.com' if attrs.get('type') == 'email' else 'Example'
+
+
+def read_form():
+    parser = FormInputs()
+    with open(FORM_PATH, encoding='utf-8') as f:
+        parser.feed(f.read())
+    return parser
+
+
+FORM = read_form()
+
+
+def form_payload(**choices):
+    # What the page's script posts: Object.fromEntries(new FormData(form)), plus
+    # the contact fields the API requires under its own names
+    payload = dict(FORM.text, name='Example', company='Example')
+    payload.update({group: options[0] for group, options in FORM.choices.items()})
+    payload.update(choices)
+    return payload
+
+
+@pytest.mark.parametrize('group,option', [
+    (group, option) for group, options in FORM.choices.items() for option in options
+])
+def test_every_form_option_is_accepted(client, group, option):
+    payload = form_payload(**{group: option})
+    response = client.post('/api/submit-assessment', json=payload)
+
+    assert response.status_code == 200, response.get_json()
+    if ASSESSMENT_QUESTIONS.get(group, {}).get('scoring'):
+        # A scored question's answer must not count as unanswered
+        unanswered = calculate_service_area_scores(dict(payload, **{group: None}))
+        assert response.get_json()['service_area_scores'] != unanswered
+
+
+@pytest.mark.parametrize('field,alias,option', [
+    (field, alias, option) for field, mapping in FORM_ALIASES.items() for alias, option in mapping.items()
+])
+def test_form_aliases_are_scored_as_their_option(client, submission, field, alias, option):
+    response = client.post('/api/submit-assessment', json=dict(submission, **{field: alias}))
+
+    assert response.status_code == 200
+    expected = calculate_service_area_scores(dict(submission, **{field: option}))
+    assert response.get_json()['service_area_scores'] == expected
+    assert expected != calculate_service_area_scores(dict(submission, **{field: None}))
+
+
+def test_unknown_option_is_rejected(client):
+    response = client.post('/api/submit-assessment', json=form_payload(industry='mining'))
+
+    assert response.status_code == 400
+    assert response.get_json()['errors'][0]['field'] == 'industry'
+    assert response.get_json()['errors'][0]['code'] == 'invalid_option'
+
+
+def test_oversized_body_is_rejected_before_parsing(client):
+    response = client.post('/api/submit-assessment', data=b'{' * (MAX_SUBMISSION_BYTES + 1),
+                           content_type='application/json')
+
+    assert response.status_code == 413
@@ -0,0 +1,58 @@
+import copy
+import json
+
+import pytest
+
+from api.rule_packs import RulePack, RulePackError, RulePackRegistry
+from api.scoring_analysis import ASSESSMENT_QUESTIONS, BUILTIN_RULE_PACK, SERVICE_AREAS, rule_packs
+
+
+@pytest.fixture
+def source():
+    return copy.deepcopy(rule_packs.builtin.to_source())
+
+
+def compile_pack(source):
+    return RulePack(source, ASSESSMENT_QUESTIONS, SERVICE_AREAS)
+
+
+def test_threshold_change_changes_rule_version(source):
+    changed = copy.deepcopy(source)
+    changed['score_ranges']['marketing_sales']['ranges'][0]['max'] -= 1
+    changed['score_ranges']['marketing_sales']['ranges'][1]['min'] -= 1
+
+    assert compile_pack(changed).rule_version != compile_pack(source).rule_version
+
+
+def test_recommendation_change_changes_rule_version(source):
+    changed = copy.deepcopy(source)
+    changed['score_ranges']['data_analytics']['recommendations']['Basic'][0] = 'Start with a spreadsheet'
+
+    assert compile_pack(changed).rule_version != compile_pack(source).rule_version
+
+
+@pytest.mark.parametrize('entry', [['not', 'an', 'object'], 'budget', 7])
+def test_non_object_question_entry_is_rejected(source, entry):
+    source['questions']['budget'] = entry
+    with pytest.raises(RulePackError):
+        compile_pack(source)
+
+
+def test_non_string_level_is_rejected(source):
+    source['score_ranges']['marketing_sales']['ranges'][0]['level'] = ['Basic']
+    with pytest.raises(RulePackError):
+        compile_pack(source)
+
+
+def test_malformed_pack_keeps_last_good_pack(tmp_path, source):
+    registry = RulePackRegistry(BUILTIN_RULE_PACK, ASSESSMENT_QUESTIONS, SERVICE_AREAS,
+                                directory=str(tmp_path), pack_name='pack.json')
+    source['version'] = 'good'
+    (tmp_path / 'pack.json').write_text(json.dumps(source))
+    good = registry.reload()
+    assert good.version == 'good'
+
+    source['version'] = 'bad'
+    source['questions']['goals'] = ['automation']
+    (tmp_path / 'pack.json').write_text(json.dumps(source))
+    assert registry.reload() is good
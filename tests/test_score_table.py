@@ -0,0 +1,42 @@
+import copy
+import os
+
+import pytest
+
+from api import score_table
+from api.rule_packs import RulePack
+from api.scoring_analysis import ASSESSMENT_QUESTIONS, SERVICE_AREAS, get_active_rules
+
+
+@pytest.fixture
+def table_path(tmp_path, monkeypatch):
+    path = str(tmp_path / 'score_table.bin')
+    monkeypatch.setattr(score_table, 'SCORE_TABLE_PATH', path)
+    monkeypatch.setattr(score_table, '_score_table_state', (None, None))
+    return path
+
+
+def test_missing_table_is_built_once_for_percentiles(table_path, submission, capsys):
+    rules = get_active_rules()
+    scores = {area: 50 for area in SERVICE_AREAS}
+    assert score_table.get_score_percentiles(scores, 50, rules) is None
+    assert 'Warning: no score table' in capsys.readouterr().out
+
+    assert score_table.ensure_score_table(rules)
+    built_at = os.stat(table_path).st_mtime_ns
+    assert score_table.ensure_score_table(rules)
+
+    assert os.stat(table_path).st_mtime_ns == built_at
+    assert set(score_table.get_score_percentiles(scores, 50, rules)) == set(SERVICE_AREAS) | {'overall'}
+
+
+def test_table_built_from_other_rules_is_rebuilt(table_path):
+    rules = get_active_rules()
+    source = copy.deepcopy(rules.to_source())
+    source['questions']['budget']['scoring']['25k+']['data_analytics'] += 5
+    other_rules = RulePack(source, ASSESSMENT_QUESTIONS, SERVICE_AREAS)
+    score_table.build_score_table(table_path, other_rules)
+
+    assert score_table.ensure_score_table(rules)
+
+    assert score_table.get_score_table(rules).rules_fingerprint == rules.fingerprint
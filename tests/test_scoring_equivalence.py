@@ -0,0 +1,125 @@
+"""
+The compiled engine and the precomputed score table must give exactly what
+calculate_service_area_scores gives, for complete, partial and malformed answers
+"""
+
+import random
+
+import pytest
+
+from api.report_generator import generate_overall_score
+from api.score_table import ScoreTable, build_score_table
+from api.scoring_analysis import ASSESSMENT_QUESTIONS, calculate_service_area_scores, get_active_rules
+from api.scoring_engine import get_scoring_engine
+
+SAMPLE_SIZE = 20000
+MISSING = object()
+
+
+@pytest.fixture(scope='module')
+def rules():
+    return get_active_rules()
+
+
+@pytest.fixture(scope='module')
+def table(rules, tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('score-table') / 'score_table.bin')
+    build_score_table(path, rules)
+    return ScoreTable(path)
+
+
+def random_answer(rng, config):
+    options = config['options']
+    roll = rng.random()
+    if config['type'] == 'checkbox':
+        if roll < 0.05:
+            return MISSING
+        if roll < 0.1:
+            return []
+        if roll < 0.13:
+            return rng.choice(options)  # a bare string, not a list
+        items = rng.sample(options, rng.randint(1, len(options)))
+        if roll < 0.2:
+            items.append('not-an-option')
+        elif roll < 0.25:
+            items.append(items[0])  # a repeat counts twice
+        return items
+    if roll < 0.05:
+        return MISSING
+    if roll < 0.08:
+        return ''
+    if roll < 0.1:
+        return None
+    if roll < 0.13:
+        return 'not-an-option'
+    return rng.choice(options)
+
+
+def random_submissions(count, seed=20250201):
+    rng = random.Random(seed)
+    scored = {question: config for question, config in ASSESSMENT_QUESTIONS.items() if config['scoring']}
+    for _ in range(count):
+        submission = {'name': 'Lead', 'email': 'lead@example.com', 'company': 'Co'}
+        for question, config in scored.items():
+            answer = random_answer(rng, config)
+            if answer is not MISSING:
+                submission[question] = answer
+        yield submission
+
+
+def edge_submissions():
+    complete = {question: config['options'][0] for question, config in ASSESSMENT_QUESTIONS.items()
+                if config['scoring'] and config['type'] != 'checkbox'}
+    return [
+        {},
+        {'industry': 'not-an-option'},
+        {'current_tools': ['none']},
+        {'goals': list(ASSESSMENT_QUESTIONS['goals']['options'])},
+        dict(complete, current_tools=list(ASSESSMENT_QUESTIONS['current_tools']['options']),
+             goals=list(ASSESSMENT_QUESTIONS['goals']['options'])),
+        dict(complete, budget='25k+', timeline='immediately'),
+    ]
+
+
+@pytest.fixture(scope='module')
+def submissions():
+    return edge_submissions() + list(random_submissions(SAMPLE_SIZE))
+
+
+def test_engine_matches_reference(rules, submissions):
+    batch = get_scoring_engine(rules).score_batch(submissions)
+    mismatches = [
+        (submission, scores) for submission, scores in zip(submissions, batch)
+        if scores != calculate_service_area_scores(submission, rules)
+    ]
+    assert mismatches == []
+
+
+def test_table_matches_reference(rules, table, submissions):
+    looked_up = 0
+    for submission in submissions:
+        result = table.lookup(submission)
+        if result is None:
+            # Only a repeated checkbox option has no slot in the table
+            assert any(isinstance(v, list) and len(set(v)) != len(v) for v in submission.values())
+            continue
+        scores, overall_score = result
+        expected = calculate_service_area_scores(submission, rules)
+        assert scores == expected, submission
+        assert overall_score == generate_overall_score(expected, rules), submission
+        looked_up += 1
+    assert looked_up > SAMPLE_SIZE * 0.9
+
+
+def test_every_single_answer_matches_reference(rules, table):
+    engine = get_scoring_engine(rules)
+    variants = [{}]
+    for question, config in ASSESSMENT_QUESTIONS.items():
+        if not config['scoring']:
+            continue
+        for option in config['options']:
+            variants.append({question: [option] if config['type'] == 'checkbox' else option})
+    expected = [calculate_service_area_scores(variant, rules) for variant in variants]
+
+    assert engine.score_batch(variants) == expected
+    assert [table.lookup(variant)[0] for variant in variants] == expected
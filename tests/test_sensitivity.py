@@ -0,0 +1,62 @@
+import pytest
+
+from api.report_generator import generate_overall_score
+from api.scoring_analysis import calculate_service_area_scores, get_active_rules
+from api.sensitivity import ACTION_ADD, ACTION_REMOVE, ACTION_SELECT, analyze_what_if
+
+
+def apply_change(form_data, change):
+    changed = dict(form_data)
+    question, option = change['question'], change['option']
+    if change['action'] == ACTION_SELECT:
+        changed[question] = option
+    elif change['action'] == ACTION_ADD:
+        current = form_data.get(question)
+        changed[question] = (current if isinstance(current, list) else []) + [option]
+    else:
+        changed[question] = [item for item in form_data[question] if item != option]
+    return changed
+
+
+@pytest.mark.parametrize('answers', [
+    {},
+    {'employees': '11-50', 'industry': 'retail', 'current_tools': ['crm', 'cloud'], 'budget': '5k-10k',
+     'timeline': '1-3-months', 'goals': ['automation', 'efficiency']},
+    {'employees': '200+', 'budget': 'under-1k', 'current_tools': ['none'], 'goals': []},
+])
+def test_every_variant_scores_as_its_changed_answers(answers):
+    rules = get_active_rules()
+    analysis = analyze_what_if(answers, rules)
+
+    assert analysis['service_area_scores'] == calculate_service_area_scores(answers, rules)
+    actions = {change['action'] for change in analysis['changes']}
+    assert ACTION_SELECT in actions and ACTION_ADD in actions
+    for change in analysis['changes']:
+        expected = calculate_service_area_scores(apply_change(answers, change), rules)
+        assert {area: entry['score'] for area, entry in change['areas'].items()} == expected, change
+        assert change['overall_score'] == generate_overall_score(expected, rules)
+        assert change['overall_delta'] == change['overall_score'] - analysis['overall_score']
+    if answers.get('goals'):
+        assert ACTION_REMOVE in actions
+
+
+def test_changes_are_ranked_and_best_by_area_is_the_maximum(submission):
+    analysis = analyze_what_if(submission)
+    changes = analysis['changes']
+
+    deltas = [change['overall_delta'] for change in changes]
+    assert deltas == sorted(deltas, reverse=True)
+    for area, best in analysis['best_by_area'].items():
+        top = max(change['areas'][area]['delta'] for change in changes)
+        if top > 0:
+            assert best['areas'][area]['delta'] == top
+        else:
+            assert best is None
+
+
+def test_endpoint_returns_the_analysis(client, submission):
+    answers = {key: value for key, value in submission.items() if key not in ('name', 'email', 'company')}
+    response = client.post('/api/what-if', json=answers)
+
+    assert response.status_code == 200
+    assert response.get_json() == analyze_what_if(answers)
@@ -0,0 +1,105 @@
+"""
+The one-pass shadow scorer must give exactly what each of the three reference
+scorers gives on its own, for well-formed and malformed answers
+"""
+
+import random
+
+import pytest
+
+from api.legacy_scoring import SITE_SCORING_MAP, calculate_ai_readiness_score_legacy, calculate_ai_score
+from api.report_generator import generate_overall_score
+from api.scoring_analysis import ASSESSMENT_QUESTIONS, calculate_service_area_scores, get_active_rules
+from api.shadow_scoring import ShadowScorer, ShadowSummary
+
+SAMPLE_SIZE = 5000
+
+
+def random_choice(rng, options):
+    roll = rng.random()
+    if roll < 0.1:
+        return None  # left out
+    if roll < 0.15:
+        return 'not-an-option'
+    if roll < 0.18:
+        return ''
+    return rng.choice(options)
+
+
+def random_submission(rng):
+    submission = {'name': 'Lead', 'email': 'lead@example.com', 'company': 'Co'}
+    for question, config in ASSESSMENT_QUESTIONS.items():
+        if not config['scoring']:
+            continue
+        if config['type'] == 'checkbox':
+            roll = rng.random()
+            if roll < 0.1:
+                continue
+            if roll < 0.15:
+                submission[question] = rng.choice(config['options'])  # a bare string, not a list
+                continue
+            items = rng.sample(config['options'], rng.randint(0, len(config['options'])))
+            if roll < 0.25:
+                items.append('not-an-option')
+            elif roll < 0.3 and items:
+                items.append(items[0])  # a repeat counts twice
+            submission[question] = items
+        else:
+            answer = random_choice(rng, config['options'])
+            if answer is not None:
+                submission[question] = answer
+    # The site form's questions; calculate_ai_score cannot take list answers
+    for field, options in SITE_SCORING_MAP.items():
+        if field not in ASSESSMENT_QUESTIONS and rng.random() < 0.5:
+            answer = random_choice(rng, list(options))
+            if answer is not None:
+                submission[field] = answer
+    return submission
+
+
+@pytest.fixture(scope='module')
+def rules():
+    return get_active_rules()
+
+
+def test_shadow_scores_match_the_reference_scorers(rules):
+    rng = random.Random(20260105)
+    scorer = ShadowScorer(rules)
+    submissions = [{}, {'goals': [], 'current_tools': []}] + [random_submission(rng) for _ in range(SAMPLE_SIZE)]
+
+    for submission in submissions:
+        expected = {
+            'service_area': generate_overall_score(calculate_service_area_scores(submission, rules), rules),
+            'legacy': calculate_ai_readiness_score_legacy(submission),
+            'site': calculate_ai_score(submission)
+        }
+        assert scorer.score(submission) == expected, submission
+
+
+def test_summary_keeps_a_bounded_sample_of_disagreements():
+    summary = ShadowSummary(budget_us=100, threshold=15, max_samples=3)
+    summary.record({'service_area': 50, 'legacy': 55, 'site': 50}, {'n': 0}, 10)
+    for n in range(1, 11):
+        summary.record({'service_area': 40, 'legacy': 60, 'site': 100}, {'n': n}, 10)
+
+    snapshot = summary.snapshot()
+    assert snapshot['compared'] == 11
+    assert [sample['answers']['n'] for sample in snapshot['recent_disagreements']] == [8, 9, 10]
+
+    pair = snapshot['pairs']['service_area_vs_site']
+    assert pair['disagreements'] == 10
+    assert pair['max_abs_diff'] == 60
+    assert pair['abs_diff_histogram']['0-9'] == 1 and pair['abs_diff_histogram']['60-69'] == 10
+    assert snapshot['pairs']['service_area_vs_legacy']['disagreements'] == 10
+    assert sum(snapshot['pairs']['legacy_vs_site']['abs_diff_histogram'].values()) == 11
+
+
+def test_slow_passes_lower_the_sample_rate():
+    summary = ShadowSummary(budget_us=100)
+    for _ in range(200):
+        summary.record({'service_area': 50, 'legacy': 50, 'site': 50}, {}, 400)
+
+    snapshot = summary.snapshot()
+    assert snapshot['latency_us']['over_budget'] == 200
+    assert 0.2 < summary.sample_rate() < 0.3
+    assert snapshot['recent_disagreements'] == []
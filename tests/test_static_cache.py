@@ -0,0 +1,49 @@
+import gzip
+
+import pytest
+from flask import Flask, request
+
+from api.static_cache import StaticPageCache
+
+PAGE = b'<!DOCTYPE html><title>Assessment</title>' + b'<p>AI readiness</p>' * 200
+
+app = Flask(__name__)
+
+
+@pytest.fixture
+def pages(tmp_path):
+    (tmp_path / 'page.html').write_bytes(PAGE)
+    pages = StaticPageCache(str(tmp_path), ['page.html'])
+    page = pages.get('page.html')
+    if 'br' not in page.variants:
+        # brotli is optional; stand in a br variant so negotiation is still covered
+        page.variants['br'] = b'br-bytes'
+        page.etags['br'] = page.etags['identity'][:-1] + '-br"'
+    return pages
+
+
+def serve(pages, accept_encoding):
+    headers = {'Accept-Encoding': accept_encoding} if accept_encoding is not None else {}
+    with app.test_request_context('/page', headers=headers):
+        return pages.serve('page.html', request)
+
+
+@pytest.mark.parametrize('accept_encoding', ['gzip, deflate, br', 'br, gzip', 'br', '*'])
+def test_brotli_preferred_when_accepted(pages, accept_encoding):
+    response = serve(pages, accept_encoding)
+    assert response.headers['Content-Encoding'] == 'br'
+    assert response.get_data() == pages.get('page.html').variants['br']
+
+
+@pytest.mark.parametrize('accept_encoding', ['gzip', 'gzip, deflate', 'br;q=0.5, gzip'])
+def test_gzip_when_preferred_or_only_option(pages, accept_encoding):
+    response = serve(pages, accept_encoding)
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(response.get_data()) == PAGE
+
+
+@pytest.mark.parametrize('accept_encoding', [None, 'identity', 'deflate'])
+def test_identity_without_supported_encoding(pages, accept_encoding):
+    response = serve(pages, accept_encoding)
+    assert 'Content-Encoding' not in response.headers
+    assert response.get_data() == PAGE
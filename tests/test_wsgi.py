@@ -0,0 +1,17 @@
+from werkzeug.test import Client
+
+from wsgi import app
+
+
+def test_site_pages_and_api_are_served_together(submission):
+    client = Client(app)
+
+    page = client.get('/assessment')
+    assert page.status_code == 200
+    assert b'/api/submit-assessment' in page.data
+
+    response = client.post('/api/submit-assessment', json=submission)
+    assert response.status_code == 200
+    assert client.get(response.get_json()['report_url']).status_code == 200
+
+    assert client.get('/api/metrics').status_code == 200
@@ -0,0 +1,21 @@
+"""
+Production entry point: the site and the assessment API in one process
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+The site's pages post to /api/submit-assessment, so requests under /api/ go to the
+API app (api/app.py) and everything else to the site (app.py). Both are imported
+when gunicorn preloads this module, so the API's metrics, notification outbox and
+report cache are set up in the master and warm-up covers what the API serves.
+"""
+
+from api.app import app as api_app
+from app import app as site_app
+
+API_PREFIX = '/api/'
+
+
+def app(environ, start_response):
+    if environ.get('PATH_INFO', '').startswith(API_PREFIX):
+        return api_app(environ, start_response)
+    return site_app(environ, start_response)